@@ -208,7 +208,7 @@ export const createBooking = catchAsync(async (req: Request, res: Response) => {
                     TableName: TABLE_GRAPH,
                     Item: {
                         PK: `PATIENT#${patientId}`, SK: `DOCTOR#${doctorId}`,
-                        relationship: "isTreatedBy", doctorName: doctorName,
+                        relationship: "isTreatedBy", relSK: `isTreatedBy#DOCTOR#${doctorId}`, doctorName: doctorName,
                         lastVisit: normalizedTime, createdAt: timestamp
                     }
                 }
@@ -218,7 +218,7 @@ export const createBooking = catchAsync(async (req: Request, res: Response) => {
                     TableName: TABLE_GRAPH,
                     Item: {
                         PK: `DOCTOR#${doctorId}`, SK: `PATIENT#${patientId}`,
-                        relationship: "treats", patientName: patientName,
+                        relationship: "treats", relSK: `treats#PATIENT#${patientId}`, patientName: patientName,
                         lastVisit: normalizedTime, createdAt: timestamp
                     }
                 }
@@ -1,8 +1,5 @@
-import boto3
 import re
-
-# Initialize Textract Client (Auto-detects region)
-textract = boto3.client('textract')
+from aws_clients import get_client
 
 def scan_diploma(bucket_name, file_key):
     """
@@ -13,7 +10,7 @@ def scan_diploma(bucket_name, file_key):
     print(f"Scanning document: {file_key} from bucket: {bucket_name}")
 
     try:
-        response = textract.detect_document_text(
+        response = get_client('textract').detect_document_text(
             Document={
                 'S3Object': {
                     'Bucket': bucket_name,
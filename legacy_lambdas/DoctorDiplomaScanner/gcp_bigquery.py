@@ -2,15 +2,12 @@ from google.cloud import bigquery
 from google.oauth2 import service_account
 import json
 import datetime
-import boto3
-
-# Initialize Secrets Manager Client
-secrets_client = boto3.client('secretsmanager', region_name='us-east-1')
+from aws_clients import get_client
 
 def get_gcp_credentials():
     """Fetches the GCP JSON Key from AWS Secrets Manager."""
     try:
-        response = secrets_client.get_secret_value(SecretId='mediconnect/gcp/bigquery_key')
+        response = get_client('secretsmanager', 'us-east-1').get_secret_value(SecretId='mediconnect/gcp/bigquery_key')
         if 'SecretString' in response:
             return json.loads(response['SecretString'])
     except Exception as e:
@@ -1,11 +1,9 @@
 import json
-import boto3
+from aws_clients import get_client, get_table
 from diploma_scanner import scan_diploma
 from gcp_bigquery import record_doctor_event 
 
-# Connect to AWS Services
-dynamodb = boto3.resource('dynamodb')
-sns = boto3.client('sns')
+# AWS clients (DynamoDB, SNS) are created lazily on first use, see aws_clients.py
 
 TABLE_NAME = "mediconnect-doctors"
 # 🟢 IMPORTANT: Ensure this Topic exists in your SNS Console
@@ -47,7 +45,7 @@ def lambda_handler(event, context):
     # 4. Update DynamoDB (TIERED UPDATE)
     db_message = "Attempted DB Update"
     try:
-        table = dynamodb.Table(TABLE_NAME)
+        table = get_table(TABLE_NAME)
         
         if scan_passed:
             # If AI passes, we move to "PENDING_REVIEW" and alert the Human Officer.
@@ -64,7 +62,7 @@ def lambda_handler(event, context):
             
             # 5. SEND ALERT TO ADMIN (YOU)
             message = f"ACTION REQUIRED: Doctor {doctor_id} has uploaded a diploma. AI Check Passed. Please review and manually approve."
-            sns.publish(
+            get_client('sns').publish(
                 TopicArn=SNS_TOPIC_ARN,
                 Message=message,
                 Subject="New Doctor Credential Review"
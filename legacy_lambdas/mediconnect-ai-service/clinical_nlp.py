@@ -0,0 +1,199 @@
+import json
+import threading
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from aws_clients import get_client
+import summary_cache
+from note_chunks import chunk_text, needs_chunking
+
+# --- MODEL CALLS (Comprehend key phrases + Bedrock Nova Micro summary) ---
+# Summaries go through summary_cache first (exact + optional near-duplicate tier), scoped per patient.
+# analyze_note:  one note, both model calls side by side -> latency of the slower one, not the sum.
+# analyze_notes: many notes; Comprehend via batch_detect_key_phrases (25 documents per call) while
+#                Bedrock summaries run with at most BEDROCK_CONCURRENCY requests in flight.
+# Long notes (see note_chunks.py) are split on sentence boundaries and processed chunk-parallel:
+#   key phrases  chunks <= 5 KB through the batch API, offsets mapped back, deduplicated by span
+#   summary      map: one partial summary per chunk; reduce: one summary of the partials
+
+REGION = 'us-east-1'
+SUMMARY_MODEL_ID = "us.amazon.nova-micro-v1:0"
+COMPREHEND_BATCH_SIZE = 25            # BatchDetectKeyPhrases hard limit
+COMPREHEND_BATCH_DOC_BYTES = 5000     # per-document UTF-8 limit of the batch API (single call: 100 KB)
+COMPREHEND_WORKERS = 4
+BEDROCK_CONCURRENCY = 8               # stay well inside the account's Nova Micro request quota
+SUMMARY_CHUNK_BYTES = 12000           # ~3k tokens: notes above this are summarized map-reduce
+SUMMARY_FALLBACK = "Summary pending (AI processing)"
+SUMMARY_PROMPT = "Summarize these medical symptoms briefly: "
+PART_PROMPT = ("Summarize this section of a longer medical note briefly, keeping symptoms, findings, "
+               "medications and follow-up plans: ")
+REDUCE_PROMPT = "Combine these partial summaries of one medical note into one brief summary: "
+
+# Every invoke_model call takes a slot, however many pools are nested above it (batch x chunks)
+_bedrock_slots = threading.BoundedSemaphore(BEDROCK_CONCURRENCY)
+
+
+def generate_summary(text, prompt=SUMMARY_PROMPT, max_tokens=100):
+    print("🤖 Bedrock Generating Summary (Nova Micro)...")
+    try:
+        # --- NEW: Amazon Nova Micro Payload Format ---
+        body = json.dumps({
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [{"text": f"{prompt}{text}"}]
+                }
+            ],
+            "inferenceConfig": {
+                "max_new_tokens": max_tokens,
+                "temperature": 0.5
+            }
+        })
+
+        with _bedrock_slots:
+            response = get_client('bedrock-runtime', REGION).invoke_model(
+                modelId=SUMMARY_MODEL_ID,
+                body=body
+            )
+
+        response_body = json.loads(response['body'].read())
+        # Parse Nova response
+        summary = response_body['output']['message']['content'][0]['text'].strip()
+        return summary
+
+    except Exception as e:
+        print(f"Bedrock Error: {e}")
+        # Fallback if AI fails so the rest of the app doesn't crash
+        return SUMMARY_FALLBACK
+
+
+def summarize(text, patient_id, prompt=SUMMARY_PROMPT, max_tokens=100):
+    """generate_summary behind summary_cache (scoped to patient_id); the fallback text is never cached."""
+    # Partial / reduce prompts get their own cache namespace
+    cache_model = SUMMARY_MODEL_ID if prompt == SUMMARY_PROMPT else f"{SUMMARY_MODEL_ID}|{prompt}"
+    summary, token = summary_cache.lookup(cache_model, text, patient_id)
+    if summary is not None:
+        print("⚡ Summary cache hit")
+        return summary
+    summary = generate_summary(text, prompt, max_tokens)
+    if summary != SUMMARY_FALLBACK:
+        summary_cache.store(cache_model, token, text, summary)
+    return summary
+
+
+def summarize_note(text, patient_id):
+    """One summary per note; long notes go map (chunk summaries in parallel) -> reduce."""
+    if not needs_chunking(text, SUMMARY_CHUNK_BYTES):
+        return summarize(text, patient_id)
+    chunks = [chunk for _, chunk in chunk_text(text, SUMMARY_CHUNK_BYTES, overlap=0)]
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        partials = list(pool.map(lambda chunk: summarize(chunk, patient_id, PART_PROMPT, 150), chunks))
+    partials = [p for p in partials if p != SUMMARY_FALLBACK]
+    if not partials:
+        return SUMMARY_FALLBACK
+    # Reduce; a very long note may need more than one level
+    while True:
+        combined = "\n".join(partials)
+        if not needs_chunking(combined, SUMMARY_CHUNK_BYTES):
+            return summarize(combined, patient_id, REDUCE_PROMPT, 100)
+        groups = [group for _, group in chunk_text(combined, SUMMARY_CHUNK_BYTES, overlap=0)]
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            partials = list(pool.map(lambda group: summarize(group, patient_id, REDUCE_PROMPT, 150), groups))
+
+
+def key_phrase_entities(phrases, offset=0):
+    return [{
+        'Text': phrase['Text'],
+        'Category': 'KEY_PHRASE',
+        'Type': 'N/A',
+        'Confidence': Decimal(str(phrase['Score'])),
+        'BeginOffset': phrase['BeginOffset'] + offset,
+        'EndOffset': phrase['EndOffset'] + offset
+    } for phrase in phrases]
+
+
+def analyze_medical_text(text):
+    print("🧠 AI Analyzing text (Standard Mode)...")
+    try:
+        response = get_client('comprehend', REGION).detect_key_phrases(Text=text, LanguageCode='en')
+        return key_phrase_entities(response['KeyPhrases'])
+    except Exception as e:
+        print(f"Comprehend Error: {e}")
+        return []
+
+
+def extract_key_phrases(text):
+    """Key phrases for a note of any length; chunk results are merged by span (overlaps counted once)."""
+    if not needs_chunking(text, COMPREHEND_BATCH_DOC_BYTES):
+        return analyze_medical_text(text)
+    chunks = chunk_text(text, COMPREHEND_BATCH_DOC_BYTES)
+    by_span = {}
+    for (start, _), entities in zip(chunks, batch_key_phrases([chunk for _, chunk in chunks])):
+        for entity in entities:
+            entity['BeginOffset'] += start
+            entity['EndOffset'] += start
+            span = (entity['BeginOffset'], entity['EndOffset'])
+            if span not in by_span or entity['Confidence'] > by_span[span]['Confidence']:
+                by_span[span] = entity
+    return [by_span[span] for span in sorted(by_span)]
+
+
+def analyze_note(text, patient_id):
+    """(entities, summary) for one note, with the Comprehend and Bedrock calls in parallel."""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        entities = pool.submit(extract_key_phrases, text)
+        summary = pool.submit(summarize_note, text, patient_id)
+        return entities.result(), summary.result()
+
+
+def _key_phrase_batch(texts):
+    """One BatchDetectKeyPhrases call; documents the batch rejects fall back to the single-document API."""
+    results = [None] * len(texts)
+    try:
+        response = get_client('comprehend', REGION).batch_detect_key_phrases(TextList=texts, LanguageCode='en')
+        for entry in response.get('ResultList', []):
+            results[entry['Index']] = key_phrase_entities(entry['KeyPhrases'])
+        for error in response.get('ErrorList', []):
+            print(f"Comprehend batch item {error['Index']} failed: {error.get('ErrorMessage')}")
+    except Exception as e:
+        print(f"Comprehend Batch Error: {e}")
+    return [entities if entities is not None else analyze_medical_text(text) for entities, text in zip(results, texts)]
+
+
+def batch_key_phrases(texts):
+    """Entities per text. Short texts go 25 at a time through the batch API, long ones are chunked."""
+    results = [None] * len(texts)
+    batchable = [i for i, text in enumerate(texts) if len(text.encode('utf-8')) <= COMPREHEND_BATCH_DOC_BYTES]
+    in_batches = set(batchable)
+    single = [i for i in range(len(texts)) if i not in in_batches]
+    chunks = [batchable[i:i + COMPREHEND_BATCH_SIZE] for i in range(0, len(batchable), COMPREHEND_BATCH_SIZE)]
+
+    with ThreadPoolExecutor(max_workers=COMPREHEND_WORKERS) as pool:
+        batch_results = pool.map(lambda chunk: _key_phrase_batch([texts[i] for i in chunk]), chunks)
+        single_results = pool.map(lambda i: extract_key_phrases(texts[i]), single)
+        for chunk, entities in zip(chunks, batch_results):
+            for i, found in zip(chunk, entities):
+                results[i] = found
+        for i, found in zip(single, single_results):
+            results[i] = found
+    return results
+
+
+def summarize_many(texts, patient_ids, concurrency=BEDROCK_CONCURRENCY):
+    # Identical notes of the same patient in one batch (after normalization) share a single lookup / model call
+    keys = [summary_cache.cache_key(SUMMARY_MODEL_ID, text, p) for text, p in zip(texts, patient_ids)]
+    unique = {}
+    for key, text, patient_id in zip(keys, texts, patient_ids):
+        unique.setdefault(key, (text, patient_id))
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(unique)))) as pool:
+        summaries = dict(zip(unique, pool.map(lambda note: summarize_note(*note), unique.values())))
+    return [summaries[key] for key in keys]
+
+
+def analyze_notes(texts, patient_ids):
+    """[(entities, summary)] per text (patient_ids in the same order); Comprehend and Bedrock overlap."""
+    if not texts:
+        return []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        entities = pool.submit(batch_key_phrases, texts)
+        summaries = pool.submit(summarize_many, texts, patient_ids)
+        return list(zip(entities.result(), summaries.result()))
@@ -1,91 +1,105 @@
-import boto3
 import json
 import uuid
 import datetime
 import os
 from decimal import Decimal
+from aws_clients import get_client, get_table
+from clinical_nlp import analyze_note, analyze_notes
+import transcripts
 
 # --- CLIENTS ---
-comprehend = boto3.client(service_name='comprehend', region_name='us-east-1')
-transcribe = boto3.client(service_name='transcribe', region_name='us-east-1')
-bedrock = boto3.client(service_name='bedrock-runtime', region_name='us-east-1')
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+# Built lazily by aws_clients: an analyze_text call never pays for Transcribe, and vice versa.
+REGION = 'us-east-1'
 
 TABLE_NAME = "mediconnect-medical-records" 
-table = dynamodb.Table(TABLE_NAME)
+# Synchronous behind API Gateway (29 s): BEDROCK_CONCURRENCY (8) summaries in flight at ~3 s each
+# leaves room for ~60 notes; 40 keeps headroom for map-reduce summaries of long notes.
+MAX_BATCH_NOTES = 40
+# Batch record IDs derive from (patientId, text), so a client retry overwrites instead of duplicating
+BATCH_RECORD_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, 'ai-analysis.mediconnect')
 
-def generate_summary(text):
-    print("🤖 Bedrock Generating Summary (Nova Micro)...")
-    try:
-        # --- NEW: Amazon Nova Micro Payload Format ---
-        model_id = "us.amazon.nova-micro-v1:0"
-        
-        body = json.dumps({
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [{"text": f"Summarize these medical symptoms briefly: {text}"}]
-                }
-            ],
-            "inferenceConfig": {
-                "max_new_tokens": 100,
-                "temperature": 0.5
-            }
-        })
-
-        response = bedrock.invoke_model(
-            modelId=model_id,
-            body=body
-        )
-        
-        response_body = json.loads(response['body'].read())
-        # Parse Nova response
-        summary = response_body['output']['message']['content'][0]['text'].strip()
-        return summary
-
-    except Exception as e:
-        print(f"Bedrock Error: {e}")
-        # Fallback if AI fails so the rest of the app doesn't crash
-        return "Summary pending (AI processing)"
-
-def analyze_medical_text(text):
-    print("🧠 AI Analyzing text (Standard Mode)...")
-    try:
-        response = comprehend.detect_key_phrases(Text=text, LanguageCode='en')
-        entities = []
-        for phrase in response['KeyPhrases']:
-            entities.append({
-                'Text': phrase['Text'],
-                'Category': 'KEY_PHRASE', 
-                'Type': 'N/A',
-                'Confidence': Decimal(str(phrase['Score']))
-            })
-        return entities
-    except Exception as e:
-        print(f"Comprehend Error: {e}")
-        return []
-
-def start_transcription(file_url, job_name):
+def start_transcription(file_url, job_name, patient_id, record_id):
     print(f"🎙️ Starting Transcription for {file_url}...")
     try:
-        transcribe.start_transcription_job(
+        # Output key + tags identify the tracking record when the job completes (see transcripts.py)
+        get_client('transcribe', REGION).start_transcription_job(
             TranscriptionJobName=job_name,
             LanguageCode='en-US',
             Media={'MediaFileUri': file_url},
-            OutputBucketName='mediconnect-consultation-recordings',
-            MediaFormat='mp4' 
+            OutputBucketName=transcripts.TRANSCRIPT_BUCKET,
+            OutputKey=transcripts.output_key(patient_id, record_id),
+            MediaFormat='mp4',
+            Tags=[{'Key': 'patientId', 'Value': patient_id}, {'Key': 'recordId', 'Value': record_id}]
         )
         return "JOB_STARTED"
     except Exception as e:
         print(f"Transcription Error: {e}")
         return "ERROR"
 
+def analyze_batch(notes, default_patient_id, default_doctor_id):
+    """
+    Backfill-style analysis of many notes in one call.
+    notes: [{"text", "patientId"?, "doctorId"?}] (patient/doctor default to the request's).
+    Returns (statusCode, payload) and stores one AI_ANALYSIS record per distinct (patient, text).
+    """
+    if not isinstance(notes, list) or not notes:
+        return 400, "'notes' must be a non-empty list"
+    if len(notes) > MAX_BATCH_NOTES:
+        return 400, f"Too many notes (max {MAX_BATCH_NOTES} per request)"
+    prepared = []
+    for position, note in enumerate(notes):
+        note = note if isinstance(note, dict) else {'text': note}
+        text = note.get('text')
+        patient_id = note.get('patientId') or default_patient_id
+        if not text or not isinstance(text, str) or not patient_id:
+            return 400, f"Note {position} needs 'text' and a patientId"
+        prepared.append((text, patient_id, note.get('doctorId') or default_doctor_id))
+
+    analyses = analyze_notes([text for text, _, _ in prepared], [patient_id for _, patient_id, _ in prepared])
+    timestamp = datetime.datetime.utcnow().isoformat()
+    records = []
+    written = set()
+    with get_table(TABLE_NAME, REGION).batch_writer() as batch:
+        for (text, patient_id, doctor_id), (entities, summary) in zip(prepared, analyses):
+            record_id = str(uuid.uuid5(BATCH_RECORD_NAMESPACE, f"{patient_id}\n{text}"))
+            if (patient_id, record_id) in written:
+                continue  # same note twice in one request: one record (and one key per BatchWriteItem)
+            written.add((patient_id, record_id))
+            item = {
+                'patientId': patient_id,
+                'recordId': record_id,
+                'doctorId': doctor_id,
+                'type': 'AI_ANALYSIS',
+                'originalText': text,
+                'extractedEntities': entities,
+                'summary': summary,
+                'createdAt': timestamp
+            }
+            batch.put_item(Item=item)
+            records.append({
+                'patientId': patient_id,
+                'recordId': item['recordId'],
+                'summary': summary,
+                'entityCount': len(entities)
+            })
+    return 200, {'count': len(records), 'records': records}
+
 def lambda_handler(event, context):
+    # Transcription completion: S3 ObjectCreated on the transcript output, or EventBridge job state change
+    if event.get('Records') and 's3' in event['Records'][0]:
+        return {"statusCode": 200, "body": json.dumps(transcripts.handle_s3_event(event))}
+    if event.get('source') == 'aws.transcribe':
+        return {"statusCode": 200, "body": json.dumps(transcripts.handle_job_event(event))}
+
     try:
         body = json.loads(event.get('body', '{}')) if isinstance(event.get('body'), str) else event
         action = body.get('action', 'analyze_text')
         patient_id = body.get('patientId')
         doctor_id = body.get('doctorId')
+
+        if action == 'analyze_batch':
+            status, payload = analyze_batch(body.get('notes'), patient_id, doctor_id)
+            return {"statusCode": status, "body": json.dumps(payload)}
         
         if not patient_id:
             return {"statusCode": 400, "body": "Missing patientId"}
@@ -99,8 +113,8 @@ def lambda_handler(event, context):
             if not clinical_note:
                 return {"statusCode": 400, "body": "No text provided"}
             
-            ai_entities = analyze_medical_text(clinical_note)
-            ai_summary = generate_summary(clinical_note)
+            # Comprehend and Bedrock run side by side
+            ai_entities, ai_summary = analyze_note(clinical_note, patient_id)
             
             item = {
                 'patientId': patient_id,
@@ -113,14 +127,26 @@ def lambda_handler(event, context):
                 'createdAt': timestamp
             }
             
-            table.put_item(Item=item)
+            get_table(TABLE_NAME, REGION).put_item(Item=item)
             result_data = item
 
         elif action == 'transcribe_audio':
             audio_url = body.get('audioUrl')
             job_name = f"transcribe_{patient_id}_{int(datetime.datetime.now().timestamp())}"
-            status = start_transcription(audio_url, job_name)
-            result_data = {"status": status, "jobName": job_name}
+            status = start_transcription(audio_url, job_name, patient_id, record_id)
+            if status == "JOB_STARTED":
+                # Tracking record; the completion pipeline fills in transcript, key phrases and summary
+                get_table(TABLE_NAME, REGION).put_item(Item={
+                    'patientId': patient_id,
+                    'recordId': record_id,
+                    'doctorId': doctor_id,
+                    'type': 'TRANSCRIPTION',
+                    'status': 'IN_PROGRESS',
+                    'jobName': job_name,
+                    'audioUrl': audio_url,
+                    'createdAt': timestamp
+                })
+            result_data = {"status": status, "jobName": job_name, "recordId": record_id}
 
         def decimal_default(obj):
             if isinstance(obj, Decimal): return float(obj)
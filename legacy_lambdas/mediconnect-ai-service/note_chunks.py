@@ -0,0 +1,99 @@
+import re
+
+# --- SENTENCE-BOUNDARY CHUNKING FOR LONG NOTES ---
+# Discharge summaries run to tens of KB; Comprehend's batch API takes 5 KB per document and one
+# Bedrock prompt over the whole note is the slowest call in the request. chunk_text() packs whole
+# sentences into chunks under a UTF-8 byte budget, each chunk carrying its character offset in the
+# original note so per-chunk results (key phrase offsets) map back onto the full text.
+# Consecutive chunks share OVERLAP_SENTENCES sentence(s) so a phrase on a boundary is seen whole
+# by at least one chunk; results from the overlap are deduplicated by span by the caller.
+
+OVERLAP_SENTENCES = 1
+
+# Sentence ends (. ! ? followed by whitespace) and blank lines / list breaks typical of clinical notes
+_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n|\n(?=\s*(?:[-*•]|\d+[.)])\s)')
+
+
+def _utf8_len(text):
+    return len(text.encode('utf-8'))
+
+
+def sentences(text):
+    """[(start offset, sentence)] with surrounding whitespace trimmed; offsets index into text."""
+    spans = []
+    position = 0
+    for match in _BOUNDARY.finditer(text):
+        spans.append((position, match.start()))
+        position = match.end()
+    spans.append((position, len(text)))
+    result = []
+    for start, end in spans:
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            result.append((start + (len(piece) - len(piece.lstrip())), stripped))
+    return result
+
+
+def _split_oversized(start, sentence, max_bytes):
+    """A single sentence over the budget -> [(start, end)] spans: cut at whitespace, or by characters
+    for a run with no whitespace at all."""
+    spans = []
+    piece_start = piece_end = None
+    for match in re.finditer(r'\S+', sentence):
+        word_start, word_end = match.start(), match.end()
+        while _utf8_len(sentence[word_start:word_end]) > max_bytes:
+            if piece_start is not None:
+                spans.append((piece_start, piece_end))
+                piece_start = None
+            cut = min(word_end, word_start + max_bytes)
+            while _utf8_len(sentence[word_start:cut]) > max_bytes:
+                cut -= 1
+            spans.append((word_start, cut))
+            word_start = cut
+        if word_start == word_end:
+            continue
+        if piece_start is None:
+            piece_start, piece_end = word_start, word_end
+        elif _utf8_len(sentence[piece_start:word_end]) <= max_bytes:
+            piece_end = word_end
+        else:
+            spans.append((piece_start, piece_end))
+            piece_start, piece_end = word_start, word_end
+    if piece_start is not None:
+        spans.append((piece_start, piece_end))
+    return [(start + s, start + e) for s, e in spans]
+
+
+def chunk_text(text, max_bytes, overlap=OVERLAP_SENTENCES):
+    """
+    [(start offset, chunk text)] covering the note; each chunk is the original slice
+    text[start:start + len(chunk)] and is at most max_bytes UTF-8.
+    """
+    units = []
+    for start, sentence in sentences(text):
+        if _utf8_len(sentence) <= max_bytes:
+            units.append((start, start + len(sentence)))
+        else:
+            units.extend(_split_oversized(start, sentence, max_bytes))
+    if not units:
+        return []
+
+    chunks = []
+    first = 0
+    while first < len(units):
+        last = first
+        # Grow the chunk while the original slice (with its inner whitespace) fits the budget
+        while last + 1 < len(units) and _utf8_len(text[units[first][0]:units[last + 1][1]]) <= max_bytes:
+            last += 1
+        start, end = units[first][0], units[last][1]
+        chunks.append((start, text[start:end]))
+        if last + 1 >= len(units):
+            break
+        # Step back `overlap` units, but always move forward
+        first = max(first + 1, last + 1 - overlap)
+    return chunks
+
+
+def needs_chunking(text, max_bytes):
+    return _utf8_len(text) > max_bytes
@@ -0,0 +1,233 @@
+import os
+import re
+import time
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+from aws_clients import get_resource, get_table
+
+# --- SUMMARY CACHE ---
+# Templated and copy-forward notes make up much of the Bedrock traffic. Summaries are cached by:
+#   exact tier       SHA-256 of (model, prompt version, scope, normalized text); normalization is
+#                    casefold plus whitespace collapse only (numbers and units are kept, they change meaning)
+#   similarity tier  optional (SUMMARY_SIMILARITY_THRESHOLD, off by default): MinHash signature over word
+#                    5-shingles, LSH bands -> candidate keys, reused when the estimated Jaccard
+#                    similarity reaches the threshold. A high Jaccard score says nothing about the few
+#                    words that matter clinically ("denies" vs "reports", "25 mg" vs "250 mg"), so
+#                    band keys also carry a guard digest: every negation word and every number, each
+#                    with its neighbouring words, in order. Notes whose guards differ never match.
+# Every key is scoped (the patientId): a summary can quote details of its own note, so it is never
+# served for another patient's note, however similar.
+# Storage: a per-container LRU (MAX_LOCAL_ENTRIES, TTL) in front of an optional DynamoDB table
+# (SUMMARY_CACHE_TABLE, PK cacheKey, TTL attribute expiresAt) shared by every container.
+# Band entries live in the same table under "band#<band>#<hash>" and point at an exact key.
+
+CACHE_TABLE = os.environ.get('SUMMARY_CACHE_TABLE')
+TTL_SECONDS = int(os.environ.get('SUMMARY_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+SIMILARITY_THRESHOLD = float(os.environ.get('SUMMARY_SIMILARITY_THRESHOLD', '0') or 0)
+MAX_LOCAL_ENTRIES = int(os.environ.get('SUMMARY_CACHE_LOCAL_ENTRIES', '2048'))
+PROMPT_VERSION = 'v2'          # bump when the summary prompt or the key layout changes
+
+SHINGLE_WORDS = 5
+NUM_HASHES = 64
+BANDS = 16                     # 16 bands x 4 rows: pairs at J=0.9 collide in some band ~100% of the time
+ROWS = NUM_HASHES // BANDS
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+# Fixed (a, b) pairs for the universal hashes h_i(x) = (a*x + b) mod p, derived once from a seed
+_COEFFS = [
+    struct.unpack('>QQ', hashlib.sha256(f"minhash-{i}".encode()).digest()[:16])
+    for i in range(NUM_HASHES)
+]
+_COEFFS = [(a % _PRIME or 1, b % _PRIME) for a, b in _COEFFS]
+
+GUARD_CONTEXT_WORDS = 2       # words kept on each side of a negation / number in the guard
+NEGATIONS = frozenset({
+    'no', 'not', 'nor', 'never', 'none', 'without', 'denies', 'denied', 'deny', 'negative',
+    'absent', 'absence', 'free', 'neither', 'cannot', 'unable', 'ruled', 'resolved',
+    'dont', 'doesnt', 'didnt', 'isnt', 'wasnt', 'arent', 'werent', 'hasnt', 'havent', 'hadnt',
+    'cant', 'couldnt', 'wont', 'wouldnt', 'shouldnt'
+})
+
+_WHITESPACE = re.compile(r'\s+')
+_WORD = re.compile(r'\w+')
+_DIGIT = re.compile(r'\d')
+
+_lock = threading.Lock()
+_local = OrderedDict()        # cache key -> (expires_at, summary, signature)
+_bands = OrderedDict()        # band key -> cache key (local similarity index)
+
+
+def normalize(text):
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+
+def cache_key(model_id, text, scope):
+    seed = f"{model_id}|{PROMPT_VERSION}|{scope}|{normalize(text)}"
+    return hashlib.sha256(seed.encode('utf-8')).hexdigest()
+
+
+def guard(text):
+    """Digest of every negation word and number (with its neighbouring words), in order."""
+    words = _WORD.findall(normalize(text.replace("'", '').replace('\u2019', '')))
+    spans = [
+        ' '.join(words[max(0, i - GUARD_CONTEXT_WORDS):i + GUARD_CONTEXT_WORDS + 1])
+        for i, word in enumerate(words) if word in NEGATIONS or _DIGIT.search(word)
+    ]
+    return hashlib.sha256('|'.join(spans).encode('utf-8')).hexdigest()[:32]
+
+
+def band_seed(model_id, text, scope):
+    """Everything two notes must share exactly before their signatures are compared."""
+    return f"{model_id}|{PROMPT_VERSION}|{scope}|{guard(text)}"
+
+
+def signature(text):
+    """MinHash signature (NUM_HASHES ints) of the note's word 5-shingles."""
+    words = _WORD.findall(normalize(text))
+    if len(words) < SHINGLE_WORDS:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    values = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big') for s in shingles]
+    return [min((a * x + b) % _PRIME for x in values) & _MASK for a, b in _COEFFS]
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_HASHES
+
+
+def band_keys(seed, sig):
+    keys = []
+    for band in range(BANDS):
+        rows = ','.join(str(v) for v in sig[band * ROWS:(band + 1) * ROWS])
+        digest = hashlib.sha256(f"{seed}|{rows}".encode()).hexdigest()[:32]
+        keys.append(f"band#{band}#{digest}")
+    return keys
+
+
+def _encode_signature(sig):
+    return ''.join(f"{v:08x}" for v in sig)
+
+
+def _decode_signature(encoded):
+    return [int(encoded[i:i + 8], 16) for i in range(0, len(encoded), 8)]
+
+
+def _remember(seed, key, expires_at, summary, sig):
+    with _lock:
+        _local[key] = (expires_at, summary, sig)
+        _local.move_to_end(key)
+        while len(_local) > MAX_LOCAL_ENTRIES:
+            _local.popitem(last=False)
+        if sig is not None and seed is not None:
+            for band in band_keys(seed, sig):
+                _bands[band] = key
+                _bands.move_to_end(band)
+            # A band pointing at an evicted entry just misses; cap the index at BANDS per local entry
+            while len(_bands) > MAX_LOCAL_ENTRIES * BANDS:
+                _bands.popitem(last=False)
+
+
+def _local_get(key, now):
+    with _lock:
+        entry = _local.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del _local[key]
+            return None
+        _local.move_to_end(key)
+        return entry
+
+
+def _table_get(key):
+    try:
+        return get_table(CACHE_TABLE).get_item(Key={'cacheKey': key}).get('Item')
+    except ClientError as e:
+        print(f"⚠️ Summary cache read failed: {str(e)}")
+        return None
+
+
+def _similar(seed, text, now):
+    """Near-duplicate lookup through the LSH bands. Returns (summary, signature) or (None, signature)."""
+    sig = signature(text)
+    bands = band_keys(seed, sig)
+    candidates = []
+    with _lock:
+        for band in bands:
+            if band in _bands:
+                candidates.append(_bands[band])
+    for key in dict.fromkeys(candidates):
+        entry = _local_get(key, now)
+        if entry and entry[2] is not None and similarity(sig, entry[2]) >= SIMILARITY_THRESHOLD:
+            return entry[1], sig
+
+    if CACHE_TABLE:
+        try:
+            response = get_resource('dynamodb').batch_get_item(RequestItems={
+                CACHE_TABLE: {'Keys': [{'cacheKey': band} for band in bands], 'ProjectionExpression': 'target'}
+            })
+            # Best effort: UnprocessedKeys are not retried, a throttled band is just a miss
+            targets = [item['target'] for item in response.get('Responses', {}).get(CACHE_TABLE, [])]
+        except ClientError as e:
+            print(f"⚠️ Summary cache band lookup failed: {str(e)}")
+            targets = []
+        for key in dict.fromkeys(targets):
+            item = _table_get(key)
+            if not item or int(item.get('expiresAt', 0)) <= now or not item.get('signature'):
+                continue
+            stored = _decode_signature(item['signature'])
+            if similarity(sig, stored) >= SIMILARITY_THRESHOLD:
+                _remember(seed, key, int(item['expiresAt']), item['summary'], stored)
+                return item['summary'], sig
+    return None, sig
+
+
+def lookup(model_id, text, scope):
+    """Returns (summary or None, token). `scope` is the patientId. Pass the token to store() after a miss."""
+    now = time.time()
+    key = cache_key(model_id, text, scope)
+    seed = band_seed(model_id, text, scope) if SIMILARITY_THRESHOLD > 0 else None
+    entry = _local_get(key, now)
+    if entry is not None:
+        return entry[1], (key, entry[2], seed)
+
+    if CACHE_TABLE:
+        item = _table_get(key)
+        # DynamoDB TTL deletes lazily: an expired item can still be read for a while
+        if item and int(item.get('expiresAt', 0)) > now:
+            sig = _decode_signature(item['signature']) if item.get('signature') else None
+            _remember(seed, key, int(item['expiresAt']), item['summary'], sig)
+            return item['summary'], (key, sig, seed)
+
+    sig = None
+    if seed is not None:
+        summary, sig = _similar(seed, text, now)
+        if summary is not None:
+            return summary, (key, sig, seed)
+    return None, (key, sig, seed)
+
+
+def store(model_id, token, text, summary):
+    key, sig, seed = token
+    if seed is not None and sig is None:
+        sig = signature(text)
+    expires_at = int(time.time()) + TTL_SECONDS
+    _remember(seed, key, expires_at, summary, sig)
+    if not CACHE_TABLE:
+        return
+    item = {'cacheKey': key, 'summary': summary, 'model': model_id, 'expiresAt': expires_at}
+    if sig is not None:
+        item['signature'] = _encode_signature(sig)
+    try:
+        with get_table(CACHE_TABLE).batch_writer() as batch:
+            batch.put_item(Item=item)
+            if sig is not None and seed is not None:
+                for band in band_keys(seed, sig):
+                    batch.put_item(Item={'cacheKey': band, 'target': key, 'expiresAt': expires_at})
+    except ClientError as e:
+        print(f"⚠️ Summary cache write failed: {str(e)}")
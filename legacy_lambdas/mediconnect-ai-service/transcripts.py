@@ -0,0 +1,180 @@
+import json
+import datetime
+from urllib.parse import unquote_plus
+from aws_clients import get_client, get_table
+from clinical_nlp import analyze_note, REGION
+
+# --- TRANSCRIPTION COMPLETION PIPELINE ---
+# transcribe_audio writes a tracking record (type TRANSCRIPTION, status IN_PROGRESS) and starts the job
+# with OutputKey = transcripts/<patientId>/<recordId>.json and patientId / recordId tags.
+# Completion arrives as either:
+#   S3 ObjectCreated on mediconnect-consultation-recordings (prefix "transcripts/", suffix ".json")
+#   EventBridge "Transcribe Job State Change" (COMPLETED or FAILED; the tags identify the record)
+# Wire up one of the two triggers, not both (each completion would be processed twice).
+# The transcript JSON is stream-parsed: only results.transcripts is decoded, the word-level "items"
+# array (most of the file) is never held in memory. Key phrases + summary then run through the
+# same pipeline as analyze_text and the tracking record becomes COMPLETED with the results.
+
+TRANSCRIPT_BUCKET = 'mediconnect-consultation-recordings'
+TRANSCRIPT_PREFIX = 'transcripts/'
+TABLE_NAME = "mediconnect-medical-records"
+READ_CHUNK_BYTES = 64 * 1024
+MAX_INLINE_TRANSCRIPT_BYTES = 100 * 1024   # longer transcripts stay in S3 (400 KB DynamoDB item limit)
+MAX_STORED_ENTITIES = 500
+
+_MARKER = '"transcripts"'
+
+
+def output_key(patient_id, record_id):
+    return f"{TRANSCRIPT_PREFIX}{patient_id}/{record_id}.json"
+
+
+def parse_output_key(key):
+    """(patientId, recordId) from an output key, or None for anything else Transcribe writes."""
+    if not key.startswith(TRANSCRIPT_PREFIX) or not key.endswith('.json'):
+        return None
+    parts = key[len(TRANSCRIPT_PREFIX):-len('.json')].split('/')
+    if len(parts) != 2 or not all(parts):
+        return None
+    return parts[0], parts[1]
+
+
+def read_transcript(body, chunk_bytes=READ_CHUNK_BYTES):
+    """
+    Streams a Transcribe output file and returns the joined results.transcripts text.
+    Reads only until the transcripts array has been decoded.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0          # where to resume searching for the marker
+    value_start = None    # index of the '[' once the key has been found
+    pending = b''
+    while True:
+        chunk = body.read(chunk_bytes)
+        # Keep an incomplete multi-byte UTF-8 sequence for the next read
+        data = pending + chunk
+        try:
+            text = data.decode('utf-8')
+            pending = b''
+        except UnicodeDecodeError as e:
+            if not chunk or e.start < len(data) - 3:
+                raise
+            text, pending = data[:e.start].decode('utf-8'), data[e.start:]
+        buffer += text
+
+        while value_start is None:
+            found = buffer.find(_MARKER, position)
+            if found < 0:
+                # Nothing yet: keep only a tail that could hold the start of the marker
+                keep = len(_MARKER) - 1
+                buffer, position = buffer[-keep:], 0
+                break
+            rest = buffer[found + len(_MARKER):].lstrip()
+            if not rest:
+                position = found
+                break
+            if rest[0] != ':':
+                # The marker text ended a string value, not a key
+                position = found + 1
+                continue
+            after_colon = rest[1:].lstrip()
+            if not after_colon:
+                position = found
+                break
+            value_start = len(buffer) - len(after_colon)
+
+        if value_start is not None:
+            try:
+                transcripts, _ = decoder.raw_decode(buffer, value_start)
+                return ' '.join(t.get('transcript', '') for t in transcripts).strip()
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+        if not chunk:
+            raise ValueError("No results.transcripts in the transcript file")
+
+
+def _stored_entities(entities):
+    if len(entities) <= MAX_STORED_ENTITIES:
+        return entities
+    best = sorted(entities, key=lambda e: e['Confidence'], reverse=True)[:MAX_STORED_ENTITIES]
+    return sorted(best, key=lambda e: e.get('BeginOffset', 0))
+
+
+def complete_transcription(bucket, key, patient_id, record_id):
+    """Parses one transcript, analyzes it and stores the result on the tracking record."""
+    body = get_client('s3', REGION).get_object(Bucket=bucket, Key=key)['Body']
+    try:
+        transcript = read_transcript(body)
+    finally:
+        body.close()
+
+    entities, summary = analyze_note(transcript, patient_id) if transcript else ([], "")
+    now = datetime.datetime.utcnow().isoformat()
+    values = {
+        ':type': 'TRANSCRIPTION',
+        ':status': 'COMPLETED',
+        ':key': f"s3://{bucket}/{key}",
+        ':entities': _stored_entities(entities),
+        ':summary': summary,
+        ':now': now
+    }
+    fields = ["#type = :type", "#status = :status", "transcriptS3Uri = :key", "extractedEntities = :entities",
+              "summary = :summary", "completedAt = :now", "createdAt = if_not_exists(createdAt, :now)"]
+    if len(transcript.encode('utf-8')) <= MAX_INLINE_TRANSCRIPT_BYTES:
+        fields.append("originalText = :text")
+        values[':text'] = transcript
+    # Upsert: jobs started before tracking records existed still get a record
+    get_table(TABLE_NAME, REGION).update_item(
+        Key={'patientId': patient_id, 'recordId': record_id},
+        UpdateExpression="SET " + ", ".join(fields),
+        ExpressionAttributeNames={'#type': 'type', '#status': 'status'},
+        ExpressionAttributeValues=values
+    )
+    print(f"✅ Transcript {key}: {len(transcript)} chars, {len(entities)} key phrases")
+    return {'patientId': patient_id, 'recordId': record_id, 'status': 'COMPLETED'}
+
+
+def mark_failed(patient_id, record_id, reason):
+    get_table(TABLE_NAME, REGION).update_item(
+        Key={'patientId': patient_id, 'recordId': record_id},
+        UpdateExpression="SET #status = :status, failureReason = :reason, completedAt = :now",
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={
+            ':status': 'FAILED',
+            ':reason': reason or 'Unknown',
+            ':now': datetime.datetime.utcnow().isoformat()
+        }
+    )
+    return {'patientId': patient_id, 'recordId': record_id, 'status': 'FAILED'}
+
+
+def handle_s3_event(event):
+    results = []
+    for record in event['Records']:
+        bucket = record['s3']['bucket']['name']
+        key = unquote_plus(record['s3']['object']['key'])
+        ids = parse_output_key(key)
+        if ids is None:
+            # e.g. Transcribe's .write_access_check_file.temp
+            print(f"⏭️ Ignoring {key}")
+            continue
+        results.append(complete_transcription(bucket, key, *ids))
+    return results
+
+
+def handle_job_event(event):
+    """EventBridge "Transcribe Job State Change"."""
+    detail = event.get('detail', {})
+    job_name, status = detail.get('TranscriptionJobName'), detail.get('TranscriptionJobStatus')
+    job = get_client('transcribe', REGION).get_transcription_job(TranscriptionJobName=job_name)['TranscriptionJob']
+    tags = {tag['Key']: tag['Value'] for tag in job.get('Tags', [])}
+    if 'patientId' not in tags or 'recordId' not in tags:
+        print(f"⏭️ Job {job_name} is not tracked")
+        return []
+    if status == 'FAILED':
+        return [mark_failed(tags['patientId'], tags['recordId'], job.get('FailureReason'))]
+    if status != 'COMPLETED':
+        return []
+    return [complete_transcription(TRANSCRIPT_BUCKET, output_key(tags['patientId'], tags['recordId']),
+                                   tags['patientId'], tags['recordId'])]
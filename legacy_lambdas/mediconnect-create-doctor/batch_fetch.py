@@ -0,0 +1,82 @@
+import time
+import random
+from aws_clients import get_client, get_resource
+
+# --- BATCH PROFILE FETCH (GET ?ids=a,b,c) ---
+# One BatchGetItem per 100 keys instead of one Lambda invocation per doctor.
+
+BATCH_GET_LIMIT = 100      # DynamoDB hard limit per BatchGetItem call
+MAX_BATCH_IDS = 500        # Keeps the response well under the 6 MB Lambda payload cap
+MAX_RETRIES = 6
+BASE_BACKOFF_SECONDS = 0.05
+MAX_BACKOFF_SECONDS = 2.0
+
+
+def parse_ids(raw):
+    """Splits a comma separated `ids` parameter, dropping blanks and duplicates (order kept)."""
+    seen = set()
+    ids = []
+    for part in (raw or '').split(','):
+        entity_id = part.strip()
+        if entity_id and entity_id not in seen:
+            seen.add(entity_id)
+            ids.append(entity_id)
+    return ids
+
+
+def _backoff(attempt):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+def batch_get_items(table_name, key_name, ids):
+    """
+    Fetches many items by partition key. Returns {id: item}; ids that do not
+    exist are simply absent. UnprocessedKeys (throttling / 16 MB response cap)
+    are retried with backoff; raises RuntimeError if they never drain.
+    """
+    dynamodb = get_resource('dynamodb')
+    found = {}
+
+    for start in range(0, len(ids), BATCH_GET_LIMIT):
+        chunk = ids[start:start + BATCH_GET_LIMIT]
+        request = {table_name: {'Keys': [{key_name: entity_id} for entity_id in chunk]}}
+        attempt = 0
+
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                found[item[key_name]] = item
+
+            request = response.get('UnprocessedKeys') or {}
+            if request:
+                if attempt >= MAX_RETRIES:
+                    pending = len(request.get(table_name, {}).get('Keys', []))
+                    raise RuntimeError(f"BatchGetItem gave up with {pending} unprocessed keys")
+                time.sleep(_backoff(attempt))
+                attempt += 1
+
+    return found
+
+
+def sign_avatars(items, bucket_name, expires_in=3600):
+    """Replaces S3 avatar paths with presigned GET links, signing each distinct key once."""
+    s3 = get_client('s3', 'us-east-1')
+    signed = {}
+    for item in items:
+        avatar = item.get('avatar')
+        if not avatar or avatar.startswith('http'):
+            continue
+        if avatar not in signed:
+            try:
+                signed[avatar] = s3.generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': bucket_name, 'Key': avatar},
+                    ExpiresIn=expires_in
+                )
+            except Exception as e:
+                print(f"S3 Signing Error ({avatar}): {str(e)}")
+                signed[avatar] = None
+        if signed[avatar]:
+            item['avatar'] = signed[avatar]
+    return items
@@ -1,16 +1,12 @@
 import json
-import boto3
 import datetime
 from decimal import Decimal
-from botocore.config import Config
-
-# 🟢 CONNECT TO DATABASE
-dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client(
-    's3', 
-    region_name='us-east-1', 
-    config=Config(signature_version='s3v4')
-)
+from aws_clients import get_client, get_table
+from http_cache import make_etag, is_not_modified, not_modified_response, cached_json_response
+from batch_fetch import parse_ids, batch_get_items, sign_avatars, MAX_BATCH_IDS
+from profile_update import apply_profile_update, VersionConflict
+
+# 🟢 CONNECT TO DATABASE (clients are built lazily on first use, see aws_clients.py)
 TABLE_NAME = "mediconnect-doctors"
 BUCKET_NAME = "mediconnect-identity-verification"
 
@@ -25,7 +21,7 @@ def lambda_handler(event, context):
     # 🔒 CORS HEADERS
     headers = {
         "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Headers": "Content-Type,Authorization",
+        "Access-Control-Allow-Headers": "Content-Type,Authorization,If-None-Match",
         "Access-Control-Allow-Methods": "OPTIONS,POST,GET,PUT" 
     }
 
@@ -35,13 +31,41 @@ def lambda_handler(event, context):
 
     try:
         method = event.get('httpMethod')
-        table = dynamodb.Table(TABLE_NAME)
+        table = get_table(TABLE_NAME)
 
         # ======================================================
         # 🟢 GET METHOD (Fetch Profile)
         # ======================================================
         if method == 'GET':
             query_params = event.get('queryStringParameters') or {}
+
+            # 🟢 BATCH MODE: ?ids=a,b,c -> { doctors: {id: profile}, missing: [...] }
+            if query_params.get('ids'):
+                doctor_ids = parse_ids(query_params['ids'])
+                if len(doctor_ids) > MAX_BATCH_IDS:
+                    return {
+                        "statusCode": 400,
+                        "headers": headers,
+                        "body": json.dumps({"error": f"Too many ids (max {MAX_BATCH_IDS})"})
+                    }
+
+                found = batch_get_items(TABLE_NAME, 'doctorId', doctor_ids)
+                needs_signing = any(
+                    item.get('avatar') and not item['avatar'].startswith('http') for item in found.values()
+                )
+
+                # Batch ETag changes whenever any member profile changes (or appears/disappears)
+                etag = make_etag(",".join(doctor_ids), [found.get(i) for i in doctor_ids], signed=needs_signing)
+                if is_not_modified(event, etag):
+                    return not_modified_response(headers, etag)
+
+                sign_avatars(found.values(), BUCKET_NAME)
+                payload = {
+                    "doctors": found,
+                    "missing": [i for i in doctor_ids if i not in found]
+                }
+                return cached_json_response(headers, json.dumps(payload, cls=DecimalEncoder), etag)
+
             doctor_id = query_params.get('id') or query_params.get('doctorId')
 
             if not doctor_id:
@@ -55,11 +79,17 @@ def lambda_handler(event, context):
 
             if 'Item' in response:
                 item = response['Item']
+                needs_signing = bool(item.get('avatar')) and not item['avatar'].startswith('http')
+
+                # 🟢 Conditional GET: unchanged profile -> 304, no signing, no body
+                etag = make_etag(doctor_id, item, signed=needs_signing)
+                if is_not_modified(event, etag):
+                    return not_modified_response(headers, etag)
 
                 # 🟢 NEW: Sign the Image URL
-                if 'avatar' in item and item['avatar'] and not item['avatar'].startswith('http'):
+                if needs_signing:
                     try:
-                        item['avatar'] = s3.generate_presigned_url(
+                        item['avatar'] = get_client('s3', 'us-east-1').generate_presigned_url(
                             'get_object',
                             Params={'Bucket': BUCKET_NAME, 'Key': item['avatar']},
                             ExpiresIn=3600
@@ -67,11 +97,7 @@ def lambda_handler(event, context):
                     except Exception as e:
                         print(f"S3 Signing Error: {str(e)}")
 
-                return {
-                    "statusCode": 200,
-                    "headers": headers,
-                    "body": json.dumps(item, cls=DecimalEncoder)
-                }
+                return cached_json_response(headers, json.dumps(item, cls=DecimalEncoder), etag)
             else:
                 return {
                     "statusCode": 404, 
@@ -117,7 +143,8 @@ def lambda_handler(event, context):
                 'isIdentityVerified': False,    
                 'isDiplomaAutoVerified': False, 
                 'isOfficerApproved': False,     
-                'verificationStatus': "UNVERIFIED" 
+                'verificationStatus': "UNVERIFIED",
+                'version': 1
             })
             
             return {
@@ -151,46 +178,35 @@ def lambda_handler(event, context):
                 'consultationFee', 'bio', 'preferences', 'isEmailVerified'
             ]
             
-            update_parts = []
-            expression_values = {}
-            expression_names = {} 
-            
-            for field in allowed_fields:
-                if field in body:
-                    update_parts.append(f"#{field} = :{field}")
-                    expression_values[f":{field}"] = body[field]
-                    expression_names[f"#{field}"] = field
-
-            if not update_parts:
+            if not any(field in body for field in allowed_fields):
                 return {
                     "statusCode": 400,
                     "headers": headers,
                     "body": json.dumps({"error": "No valid fields provided for update"})
                 }
 
-            # ✅ FIX 2: Add UpdatedAt Timestamp
-            update_parts.append("#updatedAt = :updatedAt")
-            expression_names["#updatedAt"] = "updatedAt"
-            expression_values[":updatedAt"] = str(datetime.datetime.now())
-
-            # Join with commas
-            update_expression = "SET " + ", ".join(update_parts)
-
-            # Perform Update
-            response = table.update_item(
-                Key={'doctorId': doctor_id},
-                UpdateExpression=update_expression,
-                ExpressionAttributeValues=expression_values,
-                ExpressionAttributeNames=expression_names,
-                ReturnValues="UPDATED_NEW"
-            )
+            # ✅ Diff-based, version-guarded write (see profile_update.py)
+            try:
+                result = apply_profile_update(table, {'doctorId': doctor_id}, body, allowed_fields)
+            except VersionConflict as conflict:
+                return {
+                    "statusCode": 409,
+                    "headers": headers,
+                    "body": json.dumps({
+                        "error": "Profile was changed by another request. Reload and retry.",
+                        "currentVersion": conflict.current_version
+                    })
+                }
+            except ValueError as e:
+                return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": str(e)})}
 
             return {
                 "statusCode": 200,
                 "headers": headers,
                 "body": json.dumps({
-                    "message": "Profile updated successfully",
-                    "updatedAttributes": response.get('Attributes')
+                    "message": "Profile updated successfully" if result['written'] else "No changes",
+                    "updatedAttributes": result['changed'],
+                    "version": result['version']
                 }, cls=DecimalEncoder)
             }
 
@@ -0,0 +1,75 @@
+import json
+import time
+import hashlib
+
+# --- CONDITIONAL GET HELPERS ---
+# Compression is left to API Gateway: enable it on the REST API (minimumCompressionSize, e.g. 1024)
+# and it gzips / deflates responses per Accept-Encoding. The Lambda itself always returns plain JSON,
+# so no Binary Media Types are needed and request bodies reach every Lambda unencoded.
+
+# Presigned avatar links live 1 hour; rotating the ETag every half hour guarantees
+# a client revalidating against a 304 never keeps a link that is about to expire.
+SIGNED_URL_WINDOW_SECONDS = 1800
+
+
+def _header(event, name):
+    """Case-insensitive request header lookup (API Gateway keeps the client's casing)."""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def make_etag(entity_id, item, signed=False):
+    """
+    Weak ETag derived from the stored record itself (canonical JSON), so every writer
+    changes it, including backend_v2 services that never set updatedAt.
+    """
+    content = json.dumps(item, sort_keys=True, separators=(',', ':'), default=str)
+    seed = f"{entity_id}|{content}"
+    if signed:
+        seed += f"|{int(time.time() // SIGNED_URL_WINDOW_SECONDS)}"
+    digest = hashlib.sha256(seed.encode('utf-8')).hexdigest()[:32]
+    # Weak because API Gateway may serve the same entity gzip, deflate or identity encoded
+    return f'W/"{digest}"'
+
+
+def is_not_modified(event, etag):
+    """True if the client's If-None-Match already holds this ETag."""
+    header = _header(event, 'if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison: ignore the W/ prefix on both sides
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified_response(headers, etag):
+    return {
+        "statusCode": 304,
+        "headers": {**headers, "ETag": etag, "Cache-Control": "private, no-cache", "Access-Control-Expose-Headers": "ETag"},
+        "body": ""
+    }
+
+
+def cached_json_response(headers, body, etag):
+    """200 response carrying `body` (a JSON string) and its ETag."""
+    return {
+        "statusCode": 200,
+        "headers": {
+            **headers,
+            "Content-Type": "application/json",
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+            "Access-Control-Expose-Headers": "ETag"
+        },
+        "body": body
+    }
@@ -1,27 +1,22 @@
 import json
-import boto3
 import os
 import datetime
 import logging
-from botocore.config import Config
+from aws_clients import get_client, get_table
+from http_cache import make_etag, is_not_modified, not_modified_response, cached_json_response
+from profile_update import apply_profile_update, VersionConflict
 
 # --- CONFIG ---
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client(
-    's3', 
-    region_name='us-east-1', 
-    config=Config(signature_version='s3v4')
-)
 DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE', 'mediconnect-patients')
 BUCKET_NAME = "mediconnect-identity-verification"
 
 # 🔒 HEADERS
 HEADERS = {
     "Access-Control-Allow-Origin": "*",
-    "Access-Control-Allow-Headers": "Content-Type,Authorization",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization,If-None-Match",
     "Access-Control-Allow-Methods": "OPTIONS,POST,GET,PUT"
 }
 
@@ -40,7 +35,7 @@ def lambda_handler(event, context):
             # --- A. ANALYTICS MODE (Demographics) ---
             if params.get('type') == 'demographics':
                 try:
-                    table = dynamodb.Table(DYNAMO_TABLE)
+                    table = get_table(DYNAMO_TABLE)
                     # Optimization: Only fetch DOB and Role
                     response = table.scan(
                         ProjectionExpression='dob, #r',
@@ -88,26 +83,31 @@ def lambda_handler(event, context):
             if not user_id:
                 return { "statusCode": 400, "headers": HEADERS, "body": json.dumps({"error": "Missing id"}) }
             
-            table = dynamodb.Table(DYNAMO_TABLE)
+            table = get_table(DYNAMO_TABLE)
             response = table.get_item(Key={'patientId': user_id})
             
             if 'Item' in response:
                 item = response['Item']
+                needs_signing = bool(item.get('avatar')) and not item['avatar'].startswith('http')
+
+                # 🟢 Conditional GET: unchanged profile -> 304, no signing, no body
+                etag = make_etag(user_id, item, signed=needs_signing)
+                if is_not_modified(event, etag):
+                    return not_modified_response(HEADERS, etag)
                 
                 # 🟢 NEW: Generate Secure Link for Avatar
-                if 'avatar' in item and item['avatar']:
-                    # Only sign if it is a Path (does not start with http)
-                    if not item['avatar'].startswith('http'):
-                        try:
-                            item['avatar'] = s3.generate_presigned_url(
-                                'get_object',
-                                Params={'Bucket': BUCKET_NAME, 'Key': item['avatar']},
-                                ExpiresIn=3600 # Link valid for 1 hour
-                            )
-                        except Exception as e:
-                            logger.error(f"S3 Signing Error: {str(e)}")
-
-                return { "statusCode": 200, "headers": HEADERS, "body": json.dumps(item, default=str) }
+                # Only sign if it is a Path (does not start with http)
+                if needs_signing:
+                    try:
+                        item['avatar'] = get_client('s3', 'us-east-1').generate_presigned_url(
+                            'get_object',
+                            Params={'Bucket': BUCKET_NAME, 'Key': item['avatar']},
+                            ExpiresIn=3600 # Link valid for 1 hour
+                        )
+                    except Exception as e:
+                        logger.error(f"S3 Signing Error: {str(e)}")
+
+                return cached_json_response(HEADERS, json.dumps(item, default=str), etag)
             else:
                 return { "statusCode": 404, "headers": HEADERS, "body": json.dumps({"error": "Patient not found"}) }
 
@@ -126,46 +126,35 @@ def lambda_handler(event, context):
             # ✅ FIXED SYNTAX ERROR HERE
             allowed_updates = ['name', 'avatar', 'phone', 'address', 'preferences', 'dob', 'isEmailVerified']
             
-            update_expression_parts = []
-            expression_attribute_names = {}
-            expression_attribute_values = {}
-
-            # Dynamically build the update query
-            for field in allowed_updates:
-                if field in body:
-                    # Construct: #field = :field
-                    update_expression_parts.append(f"#{field} = :{field}")
-                    expression_attribute_names[f"#{field}"] = field
-                    expression_attribute_values[f":{field}"] = body[field]
-
-            if not update_expression_parts:
+            if not any(field in body for field in allowed_updates):
                 return { "statusCode": 400, "headers": HEADERS, "body": json.dumps({"error": "No valid fields provided for update"}) }
 
-            # Add timestamp update
-            update_expression_parts.append("#updatedAt = :updatedAt")
-            expression_attribute_names["#updatedAt"] = "updatedAt"
-            expression_attribute_values[":updatedAt"] = str(datetime.datetime.now())
-
-            update_expression_str = "SET " + ", ".join(update_expression_parts)
-
+            # Diff-based, version-guarded write: unchanged autosaves cost no WCU (see profile_update.py)
             try:
-                table = dynamodb.Table(DYNAMO_TABLE)
-                response = table.update_item(
-                    Key={'patientId': user_id},
-                    UpdateExpression=update_expression_str,
-                    ExpressionAttributeNames=expression_attribute_names,
-                    ExpressionAttributeValues=expression_attribute_values,
-                    ReturnValues="ALL_NEW" # Returns the updated profile
-                )
-                
+                table = get_table(DYNAMO_TABLE)
+                result = apply_profile_update(table, {'patientId': user_id}, body, allowed_updates)
+
                 return {
                     "statusCode": 200,
                     "headers": HEADERS,
                     "body": json.dumps({
-                        "message": "Profile updated successfully",
-                        "profile": response.get('Attributes')
+                        "message": "Profile updated successfully" if result['written'] else "No changes",
+                        "updatedAttributes": result['changed'],
+                        "version": result['version'],
+                        "profile": result['profile'] # Merged locally, no ALL_NEW read-back
                     }, default=str)
                 }
+            except VersionConflict as conflict:
+                return {
+                    "statusCode": 409,
+                    "headers": HEADERS,
+                    "body": json.dumps({
+                        "error": "Profile was changed by another request. Reload and retry.",
+                        "currentVersion": conflict.current_version
+                    })
+                }
+            except ValueError as e:
+                return { "statusCode": 400, "headers": HEADERS, "body": json.dumps({"error": str(e)}) }
             except Exception as e:
                 logger.error(f"Update Failed: {str(e)}")
                 return { "statusCode": 500, "headers": HEADERS, "body": json.dumps({"error": f"Update failed: {str(e)}"}) }
@@ -191,7 +180,7 @@ def lambda_handler(event, context):
 
             # --- WRITE TO DYNAMODB (PUT_ITEM - Overwrites everything) ---
             try:
-                table = dynamodb.Table(DYNAMO_TABLE)
+                table = get_table(DYNAMO_TABLE)
                 table.put_item(Item={
                     'patientId': user_id,
                     'email': email,
@@ -201,7 +190,8 @@ def lambda_handler(event, context):
                     'isIdentityVerified': False, 
                     'createdAt': timestamp,
                     'avatar': None,
-                    'preferences': { "email": True, "sms": True } # Default prefs
+                    'preferences': { "email": True, "sms": True }, # Default prefs
+                    'version': 1
                 })
                 response_log.append("DynamoDB: Success")
             except Exception as e:
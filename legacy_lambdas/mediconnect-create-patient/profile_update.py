@@ -0,0 +1,112 @@
+import json
+import datetime
+from decimal import Decimal
+from botocore.exceptions import ClientError
+
+# --- DIFF-BASED PROFILE UPDATE (PUT) ---
+# 1. Read the current profile, 2. keep only fields whose value really changed,
+# 3. skip the write entirely if nothing changed, 4. otherwise write just the
+# changed fields, guarded by a `version` attribute (optimistic concurrency).
+
+VERSION_FIELD = 'version'
+MAX_REBASE_ATTEMPTS = 3
+
+
+class VersionConflict(Exception):
+    """The client's expectedVersion no longer matches what is stored."""
+
+    def __init__(self, current_version):
+        super().__init__(f"Profile was modified (current version {current_version})")
+        self.current_version = current_version
+
+
+def normalize(value):
+    """Converts request JSON into DynamoDB-comparable types (floats -> Decimal)."""
+    return json.loads(json.dumps(value), parse_float=Decimal)
+
+
+def diff_fields(current, body, allowed_fields):
+    """Returns {field: new_value} for allowed fields that differ from the stored item."""
+    changed = {}
+    for field in allowed_fields:
+        if field not in body:
+            continue
+        new_value = normalize(body[field])
+        if field not in current or current[field] != new_value:
+            changed[field] = new_value
+    return changed
+
+
+def _expected_version(body):
+    raw = body.get('expectedVersion')
+    if raw is None:
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        raise ValueError("expectedVersion must be an integer")
+
+
+def apply_profile_update(table, key, body, allowed_fields):
+    """
+    Applies a PUT body to the profile at `key`.
+
+    Returns {'written': bool, 'changed': {...}, 'version': int, 'profile': merged_item}.
+    Raises VersionConflict if the client pinned `expectedVersion` and it is stale.
+    Unpinned writes (e.g. autosave) transparently re-read and re-diff on a race.
+    """
+    expected = _expected_version(body)
+
+    for attempt in range(MAX_REBASE_ATTEMPTS):
+        current = table.get_item(Key=key, ConsistentRead=True).get('Item', {})
+        stored_version = int(current.get(VERSION_FIELD, 0))
+
+        if expected is not None and expected != stored_version:
+            raise VersionConflict(stored_version)
+
+        changed = diff_fields(current, body, allowed_fields)
+        if not changed:
+            # Identical autosave / double submit: no WCU spent
+            return {'written': False, 'changed': {}, 'version': stored_version, 'profile': current}
+
+        next_version = stored_version + 1
+        updated_at = str(datetime.datetime.now())
+
+        names = {'#version': VERSION_FIELD, '#updatedAt': 'updatedAt'}
+        values = {':next': next_version, ':updatedAt': updated_at}
+        parts = ["#version = :next", "#updatedAt = :updatedAt"]
+        for field, value in changed.items():
+            parts.append(f"#{field} = :{field}")
+            names[f"#{field}"] = field
+            values[f":{field}"] = value
+
+        if stored_version == 0:
+            condition = "attribute_not_exists(#version) OR #version = :current"
+        else:
+            condition = "#version = :current"
+        values[':current'] = stored_version
+
+        try:
+            table.update_item(
+                Key=key,
+                UpdateExpression="SET " + ", ".join(parts),
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues="NONE"
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            # Someone wrote in between: re-read. A pinned expectedVersion then fails
+            # with the real stored version; an unpinned write is re-diffed on top of it.
+            print(f"Version race on {key} (attempt {attempt + 1})")
+            continue
+
+        changed['updatedAt'] = updated_at
+        changed[VERSION_FIELD] = next_version
+        return {'written': True, 'changed': changed, 'version': next_version, 'profile': {**current, **key, **changed}}
+
+    # Lost every race: report the version that is stored now so the client can rebase
+    current = table.get_item(Key=key, ConsistentRead=True).get('Item', {})
+    raise VersionConflict(int(current.get(VERSION_FIELD, 0)))
@@ -1,22 +1,159 @@
 import json
-import boto3
 import os
 import logging
 from botocore.exceptions import ClientError
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from aws_clients import get_client
+import multipart_upload
+from multipart_upload import MultipartError
 
-# Initialize the S3 client
-s3_client = boto3.client('s3')
+# The S3 client is created lazily (and reused) by aws_clients.get_client('s3')
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+HEADERS = { "Access-Control-Allow-Origin": "*" }
+MULTIPART_ACTIONS = ('multipart-create', 'multipart-resume', 'multipart-complete', 'multipart-abort')
+PUT_URL_EXPIRES = 300                      # single PUT URLs (5 minutes)
+MULTIPART_THRESHOLD = 100 * 1024 * 1024    # batch requests: files above this get a multipart upload
+MAX_BATCH_FILES = 500
+MAX_BATCH_URLS = 2000                      # ~1 KB per URL; keeps a batch response far below Lambda's 6 MB
+CREATE_WORKERS = 16
+
+
+def new_object_key(file_name):
+    # Generate a unique ID to prevent file name conflicts.
+    # This creates a unique object key like: "uploads/a1b2c3d4/patient-xray.jpg"
+    return f"uploads/{uuid.uuid4()}/{file_name}"
+
+
+def presign_put(s3, bucket_name, object_key, content_type=None):
+    params = {'Bucket': bucket_name, 'Key': object_key}
+    if content_type:
+        # Signed into the URL: the client must PUT with this exact Content-Type
+        params['ContentType'] = content_type
+    return s3.generate_presigned_url('put_object', Params=params, ExpiresIn=PUT_URL_EXPIRES)
+
+
+def batch_response(bucket_name, files):
+    """
+    { "files": [{ "fileName", "contentType"?, "fileSize"? }, ...] } -> one upload plan per file, in order.
+    Files up to MULTIPART_THRESHOLD (or without a size) get a single PUT URL; signing is local CPU
+    work. Larger files get a multipart upload; only CreateMultipartUpload calls S3, and those run
+    in parallel.
+    """
+    if not isinstance(files, list) or not files:
+        return {"statusCode": 400, "headers": HEADERS, "body": json.dumps({"error": "'files' must be a non-empty list."})}
+    if len(files) > MAX_BATCH_FILES:
+        return {"statusCode": 400, "headers": HEADERS, "body": json.dumps({"error": f"Too many files (max {MAX_BATCH_FILES})."})}
+    for position, entry in enumerate(files):
+        size = entry.get('fileSize') if isinstance(entry, dict) else None
+        if not isinstance(entry, dict) or not entry.get('fileName') or (
+                size is not None and (not isinstance(size, int) or isinstance(size, bool) or size <= 0)):
+            return {
+                "statusCode": 400,
+                "headers": HEADERS,
+                "body": json.dumps({
+                    "error": f"File {position} needs a 'fileName'; 'fileSize', if given, must be a positive integer."
+                })
+            }
+
+    url_count = 0
+    for entry in files:
+        size = entry.get('fileSize') or 0
+        if size > MULTIPART_THRESHOLD and size <= multipart_upload.MAX_OBJECT_SIZE:
+            url_count += min(multipart_upload.part_layout(size)[1], multipart_upload.PART_URLS_PER_PAGE)
+        else:
+            url_count += 1
+    if url_count > MAX_BATCH_URLS:
+        return {
+            "statusCode": 400,
+            "headers": HEADERS,
+            "body": json.dumps({"error": f"Batch needs {url_count} upload URLs (max {MAX_BATCH_URLS}); split it."})
+        }
+
+    s3 = get_client('s3')
+
+    def plan(entry):
+        object_key = new_object_key(entry['fileName'])
+        content_type = entry.get('contentType')
+        try:
+            if (entry.get('fileSize') or 0) > MULTIPART_THRESHOLD:
+                result = multipart_upload.create(s3, bucket_name, object_key, entry['fileSize'], content_type)
+            else:
+                result = {
+                    'mode': 'single',
+                    'fileKey': object_key,
+                    'uploadURL': presign_put(s3, bucket_name, object_key, content_type),
+                    'expiresIn': PUT_URL_EXPIRES
+                }
+        except (ClientError, MultipartError) as e:
+            logger.error(f"Could not prepare upload for {entry['fileName']}: {e}")
+            result = {'mode': 'error', 'error': "Could not generate file upload URL."}
+        result['fileName'] = entry['fileName']
+        return result
+
+    large = [entry for entry in files if (entry.get('fileSize') or 0) > MULTIPART_THRESHOLD]
+    if large:
+        with ThreadPoolExecutor(max_workers=min(CREATE_WORKERS, len(files))) as pool:
+            plans = list(pool.map(plan, files))
+    else:
+        plans = [plan(entry) for entry in files]
+    logger.info(f"Prepared {len(plans)} uploads ({len(large)} multipart)")
+    return {"statusCode": 200, "headers": HEADERS, "body": json.dumps({"files": plans})}
+
+
+def multipart_response(bucket_name, body):
+    """Routes the multipart-* actions (see multipart_upload.py)."""
+    s3 = get_client('s3')
+    action = body['action']
+    try:
+        if action == 'multipart-create':
+            if not body.get('fileName'):
+                raise MultipartError("'fileName' is required")
+            result = multipart_upload.create(
+                s3, bucket_name, new_object_key(body['fileName']), body.get('fileSize'), body.get('contentType')
+            )
+        else:
+            file_key, upload_id = body.get('fileKey'), body.get('uploadId')
+            if not file_key or not upload_id:
+                raise MultipartError("'fileKey' and 'uploadId' are required")
+            if action == 'multipart-resume':
+                result = multipart_upload.resume(
+                    s3, bucket_name, file_key, upload_id, body.get('fileSize'), body.get('startPart', 1)
+                )
+            elif action == 'multipart-complete':
+                result = multipart_upload.complete(
+                    s3, bucket_name, file_key, upload_id, body.get('fileSize'), body.get('parts')
+                )
+            else:
+                result = multipart_upload.abort(s3, bucket_name, file_key, upload_id)
+    except MultipartError as e:
+        return {"statusCode": 400, "headers": HEADERS, "body": json.dumps({"error": str(e)})}
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        logger.error(f"Multipart {action} failed: {e}")
+        if code == 'NoSuchUpload':
+            return {"statusCode": 404, "headers": HEADERS, "body": json.dumps({"error": "Upload not found or already finished."})}
+        if code in ('InvalidPart', 'InvalidPartOrder', 'EntityTooSmall'):
+            return {"statusCode": 400, "headers": HEADERS, "body": json.dumps({"error": f"Parts rejected by S3 ({code})."})}
+        return {"statusCode": 500, "headers": HEADERS, "body": json.dumps({"error": "Multipart upload request failed."})}
+    logger.info(f"Multipart {action} for {result['fileKey']}")
+    return {"statusCode": 200, "headers": HEADERS, "body": json.dumps(result)}
+
+
 def lambda_handler(event, context):
     """
     This function generates a presigned URL for uploading a file to the secure
     consultation S3 bucket. It expects a JSON body with a 'fileName' key.
     Example body: { "fileName": "patient-xray.jpg" }
+
+    Large files: { "action": "multipart-create", "fileName", "fileSize", "contentType"? },
+    then "multipart-resume" / "multipart-complete" / "multipart-abort" with { "fileKey", "uploadId" }
+    (resume and complete also take "fileSize"; resume takes "startPart" to page through part URLs).
+    Several files at once: { "files": [{ "fileName", "contentType"?, "fileSize"? }, ...] }.
     """
     
     # Get the S3 bucket name from an environment variable for security.
@@ -25,13 +162,17 @@ def lambda_handler(event, context):
         logger.error("FATAL: UPLOAD_BUCKET environment variable is not set.")
         return {
             "statusCode": 500,
-            "headers": { "Access-Control-Allow-Origin": "*" },
+            "headers": HEADERS,
             "body": json.dumps({"error": "Server configuration error."})
         }
 
     # Get the original file name from the API Gateway event body
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = json.loads(event.get('body') or '{}')
+        if body.get('action') in MULTIPART_ACTIONS:
+            return multipart_response(bucket_name, body)
+        if 'files' in body:
+            return batch_response(bucket_name, body['files'])
         original_file_name = body.get('fileName')
         if not original_file_name:
             raise ValueError("fileName not found in request body.")
@@ -39,35 +180,22 @@ def lambda_handler(event, context):
         logger.error(f"Invalid request body: {e}")
         return {
             "statusCode": 400,
-            "headers": { "Access-Control-Allow-Origin": "*" },
+            "headers": HEADERS,
             "body": json.dumps({"error": "Invalid request. 'fileName' is required."})
         }
 
-    # Generate a unique ID to prevent file name conflicts.
-    # This creates a unique object key like: "uploads/a1b2c3d4/patient-xray.jpg"
-    unique_id = str(uuid.uuid4())
-    object_key = f"uploads/{unique_id}/{original_file_name}"
-
-    # Set the expiration time for the URL (300 seconds = 5 minutes)
-    expiration = 300
+    object_key = new_object_key(original_file_name)
 
     try:
-        # Generate the presigned URL for a PUT request
-        presigned_url = s3_client.generate_presigned_url(
-            'put_object',
-            Params={
-                'Bucket': bucket_name,
-                'Key': object_key
-            },
-            ExpiresIn=expiration
-        )
+        # Generate the presigned URL for a PUT request (valid PUT_URL_EXPIRES = 5 minutes)
+        presigned_url = presign_put(get_client('s3'), bucket_name, object_key)
         
         logger.info(f"Successfully generated presigned URL for {object_key}")
         
         # Return the successful response
         return {
             "statusCode": 200,
-            "headers": { "Access-Control-Allow-Origin": "*" },
+            "headers": HEADERS,
             "body": json.dumps({
                 "uploadURL": presigned_url,
                 "fileKey": object_key
@@ -78,6 +206,6 @@ def lambda_handler(event, context):
         logger.error(f"Error generating presigned URL: {e}")
         return {
             "statusCode": 500,
-            "headers": { "Access-Control-Allow-Origin": "*" },
+            "headers": HEADERS,
             "body": json.dumps({"error": "Could not generate file upload URL."})
         }
\ No newline at end of file
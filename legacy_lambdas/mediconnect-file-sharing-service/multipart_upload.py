@@ -0,0 +1,151 @@
+import math
+
+# --- MULTIPART PRESIGNED UPLOADS (large DICOM studies, consultation videos) ---
+# 1. create   -> CreateMultipartUpload + presigned UploadPart URLs; the client PUTs parts in
+#                parallel and keeps each response's ETag header
+# 2. resume   -> ListParts: parts already stored (with ETags) + fresh URLs for the missing ones,
+#                so an upload interrupted by a network drop continues where it stopped
+# Part URLs are paged (~1 KB each, Lambda responses are capped at 6 MB): a response carries at most
+# PART_URLS_PER_PAGE of them and "nextPartNumber" when more remain; fetch the rest with resume
+# and "startPart" = nextPartNumber.
+# 3. complete -> CompleteMultipartUpload; if the client could not read the ETags (bucket CORS must
+#                expose "ETag"), the part list is rebuilt server-side from ListParts. The parts must be
+#                exactly 1..partCount for the declared fileSize, so a missing part never yields a
+#                silently truncated object
+#    abort    -> AbortMultipartUpload (also set a lifecycle rule to abort incomplete uploads)
+# Uploads always live under uploads/; a client cannot complete or abort anything else.
+
+KEY_PREFIX = 'uploads/'
+PART_URL_EXPIRES = 3600                  # seconds; a part of a multi-GB upload can take a while
+MIN_PART_SIZE = 16 * 1024 * 1024         # S3 minimum is 5 MiB; larger parts = fewer requests
+MAX_PART_SIZE = 5 * 1024 ** 3            # S3 limit
+MAX_PARTS = 10000                        # S3 limit
+MAX_OBJECT_SIZE = 5 * 1024 ** 4          # S3 limit (5 TiB)
+PART_URLS_PER_PAGE = 1000               # ~1 MB of URLs per response
+MIB = 1024 * 1024
+
+
+class MultipartError(ValueError):
+    """The request cannot be turned into a valid multipart operation."""
+
+
+def part_layout(file_size):
+    """(part size, part count): MIN_PART_SIZE, grown in whole MiB until the file fits in MAX_PARTS."""
+    if not isinstance(file_size, int) or isinstance(file_size, bool) or file_size <= 0:
+        raise MultipartError("'fileSize' must be a positive integer (bytes)")
+    if file_size > MAX_OBJECT_SIZE:
+        raise MultipartError("File too large (max 5 TiB)")
+    part_size = max(MIN_PART_SIZE, math.ceil(file_size / MAX_PARTS / MIB) * MIB)
+    return part_size, math.ceil(file_size / part_size)
+
+
+def check_key(file_key):
+    if not isinstance(file_key, str) or not file_key.startswith(KEY_PREFIX) or '..' in file_key:
+        raise MultipartError("Invalid 'fileKey'")
+
+
+def presign_parts(s3, bucket, file_key, upload_id, part_numbers, expires=PART_URL_EXPIRES):
+    # Signing is local (no request to S3), so even 10,000 URLs take well under a second
+    return [{
+        'partNumber': number,
+        'url': s3.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': bucket, 'Key': file_key, 'UploadId': upload_id, 'PartNumber': number},
+            ExpiresIn=expires
+        )
+    } for number in part_numbers]
+
+
+def page_urls(s3, bucket, file_key, upload_id, part_numbers):
+    """{"parts": URLs for the first PART_URLS_PER_PAGE numbers, "nextPartNumber"?: where the next page starts}."""
+    page = list(part_numbers[:PART_URLS_PER_PAGE])
+    result = {'parts': presign_parts(s3, bucket, file_key, upload_id, page)}
+    if len(part_numbers) > len(page):
+        result['nextPartNumber'] = part_numbers[len(page)]
+    return result
+
+
+def create(s3, bucket, file_key, file_size, content_type=None):
+    part_size, part_count = part_layout(file_size)
+    params = {'Bucket': bucket, 'Key': file_key}
+    if content_type:
+        params['ContentType'] = content_type
+    upload_id = s3.create_multipart_upload(**params)['UploadId']
+    return {
+        'mode': 'multipart',
+        'fileKey': file_key,
+        'uploadId': upload_id,
+        'partSize': part_size,
+        'partCount': part_count,
+        **page_urls(s3, bucket, file_key, upload_id, range(1, part_count + 1)),
+        'expiresIn': PART_URL_EXPIRES
+    }
+
+
+def uploaded_parts(s3, bucket, file_key, upload_id):
+    """[{"PartNumber", "ETag", "Size"}] of every part S3 already holds (ListParts, paginated)."""
+    parts = []
+    kwargs = {'Bucket': bucket, 'Key': file_key, 'UploadId': upload_id}
+    while True:
+        response = s3.list_parts(**kwargs)
+        parts.extend(
+            {'PartNumber': p['PartNumber'], 'ETag': p['ETag'], 'Size': p['Size']}
+            for p in response.get('Parts', [])
+        )
+        if not response.get('IsTruncated'):
+            return parts
+        kwargs['PartNumberMarker'] = response['NextPartNumberMarker']
+
+
+def resume(s3, bucket, file_key, upload_id, file_size, start_part=1):
+    check_key(file_key)
+    part_size, part_count = part_layout(file_size)
+    if not isinstance(start_part, int) or isinstance(start_part, bool) or not 1 <= start_part <= part_count:
+        raise MultipartError(f"'startPart' must be between 1 and {part_count}")
+    done = uploaded_parts(s3, bucket, file_key, upload_id)
+    done_numbers = {p['PartNumber'] for p in done}
+    missing = [n for n in range(start_part, part_count + 1) if n not in done_numbers]
+    return {
+        'mode': 'multipart',
+        'fileKey': file_key,
+        'uploadId': upload_id,
+        'partSize': part_size,
+        'partCount': part_count,
+        'uploaded': [{'partNumber': p['PartNumber'], 'etag': p['ETag']} for p in done],
+        **page_urls(s3, bucket, file_key, upload_id, missing),
+        'expiresIn': PART_URL_EXPIRES
+    }
+
+
+def complete(s3, bucket, file_key, upload_id, file_size, parts=None):
+    check_key(file_key)
+    _, part_count = part_layout(file_size)
+    if parts:
+        try:
+            listed = [{'PartNumber': int(p['partNumber']), 'ETag': p['etag']} for p in parts]
+        except (KeyError, TypeError, ValueError):
+            raise MultipartError("Each part needs 'partNumber' and 'etag'")
+    else:
+        listed = [{'PartNumber': p['PartNumber'], 'ETag': p['ETag']} for p in uploaded_parts(s3, bucket, file_key, upload_id)]
+    if not listed:
+        raise MultipartError("No parts have been uploaded")
+    numbers = sorted(p['PartNumber'] for p in listed)
+    if numbers != list(range(1, part_count + 1)):
+        missing = sorted(set(range(1, part_count + 1)) - set(numbers))
+        raise MultipartError(
+            f"Expected parts 1..{part_count}; missing {missing[:20]}" if missing
+            else f"Expected parts 1..{part_count} exactly once each"
+        )
+    response = s3.complete_multipart_upload(
+        Bucket=bucket,
+        Key=file_key,
+        UploadId=upload_id,
+        MultipartUpload={'Parts': sorted(listed, key=lambda p: p['PartNumber'])}
+    )
+    return {'fileKey': file_key, 'etag': response.get('ETag'), 'parts': len(listed)}
+
+
+def abort(s3, bucket, file_key, upload_id):
+    check_key(file_key)
+    s3.abort_multipart_upload(Bucket=bucket, Key=file_key, UploadId=upload_id)
+    return {'fileKey': file_key, 'aborted': True}
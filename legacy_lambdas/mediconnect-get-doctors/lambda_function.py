@@ -1,15 +1,8 @@
 import json
-import boto3
 from boto3.dynamodb.conditions import Attr
-from botocore.config import Config
+from aws_clients import get_client, get_table
 
-# 🟢 CONNECT TO DYNAMODB AND S3
-dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client(
-    's3', 
-    region_name='us-east-1', 
-    config=Config(signature_version='s3v4')
-)
+# 🟢 DYNAMODB AND S3 clients are created lazily (see aws_clients.py)
 
 TABLE_NAME = "mediconnect-doctors"
 BUCKET_NAME = "mediconnect-identity-verification"
@@ -23,12 +16,13 @@ def lambda_handler(event, context):
     }
     
     try:
-        table = dynamodb.Table(TABLE_NAME)
+        table = get_table(TABLE_NAME)
         
         # 1. Scan the DOCTORS table
         response = table.scan()
         items = response.get('Items', [])
         
+        s3 = get_client('s3', 'us-east-1')
         doctors_list = []
         
         # 2. Loop through doctors and SIGN their avatar images
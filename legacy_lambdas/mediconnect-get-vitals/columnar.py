@@ -0,0 +1,87 @@
+import sys
+import math
+import struct
+import base64
+from array import array
+
+# --- COMPACT COLUMNAR ENCODINGS FOR VITALS HISTORIES ---
+# Instead of [{timestamp, heartRate, ...}, ...] (key names repeated per reading):
+#   JSON:   {"format": "columnar", "count", "t0", "dt": [...], "metrics": {"heartRate": [...]}}
+#   Binary: little-endian, base64 on the wire
+#       magic "MCV1" | uint32 count | uint8 flags | uint8 metricCount
+#       metricCount x (uint8 nameLength, name utf-8)
+#       int64 t0 | (count-1) deltas (int32, or int64 if flags & 1) | metricCount x count float32 (NaN = missing)
+
+BINARY_CONTENT_TYPE = 'application/x-mediconnect-vitals'
+MAGIC = b'MCV1'
+FLAG_WIDE_DELTAS = 1
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def wants_binary(event):
+    """True if the Accept header asks for the packed binary form."""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == 'accept' and value:
+            return BINARY_CONTENT_TYPE in value or 'application/octet-stream' in value
+    return False
+
+
+def to_columns(items, metrics, ts_of):
+    """Splits readings into a timestamp column and one value column per metric (None = missing)."""
+    timestamps = [ts_of(item) for item in items]
+    columns = {}
+    for metric in metrics:
+        columns[metric] = [None if item.get(metric) is None else float(item[metric]) for item in items]
+    return timestamps, columns
+
+
+def _deltas(timestamps):
+    return [b - a for a, b in zip(timestamps, timestamps[1:])]
+
+
+def columnar_json(items, metrics, ts_of, next_token=None):
+    timestamps, columns = to_columns(items, metrics, ts_of)
+    return {
+        'format': 'columnar',
+        'count': len(timestamps),
+        't0': timestamps[0] if timestamps else None,
+        'dt': _deltas(timestamps),
+        'metrics': columns,
+        'nextToken': next_token
+    }
+
+
+def columnar_binary(items, metrics, ts_of):
+    """Packs readings into the MCV1 layout described above and returns the raw bytes."""
+    timestamps, columns = to_columns(items, metrics, ts_of)
+    deltas = _deltas(timestamps)
+    wide = any(d < INT32_MIN or d > INT32_MAX for d in deltas)
+
+    parts = [MAGIC, struct.pack('<IBB', len(timestamps), FLAG_WIDE_DELTAS if wide else 0, len(metrics))]
+    for metric in metrics:
+        name = metric.encode('utf-8')
+        parts.append(struct.pack('<B', len(name)) + name)
+    parts.append(struct.pack('<q', timestamps[0] if timestamps else 0))
+
+    arrays = [array('q' if wide else 'i', deltas)]
+    for metric in metrics:
+        arrays.append(array('f', [math.nan if v is None else v for v in columns[metric]]))
+    for packed in arrays:
+        if sys.byteorder == 'big':
+            packed.byteswap()
+        parts.append(packed.tobytes())
+
+    return b''.join(parts)
+
+
+def binary_response(headers, items, metrics, ts_of, next_token=None):
+    response_headers = {**headers, 'Content-Type': BINARY_CONTENT_TYPE}
+    if next_token:
+        response_headers['X-Next-Token'] = next_token
+        response_headers['Access-Control-Expose-Headers'] = 'X-Next-Token'
+    return {
+        'statusCode': 200,
+        'headers': response_headers,
+        'body': base64.b64encode(columnar_binary(items, metrics, ts_of)).decode('ascii'),
+        'isBase64Encoded': True
+    }
@@ -0,0 +1,125 @@
+import math
+
+try:
+    import numpy as np  # Optional: bundle numpy (or use a numpy layer) for the vectorized path
+except ImportError:
+    np = None
+
+# --- SERVER-SIDE DOWNSAMPLING FOR VITALS CHARTS ---
+# Input: timestamps (epoch ms, ascending) + one value list per metric.
+# Output: a fixed number of points per chart, whatever the sampling rate was.
+#   - bucket: min / max / avg / count per equal-width time bucket
+#   - lttb:   Largest-Triangle-Three-Buckets (keeps the visual shape, returns real samples)
+
+MODES = ('bucket', 'lttb')
+
+
+def _clean(timestamps, values):
+    """Drops readings where the metric is missing (not every device reports every vital)."""
+    if np is not None:
+        t = np.asarray(timestamps, dtype=np.int64)
+        v = np.asarray([math.nan if x is None else float(x) for x in values], dtype=np.float64)
+        mask = ~np.isnan(v)
+        return t[mask], v[mask]
+    pairs = [(t, float(v)) for t, v in zip(timestamps, values) if v is not None]
+    return [p[0] for p in pairs], [p[1] for p in pairs]
+
+
+def bucket_aggregate(timestamps, values, start_ms, end_ms, buckets):
+    """Equal-width time buckets over [start_ms, end_ms]. Empty buckets are omitted."""
+    t, v = _clean(timestamps, values)
+    if len(t) == 0 or buckets <= 0:
+        return []
+    span = max(1, end_ms - start_ms + 1)
+    width = span / buckets
+
+    if np is not None:
+        idx = np.clip(((t - start_ms) * buckets) // span, 0, buckets - 1)
+        # timestamps are sorted, so each bucket is a contiguous run -> reduceat
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(idx)) + 1))
+        counts = np.diff(np.concatenate((starts, [len(v)])))
+        mins = np.minimum.reduceat(v, starts)
+        maxs = np.maximum.reduceat(v, starts)
+        avgs = np.add.reduceat(v, starts) / counts
+        return [
+            {
+                "t": int(start_ms + int(b) * width),
+                "min": float(lo), "max": float(hi), "avg": round(float(mean), 3), "count": int(n)
+            }
+            for b, lo, hi, mean, n in zip(idx[starts], mins, maxs, avgs, counts)
+        ]
+
+    out = []
+    current = None
+    for ts, value in zip(t, v):
+        b = min(buckets - 1, max(0, ((ts - start_ms) * buckets) // span))
+        if current is None or current["_b"] != b:
+            if current is not None:
+                out.append(current)
+            current = {"_b": b, "t": int(start_ms + b * width), "min": value, "max": value, "sum": value, "count": 1}
+        else:
+            current["min"] = min(current["min"], value)
+            current["max"] = max(current["max"], value)
+            current["sum"] += value
+            current["count"] += 1
+    out.append(current)
+    return [
+        {"t": c["t"], "min": c["min"], "max": c["max"], "avg": round(c["sum"] / c["count"], 3), "count": c["count"]}
+        for c in out
+    ]
+
+
+def lttb(timestamps, values, threshold):
+    """Largest-Triangle-Three-Buckets. Returns [{"t", "v"}] with at most `threshold` real samples."""
+    t, v = _clean(timestamps, values)
+    n = len(t)
+    if threshold >= n or threshold < 3:
+        return [{"t": int(a), "v": float(b)} for a, b in zip(t, v)]
+
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average point of the NEXT bucket is the third triangle vertex
+        next_start = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        start = int(math.floor(i * every)) + 1
+        end = int(math.floor((i + 1) * every)) + 1
+
+        if np is not None:
+            avg_t = t[next_start:next_end].mean()
+            avg_v = v[next_start:next_end].mean()
+            areas = np.abs(
+                (t[a] - avg_t) * (v[start:end] - v[a]) - (t[a] - t[start:end]) * (avg_v - v[a])
+            )
+            a = start + int(np.argmax(areas))
+        else:
+            count = next_end - next_start
+            avg_t = sum(t[next_start:next_end]) / count
+            avg_v = sum(v[next_start:next_end]) / count
+            best_area = -1.0
+            best = start
+            for j in range(start, end):
+                area = abs((t[a] - avg_t) * (v[j] - v[a]) - (t[a] - t[j]) * (avg_v - v[a]))
+                if area > best_area:
+                    best_area = area
+                    best = j
+            a = best
+        selected.append(a)
+
+    selected.append(n - 1)
+    return [{"t": int(t[i]), "v": float(v[i])} for i in selected]
+
+
+def downsample(items, metrics, mode, points, start_ms, end_ms, ts_of):
+    """Downsamples DynamoDB items (ascending by time) into {metric: [points]}."""
+    timestamps = [ts_of(item) for item in items]
+    series = {}
+    for metric in metrics:
+        values = [item.get(metric) for item in items]
+        if mode == 'lttb':
+            series[metric] = lttb(timestamps, values, points)
+        else:
+            series[metric] = bucket_aggregate(timestamps, values, start_ms, end_ms, points)
+    return series
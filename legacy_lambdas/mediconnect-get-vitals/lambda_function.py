@@ -1,12 +1,16 @@
 import json
-import boto3
-from boto3.dynamodb.conditions import Key
+import time
 from decimal import Decimal
+from aws_clients import get_table
+from vitals_query import parse_time, item_time, query_page, query_all, METRICS, MAX_PAGE_LIMIT
+from downsample import downsample, MODES
+from columnar import wants_binary, columnar_json, binary_response
+from rollups import choose_resolution, query_rollups, rollup_series, RESOLUTIONS, ROLLUP_TABLE
 
-# 1. Initialize DynamoDB
-# We access the table where IoT Core is saving the data
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('mediconnect-iot-vitals')
+# 1. DynamoDB table where IoT Core is saving the data (handle is built lazily)
+TABLE_NAME = 'mediconnect-iot-vitals'
+DEFAULT_POINTS = 200
+MAX_POINTS = 2000
 
 # Helper Class: Fixes the crash when DynamoDB returns Numbers as 'Decimal' objects
 class DecimalEncoder(json.JSONEncoder):
@@ -19,17 +23,23 @@ def lambda_handler(event, context):
     # 2. CORS Headers (CRITICAL: Required for React Frontend)
     headers = {
         'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization,Accept',
         'Access-Control-Allow-Methods': 'GET, OPTIONS'
     }
 
     try:
         # 3. Parse Query Parameters
         # Example URL: /vitals?patientId=p-123&limit=20
+        #              /vitals?patientId=p-123&from=2026-01-01T00:00:00Z&to=2026-01-08T00:00:00Z
+        #              /vitals?patientId=p-123&from=...&downsample=bucket&points=300
+        #              /vitals?patientId=p-123&limit=1000&format=columnar (or Accept: application/x-mediconnect-vitals)
+        #                limit is capped at MAX_PAGE_LIMIT (1000); page on with &nextToken=<nextToken from the body,
+        #                or the X-Next-Token header for binary>
+        #              /vitals?patientId=p-123&from=...&resolution=auto (rollup tiers: 1m / 1h / 1d)
         params = event.get('queryStringParameters', {}) or {}
         
         patient_id = params.get('patientId')
-        limit = int(params.get('limit', 20))  # Default to last 20 readings if not specified
+        limit = min(int(params.get('limit', 20)), MAX_PAGE_LIMIT)  # Default to last 20 readings if not specified
 
         # Validation
         if not patient_id:
@@ -39,18 +49,126 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'Missing required parameter: patientId'})
             }
 
-        # 4. Query Database
-        # KeyCondition: Match the patientId
-        # ScanIndexForward=False: Sort by Timestamp DESCENDING (Newest first)
-        response = table.query(
-            KeyConditionExpression=Key('patientId').eq(patient_id),
-            ScanIndexForward=False, 
-            Limit=limit
-        )
+        try:
+            from_ms = parse_time(params.get('from'))
+            to_ms = parse_time(params.get('to'))
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'from/to must be ISO-8601 or epoch time'})
+            }
+
+        table = get_table(TABLE_NAME)
+        mode = params.get('downsample')
+        resolution = params.get('resolution')
 
-        items = response.get('Items', [])
+        if mode and mode not in MODES:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': f"downsample must be one of {', '.join(MODES)}"})
+            }
+        if resolution and resolution not in RESOLUTIONS:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': f"resolution must be one of {', '.join(RESOLUTIONS)}"})
+            }
+        if (mode or resolution) and from_ms is None:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'downsample/resolution requires a from parameter'})
+            }
+
+        if mode or resolution:
+            if to_ms is None:
+                to_ms = int(time.time() * 1000)
+            points = max(3, min(int(params.get('points', DEFAULT_POINTS)), MAX_POINTS))
+            metrics = [m for m in (params.get('metrics') or ','.join(METRICS)).split(',') if m in METRICS]
+
+        # 4a. PRE-AGGREGATED ROLLUPS: cheapest tier that still gives `points` buckets
+        if resolution:
+            if resolution == 'auto':
+                resolution = choose_resolution(from_ms, to_ms, points)
+            if resolution != 'raw':
+                buckets = query_rollups(get_table(ROLLUP_TABLE), patient_id, resolution, from_ms, to_ms)
+                return {
+                    'statusCode': 200,
+                    'headers': headers,
+                    'body': json.dumps({
+                        'patientId': patient_id,
+                        'from': from_ms,
+                        'to': to_ms,
+                        'resolution': resolution,
+                        'points': points,
+                        'rawCount': len(buckets),
+                        'truncated': False,
+                        'series': rollup_series(buckets, metrics, points, from_ms, to_ms)
+                    }, cls=DecimalEncoder)
+                }
+            mode = mode or 'bucket'
+
+        # 4b. DOWNSAMPLED CHART FROM RAW READINGS: fixed number of points per metric
+        if mode:
+            items, truncated = query_all(table, patient_id, from_ms, to_ms, metrics)
+            series = downsample(items, metrics, mode, points, from_ms, to_ms, item_time)
+
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': json.dumps({
+                    'patientId': patient_id,
+                    'from': from_ms,
+                    'to': to_ms,
+                    'mode': mode,
+                    'resolution': 'raw',
+                    'points': points,
+                    'rawCount': len(items),
+                    'truncated': truncated,
+                    'series': series
+                }, cls=DecimalEncoder)
+            }
+
+        # 4c. RAW READINGS, one page at a time (nextToken = opaque LastEvaluatedKey)
+        # ScanIndexForward=False: Sort by Timestamp DESCENDING (Newest first) unless order=asc
+        binary = wants_binary(event)
+        columnar = binary or params.get('format') == 'columnar'
+        metrics = [m for m in (params.get('metrics') or ','.join(METRICS)).split(',') if m in METRICS]
+        try:
+            items, next_token = query_page(
+                table, patient_id, from_ms, to_ms,
+                limit=limit,
+                token=params.get('nextToken'),
+                newest_first=params.get('order', 'desc') != 'asc',
+                metrics=metrics if columnar else None
+            )
+        except ValueError as e:
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+
+        # Compact histories: parallel arrays (JSON) or packed MCV1 binary (see columnar.py)
+        if binary:
+            return binary_response(headers, items, metrics, item_time, next_token)
+        if columnar:
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': json.dumps(columnar_json(items, metrics, item_time, next_token))
+            }
 
         # 5. Return Data to Frontend
+        if from_ms is not None or to_ms is not None:
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': json.dumps({'items': items, 'nextToken': next_token}, cls=DecimalEncoder)
+            }
+
+        # Legacy shape (bare array); the cursor travels in a header so old clients keep working
+        if next_token:
+            headers['X-Next-Token'] = next_token
+            headers['Access-Control-Expose-Headers'] = 'X-Next-Token'
         return {
             'statusCode': 200,
             'headers': headers,
@@ -0,0 +1,93 @@
+import os
+import time
+from boto3.dynamodb.conditions import Key
+
+# --- READ SIDE OF THE VITALS ROLLUPS (written by mediconnect-vitals-rollup) ---
+
+ROLLUP_TABLE = os.environ.get('ROLLUP_TABLE', 'mediconnect-iot-vitals-rollup')
+
+DAY_MS = 86400000
+# (resolution, bucket width ms, retention days or None = keep forever), finest first
+# ⚠️ Keep in sync with mediconnect-vitals-rollup/lambda_function.py
+TIERS = (
+    ('1m', 60000, 30),
+    ('1h', 3600000, 400),
+    ('1d', DAY_MS, None)
+)
+RESOLUTIONS = ('raw', 'auto') + tuple(t[0] for t in TIERS)
+
+
+def choose_resolution(from_ms, to_ms, points, now_ms=None):
+    """
+    Cheapest tier for a chart: the coarsest rollup whose buckets are still no wider
+    than (range / points) and whose retention reaches back to from_ms.
+    Returns 'raw' when the range is too short for any rollup to give enough points.
+    """
+    now_ms = now_ms or int(time.time() * 1000)
+    target_width = (to_ms - from_ms) / max(points, 1)
+    for resolution, width, retention_days in reversed(TIERS):
+        if width > target_width:
+            continue
+        if retention_days and from_ms < now_ms - retention_days * DAY_MS:
+            continue
+        return resolution
+    # Range too short (or too old for the fine tiers): read raw readings instead
+    return 'raw'
+
+
+def query_rollups(table, patient_id, resolution, from_ms, to_ms):
+    """All rollup buckets for one patient/tier in [from_ms, to_ms], oldest first."""
+    width = next(w for r, w, _ in TIERS if r == resolution)
+    kwargs = {
+        # Include the bucket that *contains* from_ms
+        'KeyConditionExpression': Key('rollupKey').eq(f"{patient_id}#{resolution}")
+        & Key('bucket').between(from_ms - from_ms % width, to_ms),
+        'ScanIndexForward': True
+    }
+    items = []
+    while True:
+        response = table.query(**kwargs)
+        items.extend(response.get('Items', []))
+        if not response.get('LastEvaluatedKey'):
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def rollup_series(items, metrics, points, from_ms, to_ms):
+    """
+    Turns rollup items into {metric: [{t, min, max, avg, count, last}]}, merging
+    neighbouring buckets when the tier returned more buckets than `points`.
+    """
+    span = max(1, to_ms - from_ms + 1)
+    width = span / points
+    series = {}
+    for metric in metrics:
+        out = []
+        for item in items:
+            stats = item.get(metric)
+            if not stats:
+                continue
+            bucket = int(item['bucket'])
+            index = min(points - 1, max(0, (bucket - from_ms) * points // span))
+            if out and out[-1]['_i'] == index:
+                prev = out[-1]
+                prev['min'] = min(prev['min'], stats['min'])
+                prev['max'] = max(prev['max'], stats['max'])
+                prev['sum'] += stats['sum']
+                prev['count'] += stats['count']
+                prev['last'] = stats['last']
+            else:
+                out.append({
+                    '_i': index,
+                    't': bucket if len(items) <= points else int(from_ms + index * width),
+                    'min': stats['min'], 'max': stats['max'], 'sum': stats['sum'],
+                    'count': stats['count'], 'last': stats['last']
+                })
+        series[metric] = [
+            {
+                't': b['t'], 'min': float(b['min']), 'max': float(b['max']),
+                'avg': round(float(b['sum'] / b['count']), 3), 'count': int(b['count']), 'last': float(b['last'])
+            }
+            for b in out
+        ]
+    return series
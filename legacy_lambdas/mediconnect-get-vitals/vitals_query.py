@@ -0,0 +1,98 @@
+import os
+import json
+import base64
+import datetime
+from boto3.dynamodb.conditions import Key
+from vitals_time import parse_time
+
+# --- TIME-RANGE QUERIES ON THE VITALS SORT KEY ---
+# Table: PK = patientId, SK = timestamp (String). IoT rules write epoch milliseconds
+# as a string; set VITALS_TS_FORMAT=iso if a table stores ISO-8601 instead.
+
+TS_FORMAT = os.environ.get('VITALS_TS_FORMAT', 'epoch_ms')
+MAX_PAGE_LIMIT = 1000
+MAX_RANGE_ITEMS = int(os.environ.get('VITALS_MAX_RANGE_ITEMS', '200000'))
+METRICS = ('heartRate', 'systolicBP', 'diastolicBP', 'oxygenLevel')
+
+
+def to_sort_key(ms):
+    if TS_FORMAT == 'iso':
+        return datetime.datetime.fromtimestamp(ms / 1000, tz=datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+    return str(ms)
+
+
+def item_time(item):
+    """Epoch ms of a stored reading."""
+    return parse_time(item.get('timestamp'))
+
+
+def encode_token(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key, default=str).encode('utf-8')).decode('ascii')
+
+
+def decode_token(token):
+    if not token:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid nextToken")
+
+
+def key_condition(patient_id, from_ms=None, to_ms=None):
+    condition = Key('patientId').eq(patient_id)
+    if from_ms is not None and to_ms is not None:
+        return condition & Key('timestamp').between(to_sort_key(from_ms), to_sort_key(to_ms))
+    if from_ms is not None:
+        return condition & Key('timestamp').gte(to_sort_key(from_ms))
+    if to_ms is not None:
+        return condition & Key('timestamp').lte(to_sort_key(to_ms))
+    return condition
+
+
+def _projection(metrics):
+    names = {'#ts': 'timestamp'}
+    for i, metric in enumerate(metrics):
+        names[f"#m{i}"] = metric
+    return {'ProjectionExpression': ", ".join(names.keys()), 'ExpressionAttributeNames': names}
+
+
+def query_page(table, patient_id, from_ms=None, to_ms=None, limit=20, token=None, newest_first=True, metrics=None):
+    """One page of raw readings (optionally projected to `metrics`). Returns (items, nextToken)."""
+    kwargs = {
+        'KeyConditionExpression': key_condition(patient_id, from_ms, to_ms),
+        'ScanIndexForward': not newest_first,
+        'Limit': limit
+    }
+    if metrics:
+        kwargs.update(_projection(metrics))
+    start_key = decode_token(token)
+    if start_key:
+        kwargs['ExclusiveStartKey'] = start_key
+    response = table.query(**kwargs)
+    return response.get('Items', []), encode_token(response.get('LastEvaluatedKey'))
+
+
+def query_all(table, patient_id, from_ms, to_ms, metrics=METRICS):
+    """
+    Every reading in [from_ms, to_ms], oldest first, following LastEvaluatedKey
+    (1 MB pages) to the end. Only the sort key and requested metrics are projected.
+    Returns (items, truncated).
+    """
+    kwargs = {
+        'KeyConditionExpression': key_condition(patient_id, from_ms, to_ms),
+        'ScanIndexForward': True,
+        **_projection(metrics)
+    }
+    items = []
+    while True:
+        response = table.query(**kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return items, False
+        if len(items) >= MAX_RANGE_ITEMS:
+            return items, True
+        kwargs['ExclusiveStartKey'] = last_key
@@ -0,0 +1,165 @@
+import numpy as np  # Required for this job: deploy with a numpy layer
+
+# --- CSR GRAPH ANALYTICS ---
+# The graph table stores every edge in both directions (PK -> SK); build_csr symmetrizes anyway so a
+# half-written edge still links its endpoints. Nodes are interned to 0..n-1 and the adjacency is held as CSR:
+#   indptr  int64[n + 1]   neighbours of node i are indices[indptr[i]:indptr[i + 1]]
+#   indices int32[m]
+# ~12 bytes per directed edge; every metric below is a handful of array passes over it.
+
+MAX_MIDDLE_DEGREE = 200   # skip hub "middle" nodes when counting shared neighbours (d^2 pairs)
+
+
+class CSRGraph:
+    def __init__(self, names, indptr, indices):
+        self.names = names
+        self.indptr = indptr
+        self.indices = indices
+
+    @property
+    def node_count(self):
+        return len(self.names)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def node_types(self):
+        """Entity prefix ("DOCTOR", "PATIENT", ...) per node, as (type names, int code per node)."""
+        prefixes = [name.split('#', 1)[0] if '#' in name else 'UNKNOWN' for name in self.names]
+        types = sorted(set(prefixes))
+        lookup = {t: i for i, t in enumerate(types)}
+        return types, np.fromiter((lookup[p] for p in prefixes), dtype=np.int16, count=len(prefixes))
+
+
+def build_csr(edges):
+    """edges: iterable of (PK, SK) strings -> undirected CSRGraph (duplicates and self loops dropped)."""
+    ids = {}
+    names = []
+    src, dst = [], []
+    for a, b in edges:
+        if a == b:
+            continue
+        for name in (a, b):
+            if name not in ids:
+                ids[name] = len(names)
+                names.append(name)
+        src.append(ids[a])
+        dst.append(ids[b])
+
+    n = len(names)
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    # Symmetrize, dedupe (a, b) pairs via a single int64 code, then group by source
+    src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+    codes = np.unique(src * max(n, 1) + dst)
+    src, dst = codes // max(n, 1), codes % max(n, 1)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return CSRGraph(names, indptr, dst.astype(np.int32))
+
+
+def degree_distribution(graph, top=20):
+    """Per entity type: histogram {degree: nodes}, summary stats and the highest-degree entities."""
+    degrees = graph.degrees()
+    types, codes = graph.node_types()
+    result = {}
+    for code, type_name in enumerate(types):
+        members = np.flatnonzero(codes == code)
+        if not len(members):
+            continue
+        d = degrees[members]
+        values, counts = np.unique(d, return_counts=True)
+        best = members[np.argsort(-d, kind='stable')[:top]]
+        result[type_name] = {
+            'nodes': int(len(members)),
+            'edges': int(d.sum()),
+            'mean': round(float(d.mean()), 3),
+            'median': float(np.median(d)),
+            'max': int(d.max()),
+            'histogram': {str(int(v)): int(c) for v, c in zip(values, counts)},
+            'top': [{'id': graph.names[i], 'degree': int(degrees[i])} for i in best]
+        }
+    return result
+
+
+def shared_neighbours(graph, node_type, via_type, top=100, max_middle_degree=MAX_MIDDLE_DEGREE):
+    """
+    Pairs of `node_type` entities ranked by how many `via_type` neighbours they share
+    (e.g. doctors by shared patients). Middle nodes are grouped by degree so each group's
+    pairs come out of one fancy-indexing step: no per-node Python loop.
+    """
+    types, codes = graph.node_types()
+    if node_type not in types or via_type not in types:
+        return []
+    target = codes == types.index(node_type)
+    degrees = graph.degrees()
+    middles = np.flatnonzero((codes == types.index(via_type)) & (degrees >= 2) & (degrees <= max_middle_degree))
+    n = graph.node_count
+
+    pair_codes = []
+    for d in np.unique(degrees[middles]):
+        group = middles[degrees[middles] == d]
+        block = graph.indices[graph.indptr[group][:, None] + np.arange(d)]  # len(group) x d neighbour ids
+        left, right = np.triu_indices(int(d), 1)
+        a, b = block[:, left].ravel().astype(np.int64), block[:, right].ravel().astype(np.int64)
+        keep = target[a] & target[b]
+        a, b = np.minimum(a[keep], b[keep]), np.maximum(a[keep], b[keep])
+        pair_codes.append(a * n + b)
+
+    if not pair_codes:
+        return []
+    pairs, counts = np.unique(np.concatenate(pair_codes), return_counts=True)
+    best = np.argsort(-counts, kind='stable')[:top]
+    return [{
+        'a': graph.names[int(pairs[i] // n)],
+        'b': graph.names[int(pairs[i] % n)],
+        'shared': int(counts[i])
+    } for i in best]
+
+
+def connected_components(graph):
+    """
+    Component label per node (label = smallest node index in the component).
+    Min-label propagation along edges plus pointer jumping; each round is a few vector passes
+    over the edge array and care graphs (shallow, hub-and-spoke) settle in a handful of rounds.
+    """
+    n = graph.node_count
+    labels = np.arange(n, dtype=np.int64)
+    src = np.repeat(np.arange(n, dtype=np.int64), graph.degrees())
+    dst = graph.indices.astype(np.int64)
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, src, labels[dst])
+        # Pointer jumping: follow label -> label's label until stable
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def component_summary(graph, labels, top=20, sample=50):
+    types, codes = graph.node_types()
+    roots, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    values, counts = np.unique(sizes, return_counts=True)
+    clusters = []
+    for rank in np.argsort(-sizes, kind='stable')[:top]:
+        members = np.flatnonzero(inverse == rank)
+        by_type = np.bincount(codes[members], minlength=len(types))
+        clusters.append({
+            'size': int(sizes[rank]),
+            'byType': {types[i]: int(c) for i, c in enumerate(by_type) if c},
+            'sample': [graph.names[i] for i in members[:sample]]
+        })
+    return {
+        'components': int(len(roots)),
+        'largest': int(sizes.max()) if len(sizes) else 0,
+        'sizeHistogram': {str(int(v)): int(c) for v, c in zip(values, counts)},
+        'clusters': clusters
+    }
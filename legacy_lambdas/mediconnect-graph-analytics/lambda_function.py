@@ -0,0 +1,81 @@
+import os
+import json
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from aws_clients import get_table, worker_table
+from graph_analytics import (
+    build_csr, degree_distribution, shared_neighbours, connected_components, component_summary
+)
+
+# --- OFFLINE GRAPH ANALYTICS JOB ---
+# Trigger: EventBridge schedule (e.g. nightly) or a manual invocation.
+# 1. Parallel segmented Scan of the graph table (keys only) -> edge list
+# 2. CSR adjacency in NumPy -> degree distribution, doctors ranked by shared patients, care clusters
+# 3. Results written back to the graph table under PK = ANALYTICS_PK, one item per metric, where
+#    mediconnect-graph-service serves them (GET ?analytics=degrees|sharedPatients|clusters|meta).
+
+GRAPH_TABLE_NAME = os.environ.get('GRAPH_TABLE_NAME', 'mediconnect-graph-data')
+ANALYTICS_PK = 'ANALYTICS#latest'
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '8'))
+TOP_SHARED_PAIRS = 200
+
+
+def scan_segment(segment, total_segments):
+    kwargs = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'ProjectionExpression': 'PK, SK'
+    }
+    edges = []
+    # Segments scan in parallel: each worker borrows its own Table (resources are not thread-safe)
+    with worker_table(GRAPH_TABLE_NAME) as table:
+        while True:
+            response = table.scan(**kwargs)
+            edges.extend(
+                (item['PK'], item['SK']) for item in response.get('Items', [])
+                if not item['PK'].startswith('ANALYTICS#')
+            )
+            if 'LastEvaluatedKey' not in response:
+                return edges
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def export_edges(total_segments=SCAN_SEGMENTS):
+    with ThreadPoolExecutor(max_workers=total_segments) as pool:
+        segments = pool.map(lambda s: scan_segment(s, total_segments), range(total_segments))
+        return [edge for segment in segments for edge in segment]
+
+
+def write_summaries(summaries):
+    with get_table(GRAPH_TABLE_NAME).batch_writer() as batch:
+        for name, payload in summaries.items():
+            # Stored as a JSON string: no float -> Decimal conversion, one attribute to read back
+            batch.put_item(Item={'PK': ANALYTICS_PK, 'SK': name, 'data': json.dumps(payload)})
+
+
+def lambda_handler(event, context):
+    started = time.time()
+    edges = export_edges()
+    scanned = time.time()
+
+    graph = build_csr(edges)
+    labels = connected_components(graph)
+    summaries = {
+        'degrees': degree_distribution(graph),
+        'sharedPatients': shared_neighbours(graph, 'DOCTOR', 'PATIENT', top=TOP_SHARED_PAIRS),
+        'clusters': component_summary(graph, labels)
+    }
+    computed = time.time()
+
+    summaries['meta'] = {
+        'generatedAt': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'nodes': graph.node_count,
+        'edges': graph.edge_count,
+        'scanSeconds': round(scanned - started, 2),
+        'computeSeconds': round(computed - scanned, 2)
+    }
+    write_summaries(summaries)
+
+    print(f"✅ Graph analytics: {summaries['meta']}")
+    return {"statusCode": 200, "body": json.dumps(summaries['meta'])}
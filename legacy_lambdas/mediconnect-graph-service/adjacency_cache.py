@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from array import array
+from collections import OrderedDict
+
+# --- IN-CONTAINER ADJACENCY CACHE ---
+# Hot entities (a popular doctor with thousands of patient edges) are read on almost every traversal.
+# Warm containers keep their adjacency lists here instead of re-querying DynamoDB:
+#   - entity ids and relationship labels are interned to small ints, so a cached list is two
+#     array('i') (neighbour ids, relationship ids): 8 bytes per edge. Evicted lists leave their ids
+#     behind, so once the interner holds more than INTERN_FACTOR x max_edges names it is rebuilt
+#     from the live entries only;
+#   - LRU bounded by total cached edges (not entries), each entry expires after ADJACENCY_TTL_SECONDS;
+#   - writes through this function invalidate both endpoints immediately. Other containers only
+#     see a new edge once their entry expires, so the TTL is the staleness bound.
+
+TTL_SECONDS = float(os.environ.get('ADJACENCY_TTL_SECONDS', '60'))
+MAX_CACHED_EDGES = int(os.environ.get('ADJACENCY_CACHE_EDGES', '250000'))
+INTERN_FACTOR = 2
+
+
+class Interner:
+    """str <-> int, append-only until the owning cache compacts it."""
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        found = self.ids.get(name)
+        if found is None:
+            found = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return found
+
+    def name(self, number):
+        return self.names[number]
+
+
+class AdjacencyCache:
+    def __init__(self, ttl=TTL_SECONDS, max_edges=MAX_CACHED_EDGES):
+        self.ttl = ttl
+        self.max_edges = max_edges
+        self.nodes = Interner()
+        self.labels = Interner()
+        self.entries = OrderedDict()  # (node id, relationship filter) -> (expires, neighbours, relationships)
+        self.keys_by_node = {}        # node id -> {cached keys}, so invalidation never scans the LRU
+        self.edges = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # traversal fans out on a thread pool
+
+    @staticmethod
+    def _filter_key(relationships):
+        return frozenset(relationships) if relationships else None
+
+    def get(self, entity_id, relationships=None):
+        """[(neighbour, relationship)] or None on a miss. A cached full list also answers filtered reads."""
+        with self.lock:
+            node = self.nodes.ids.get(entity_id)
+            if node is None:
+                self.misses += 1
+                return None
+            wanted = self._filter_key(relationships)
+            now = time.monotonic()
+            for key in ((node, wanted), (node, None)) if wanted else ((node, None),):
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    self._drop(key)
+                    continue
+                self.entries.move_to_end(key)
+                self.hits += 1
+                name, label = self.nodes.name, self.labels.name
+                pairs = [(name(n), label(r)) for n, r in zip(entry[1], entry[2])]
+                if key[1] is None and wanted:
+                    pairs = [p for p in pairs if p[1] in wanted]
+                return pairs
+            self.misses += 1
+            return None
+
+    def put(self, entity_id, pairs, relationships=None):
+        """Caches a COMPLETE adjacency list (never a capped/partial one)."""
+        if len(pairs) > self.max_edges:
+            return
+        with self.lock:
+            key = (self.nodes.intern(entity_id), self._filter_key(relationships))
+            neighbours = array('i', (self.nodes.intern(n) for n, _ in pairs))
+            labels = array('i', (self.labels.intern(r or '') for _, r in pairs))
+            self._drop(key)
+            self.entries[key] = (time.monotonic() + self.ttl, neighbours, labels)
+            self.keys_by_node.setdefault(key[0], set()).add(key)
+            self.edges += len(neighbours)
+            while self.edges > self.max_edges and self.entries:
+                self._drop(next(iter(self.entries)))
+            if len(self.nodes.names) > INTERN_FACTOR * self.max_edges + len(self.entries):
+                self._compact()
+
+    def invalidate(self, *entity_ids):
+        with self.lock:
+            for entity_id in entity_ids:
+                node = self.nodes.ids.get(entity_id)
+                for key in list(self.keys_by_node.get(node, ())):
+                    self._drop(key)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.edges -= len(entry[1])
+            keys = self.keys_by_node.get(key[0])
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_node[key[0]]
+
+    def _compact(self):
+        """Re-interns the live entries into fresh tables; ids of evicted lists are forgotten. O(cached edges)."""
+        nodes, labels = Interner(), Interner()
+        old_node, old_label = self.nodes.name, self.labels.name
+        entries, keys_by_node = OrderedDict(), {}
+        for (node, wanted), (expires, neighbours, relationships) in self.entries.items():
+            key = (nodes.intern(old_node(node)), wanted)
+            entries[key] = (
+                expires,
+                array('i', (nodes.intern(old_node(n)) for n in neighbours)),
+                array('i', (labels.intern(old_label(r)) for r in relationships))
+            )
+            keys_by_node.setdefault(key[0], set()).add(key)
+        self.nodes, self.labels = nodes, labels
+        self.entries, self.keys_by_node = entries, keys_by_node
+
+    def stats(self):
+        return {'entries': len(self.entries), 'edges': self.edges, 'hits': self.hits, 'misses': self.misses}
+
+
+# One cache per container, shared by every invocation it serves
+cache = AdjacencyCache()
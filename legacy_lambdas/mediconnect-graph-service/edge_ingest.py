@@ -0,0 +1,243 @@
+import math
+import time
+import random
+import datetime
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from aws_clients import worker_resource, worker_table
+from graph_keys import edge_item, KEY_ATTRIBUTES
+
+# --- BULK EDGE INGESTION ---
+# POST {"edges": [{"entityA", "entityB", "relationship", "reverseRelationship"?, "attributes"?}, ...]}
+#   -> deduplicated on (PK, SK), expanded into forward + reverse items, written by WRITE_WORKERS
+#      threads, each sending 25-item BatchWriteItem calls and retrying UnprocessedItems with backoff.
+#   Attributes may not reuse key names (PK, SK, relationship, relSK); floats are stored as Decimal.
+# Backfill: {"backfill": "appointments", "totalSegments": 8} (or one {"segment", "totalSegments"} per
+#   invocation for very large tables) scans mediconnect-appointments in parallel segments and writes
+#   the same isTreatedBy / treats edges the booking transaction creates. Direct invocation only: the
+#   full-table scan is not reachable through API Gateway. Backfilled edges are upserted, not put:
+#   an existing edge keeps its createdAt, and lastVisit only ever moves forward.
+
+APPOINTMENTS_TABLE = "mediconnect-appointments"
+BATCH_WRITE_LIMIT = 25     # DynamoDB hard limit per BatchWriteItem call
+WRITE_WORKERS = 8
+MAX_EDGES_PER_REQUEST = 20000
+MAX_RETRIES = 8
+BASE_BACKOFF_SECONDS = 0.05
+MAX_BACKOFF_SECONDS = 5.0
+
+
+class IngestError(ValueError):
+    """The request body could not be turned into edges."""
+
+
+def _backoff(attempt):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+def _to_dynamo(value, position):
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise IngestError(f"Edge {position} has a non-finite number attribute")
+        return Decimal(str(value))
+    if isinstance(value, list):
+        return [_to_dynamo(v, position) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_dynamo(v, position) for k, v in value.items()}
+    return value
+
+
+def _attributes(edge, field, position):
+    attributes = edge.get(field) or {}
+    if not isinstance(attributes, dict):
+        raise IngestError(f"Edge {position} '{field}' must be an object")
+    reserved = sorted(set(attributes) & set(KEY_ATTRIBUTES))
+    if reserved:
+        raise IngestError(f"Edge {position} '{field}' uses reserved names: {', '.join(reserved)}")
+    return _to_dynamo(attributes, position)
+
+
+def expand_edges(edges, created_at):
+    """Validates, expands A<->B into two items and dedupes on (PK, SK); the last occurrence wins."""
+    items = {}
+    for position, edge in enumerate(edges):
+        if not isinstance(edge, dict):
+            raise IngestError(f"Edge {position} is not an object")
+        entity_a, entity_b = edge.get('entityA'), edge.get('entityB')
+        relationship = edge.get('relationship')
+        if not all([entity_a, entity_b, relationship]):
+            raise IngestError(f"Edge {position} must contain 'entityA', 'entityB', and 'relationship'")
+        if entity_a == entity_b:
+            raise IngestError(f"Edge {position} links {entity_a} to itself")
+        reverse = edge.get('reverseRelationship') or relationship
+        forward_attrs = {**_attributes(edge, 'attributes', position), 'createdAt': created_at}
+        reverse_field = 'reverseAttributes' if edge.get('reverseAttributes') else 'attributes'
+        reverse_attrs = {**_attributes(edge, reverse_field, position), 'createdAt': created_at}
+        items[(entity_a, entity_b)] = edge_item(entity_a, entity_b, relationship, **forward_attrs)
+        items[(entity_b, entity_a)] = edge_item(entity_b, entity_a, reverse, **reverse_attrs)
+    return list(items.values())
+
+
+def _write_chunk(table_name, chunk):
+    """One BatchWriteItem call, re-sending UnprocessedItems until they drain. Returns retry count."""
+    request = {table_name: [{'PutRequest': {'Item': item}} for item in chunk]}
+    attempt = 0
+    # Runs on a pool worker: borrow a resource instead of sharing one across threads
+    with worker_resource('dynamodb') as dynamodb:
+        while request:
+            response = dynamodb.batch_write_item(RequestItems=request)
+            request = response.get('UnprocessedItems') or {}
+            if request:
+                if attempt >= MAX_RETRIES:
+                    pending = len(request.get(table_name, []))
+                    raise RuntimeError(f"BatchWriteItem gave up with {pending} unprocessed items")
+                time.sleep(_backoff(attempt))
+                attempt += 1
+    return attempt
+
+
+def write_items(table_name, items, workers=WRITE_WORKERS):
+    """Parallel 25-item BatchWriteItem pipeline. Returns {"items", "batches", "retries"}."""
+    chunks = [items[i:i + BATCH_WRITE_LIMIT] for i in range(0, len(items), BATCH_WRITE_LIMIT)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        retries = sum(pool.map(lambda chunk: _write_chunk(table_name, chunk), chunks))
+    return {'items': len(items), 'batches': len(chunks), 'retries': retries}
+
+
+def ingest(table_name, edges):
+    if not isinstance(edges, list) or not edges:
+        raise IngestError("'edges' must be a non-empty list")
+    if len(edges) > MAX_EDGES_PER_REQUEST:
+        raise IngestError(f"Too many edges (max {MAX_EDGES_PER_REQUEST} per request)")
+    created_at = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    items = expand_edges(edges, created_at)
+    result = write_items(table_name, items)
+    result['received'] = len(edges)
+    result['entities'] = sorted({item['PK'] for item in items})
+    return result
+
+
+def _scan_segment(segment, total_segments):
+    """Latest visit per (patient, doctor) pair in one scan segment."""
+    kwargs = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        # Any CANCELLED_* variant (no-show, doctor fault) is not a treatment relationship
+        'FilterExpression': ~Attr('status').begins_with('CANCELLED'),
+        'ProjectionExpression': 'patientId, doctorId, patientName, doctorName, timeSlot'
+    }
+    pairs = {}
+    with worker_table(APPOINTMENTS_TABLE) as table:
+        while True:
+            response = table.scan(**kwargs)
+            for item in response.get('Items', []):
+                if not item.get('patientId') or not item.get('doctorId'):
+                    continue
+                key = (item['patientId'], item['doctorId'])
+                if key not in pairs or str(item.get('timeSlot', '')) > str(pairs[key].get('timeSlot', '')):
+                    pairs[key] = item
+            if 'LastEvaluatedKey' not in response:
+                return pairs
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def appointment_edges(segments, total_segments):
+    """Edges for every (patient, doctor) pair seen in the given scan segments (scanned in parallel)."""
+    pairs = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(segments))) as pool:
+        for found in pool.map(lambda s: _scan_segment(s, total_segments), segments):
+            for key, item in found.items():
+                if key not in pairs or str(item.get('timeSlot', '')) > str(pairs[key].get('timeSlot', '')):
+                    pairs[key] = item
+
+    edges = []
+    for (patient_id, doctor_id), item in pairs.items():
+        last_visit = item.get('timeSlot')
+        edges.append({
+            'entityA': f"PATIENT#{patient_id}",
+            'entityB': f"DOCTOR#{doctor_id}",
+            'relationship': 'isTreatedBy',
+            'reverseRelationship': 'treats',
+            'attributes': {'doctorName': item.get('doctorName'), 'lastVisit': last_visit},
+            'reverseAttributes': {'patientName': item.get('patientName'), 'lastVisit': last_visit}
+        })
+    return edges
+
+
+def _upsert_edge(table, item):
+    """UpdateItem for one backfilled edge. Returns True if lastVisit was left alone (already newer)."""
+    assignments = ['#createdAt = if_not_exists(#createdAt, :createdAt)']
+    names = {'#createdAt': 'createdAt'}
+    values = {':createdAt': item['createdAt']}
+    for position, (field, value) in enumerate(sorted(item.items())):
+        if field in ('PK', 'SK', 'createdAt', 'lastVisit'):
+            continue
+        assignments.append(f"#a{position} = :a{position}")
+        names[f"#a{position}"] = field
+        values[f":a{position}"] = value
+    kwargs = {'Key': {'PK': item['PK'], 'SK': item['SK']}}
+
+    if 'lastVisit' in item:
+        try:
+            table.update_item(
+                UpdateExpression='SET ' + ', '.join(assignments + ['#lastVisit = :lastVisit']),
+                ConditionExpression='attribute_not_exists(#lastVisit) OR #lastVisit < :lastVisit',
+                ExpressionAttributeNames={**names, '#lastVisit': 'lastVisit'},
+                ExpressionAttributeValues={**values, ':lastVisit': item['lastVisit']},
+                **kwargs
+            )
+            return False
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            # A newer visit is already recorded: refresh the rest of the edge, keep that lastVisit
+
+    table.update_item(
+        UpdateExpression='SET ' + ', '.join(assignments),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        **kwargs
+    )
+    return 'lastVisit' in item
+
+
+def _upsert_chunk(table_name, chunk):
+    with worker_table(table_name) as table:
+        return sum(_upsert_edge(table, item) for item in chunk)
+
+
+def upsert_items(table_name, items, workers=WRITE_WORKERS):
+    """Parallel UpdateItem pipeline for backfill. Returns {"items", "keptNewerVisit"}."""
+    chunks = [items[i:i + BATCH_WRITE_LIMIT] for i in range(0, len(items), BATCH_WRITE_LIMIT)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        kept = sum(pool.map(lambda chunk: _upsert_chunk(table_name, chunk), chunks))
+    return {'items': len(items), 'keptNewerVisit': kept}
+
+
+def backfill(table_name, options):
+    """Backfills graph edges from historical appointments. Returns the write summary."""
+    if options.get('backfill') != 'appointments':
+        raise IngestError("Only 'appointments' can be backfilled")
+    total_segments = int(options.get('totalSegments', WRITE_WORKERS))
+    if options.get('segment') is not None:
+        segments = [int(options['segment'])]
+    else:
+        segments = list(range(total_segments))
+    if not total_segments >= 1 or any(not 0 <= s < total_segments for s in segments):
+        raise IngestError("segment must be in [0, totalSegments)")
+
+    started = time.time()
+    edges = appointment_edges(segments, total_segments)
+    created_at = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    items = [
+        {k: v for k, v in item.items() if v is not None}
+        for item in expand_edges(edges, created_at)
+    ]
+    # UpdateItem rather than BatchWriteItem: a PutRequest would replace live edges wholesale
+    result = upsert_items(table_name, items)
+    result.update(pairs=len(edges), segments=segments, seconds=round(time.time() - started, 2),
+                  entities=sorted({item['PK'] for item in items}))
+    return result
@@ -0,0 +1,30 @@
+import os
+
+# --- GRAPH TABLE KEY LAYOUT ---
+# Base table:  PK = entity, SK = neighbour   (point lookups by {PK, SK} elsewhere keep working)
+# Every edge also carries relSK = "<relationship>#<neighbour>", the sort key of a GSI:
+#   RelationshipIndex: PK (HASH), relSK (RANGE), projection KEYS_ONLY + relationship
+# so "only isTreatedBy edges of PATIENT#1" is Key('PK').eq(...) & Key('relSK').begins_with('isTreatedBy#')
+# instead of reading every edge and filtering. Set RELATIONSHIP_INDEX once the GSI exists and old
+# edges have been backfilled with relSK (the index is sparse: edges without relSK are not in it).
+
+RELATIONSHIP_INDEX = os.environ.get('RELATIONSHIP_INDEX')
+REL_SORT_KEY = 'relSK'
+
+
+def rel_sort_key(relationship, neighbour):
+    return f"{relationship}#{neighbour}"
+
+
+KEY_ATTRIBUTES = ('PK', 'SK', 'relationship', REL_SORT_KEY)
+
+
+def edge_item(entity, neighbour, relationship, **attributes):
+    # Key attributes go last: an attribute named like a key can never redirect the write
+    return {
+        **attributes,
+        'PK': entity,
+        'SK': neighbour,
+        'relationship': relationship,
+        REL_SORT_KEY: rel_sort_key(relationship, neighbour)
+    }
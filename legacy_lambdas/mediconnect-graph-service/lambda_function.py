@@ -1,21 +1,28 @@
 import json
-import boto3
 import os
 import logging
-from boto3.dynamodb.conditions import Key
+from aws_clients import get_table
+from adjacency_cache import cache
+from graph_keys import edge_item
+from edge_ingest import ingest, backfill, IngestError
+from traversal import (
+    traverse, parse_path, neighbours_page,
+    DEFAULT_HOP_LIMIT, MAX_HOP_LIMIT, MAX_PAGE_LIMIT
+)
+
+ANALYTICS_PK = 'ANALYTICS#latest'  # ⚠️ Keep in sync with mediconnect-graph-analytics
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize DynamoDB client
-dynamodb = boto3.resource('dynamodb')
-
 def lambda_handler(event, context):
     """
     Handles Graph Relationships (Create & Read).
     - POST: Creates a bidirectional relationship (A->B, B->A).
-    - GET: Fetches all relationships for a specific Entity ID.
+    - GET: Fetches all relationships for a specific Entity ID (paged with limit/nextToken),
+           or k-hop neighbours with ?hops=N / ?path=rel1,rel2 (see traversal.py),
+           or a precomputed summary with ?analytics=degrees|sharedPatients|clusters|meta.
     """
     
     # 🔒 CORS HEADERS (Required for React Frontend)
@@ -42,14 +49,32 @@ def lambda_handler(event, context):
             "body": json.dumps({"error": "Server configuration error: GRAPH_TABLE_NAME missing."})
         }
         
-    table = dynamodb.Table(table_name)
+    table = get_table(table_name)
 
     try:
+        # --- BACKFILL (direct / scheduled invocation, no API Gateway) ---
+        if not event.get('httpMethod') and event.get('backfill'):
+            result = backfill(table_name, event)
+            cache.invalidate(*result.pop('entities', []))
+            logger.info(f"Backfill complete: {result}")
+            return {"statusCode": 200, "body": json.dumps(result)}
+
         # --- READ LOGIC (GET) ---
         if event.get('httpMethod') == 'GET':
             params = event.get('queryStringParameters') or {}
             entity_id = params.get('entityId') # e.g., "PATIENT#123"
 
+            # 🟢 PRECOMPUTED ANALYTICS (written by mediconnect-graph-analytics)
+            if params.get('analytics'):
+                summary = table.get_item(Key={'PK': ANALYTICS_PK, 'SK': params['analytics']}).get('Item')
+                if not summary:
+                    return {"statusCode": 404, "headers": headers, "body": json.dumps({"error": "No analytics summary with that name yet."})}
+                return {
+                    "statusCode": 200,
+                    "headers": {**headers, "Content-Type": "application/json"},
+                    "body": summary['data']
+                }
+
             if not entity_id:
                 return {
                     "statusCode": 400,
@@ -57,12 +82,53 @@ def lambda_handler(event, context):
                     "body": json.dumps({"error": "Missing 'entityId' query parameter."})
                 }
 
-            # Query DynamoDB for all items where PK matches the Entity ID
-            response = table.query(
-                KeyConditionExpression=Key('PK').eq(entity_id)
-            )
-            
-            items = response.get('Items', [])
+            # 🟢 K-HOP TRAVERSAL: one request instead of client-side loops
+            if params.get('hops') or params.get('path'):
+                try:
+                    path = parse_path(params)
+                    hop_limit = min(int(params.get('hopLimit', DEFAULT_HOP_LIMIT)), MAX_HOP_LIMIT)
+                except ValueError as e:
+                    return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": str(e)})}
+
+                result = traverse(table, entity_id, path, hop_limit=hop_limit)
+                nodes = result['nodes']
+                target = params.get('targetPrefix')  # e.g. "DOCTOR#" -> only doctors in the answer
+                if target:
+                    nodes = [n for n in nodes if n['id'].startswith(target)]
+                return {
+                    "statusCode": 200,
+                    "headers": headers,
+                    "body": json.dumps({
+                        "entity": entity_id,
+                        "hops": len(path),
+                        "count": len(nodes),
+                        "nodes": nodes,
+                        "truncated": result['truncated']
+                    })
+                }
+
+            relationships = {r.strip() for r in (params.get('relationship') or '').split(',') if r.strip()} or None
+
+            # Paged: ?limit=&nextToken=
+            if params.get('limit') or params.get('nextToken'):
+                try:
+                    limit = min(int(params.get('limit', 100)), MAX_PAGE_LIMIT)
+                    items, next_token = neighbours_page(table, entity_id, relationships, limit, params.get('nextToken'))
+                except ValueError as e:
+                    return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": str(e)})}
+                return {
+                    "statusCode": 200,
+                    "headers": headers,
+                    "body": json.dumps({"entity": entity_id, "connections": items, "nextToken": next_token}, default=str)
+                }
+
+            # Query DynamoDB for all items where PK matches the Entity ID (every page, not just the first)
+            items, next_token = [], None
+            while True:
+                page, next_token = neighbours_page(table, entity_id, relationships, MAX_PAGE_LIMIT, next_token)
+                items.extend(page)
+                if not next_token:
+                    break
             
             return {
                 "statusCode": 200,
@@ -70,12 +136,30 @@ def lambda_handler(event, context):
                 "body": json.dumps({
                     "entity": entity_id,
                     "connections": items
-                })
+                }, default=str)
             }
 
         # --- WRITE LOGIC (POST) ---
         if event.get('httpMethod') == 'POST':
             body = json.loads(event.get('body', '{}'))
+
+            # 🔒 The backfill scans the whole appointments table: direct invocation only (see above)
+            if 'backfill' in body:
+                return {"statusCode": 403, "headers": headers, "body": json.dumps({"error": "Backfill is not available over the API."})}
+
+            # 🟢 BULK: {"edges": [...]}
+            if 'edges' in body:
+                try:
+                    result = ingest(table_name, body['edges'])
+                except IngestError as e:
+                    return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": str(e)})}
+                cache.invalidate(*result.pop('entities', []))
+                return {
+                    "statusCode": 201,
+                    "headers": headers,
+                    "body": json.dumps({"message": "Edges ingested successfully.", **result})
+                }
+
             entity_a = body.get('entityA')
             entity_b = body.get('entityB')
             relationship = body.get('relationship')
@@ -88,20 +172,13 @@ def lambda_handler(event, context):
             # Use BatchWriter for atomic-like write of both directions
             with table.batch_writer() as batch:
                 # 1. Forward (A -> B)
-                batch.put_item(Item={
-                    'PK': entity_a,
-                    'SK': entity_b,
-                    'relationship': relationship,
-                    'createdAt': '2026-01-16T00:00:00Z' # Simplified timestamp
-                })
+                batch.put_item(Item=edge_item(entity_a, entity_b, relationship, createdAt='2026-01-16T00:00:00Z'))  # Simplified timestamp
                 
                 # 2. Reverse (B -> A)
-                batch.put_item(Item={
-                    'PK': entity_b,
-                    'SK': entity_a,
-                    'relationship': relationship,
-                    'createdAt': '2026-01-16T00:00:00Z'
-                })
+                batch.put_item(Item=edge_item(entity_b, entity_a, relationship, createdAt='2026-01-16T00:00:00Z'))
+
+            # Both adjacency lists changed: drop this container's cached copies
+            cache.invalidate(entity_a, entity_b)
                 
             return {
                 "statusCode": 201,
@@ -0,0 +1,157 @@
+import json
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key, Attr
+from aws_clients import worker_table
+from adjacency_cache import cache
+from graph_keys import RELATIONSHIP_INDEX, REL_SORT_KEY
+
+# --- MULTI-HOP TRAVERSAL OVER THE GRAPH TABLE ---
+# Table layout: PK = entity ("DOCTOR#1"), SK = neighbour ("PATIENT#9"), relationship = edge label.
+# BFS: every frontier is fanned out with one (fully paginated) query per node, in parallel.
+# A visited set keeps each entity at its first (shortest) hop; per-hop limits cap the blast radius
+# of hub nodes such as doctors with thousands of patients. Complete adjacency lists are served from
+# (and fed into) the container's adjacency cache; relationship filters use RelationshipIndex when set.
+#
+# Example: "all doctors who treated patients of doctor X"
+#   GET ?entityId=DOCTOR#X&path=treats,isTreatedBy
+
+MAX_HOPS = 4
+DEFAULT_HOP_LIMIT = 500
+MAX_HOP_LIMIT = 5000
+MAX_TOTAL_NODES = 10000
+QUERY_WORKERS = 16
+MAX_PAGE_LIMIT = 1000
+
+
+def encode_token(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode('utf-8')).decode('ascii')
+
+
+def decode_token(token):
+    if not token:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid nextToken")
+
+
+def _query_kwargs(entity_id, relationships):
+    kwargs = {
+        'KeyConditionExpression': Key('PK').eq(entity_id),
+        'ProjectionExpression': 'SK, relationship'
+    }
+    if relationships:
+        kwargs['FilterExpression'] = Attr('relationship').is_in(list(relationships))
+    return kwargs
+
+
+def _adjacency_queries(entity_id, relationships):
+    """Query kwargs that together return the node's (filtered) edges: one key-condition query per
+    relationship on the index, or one filtered query on the base table."""
+    if relationships and RELATIONSHIP_INDEX:
+        return [{
+            'IndexName': RELATIONSHIP_INDEX,
+            'KeyConditionExpression': Key('PK').eq(entity_id) & Key(REL_SORT_KEY).begins_with(f"{relationship}#"),
+            'ProjectionExpression': 'SK, relationship'
+        } for relationship in sorted(relationships)]
+    return [_query_kwargs(entity_id, relationships)]
+
+
+def neighbours_page(table, entity_id, relationships=None, limit=100, token=None):
+    """One page of a single node's edges. Returns (items, nextToken)."""
+    kwargs = _query_kwargs(entity_id, relationships)
+    kwargs['Limit'] = limit
+    del kwargs['ProjectionExpression']  # the one-hop API returns full edge items (base table only)
+    start_key = decode_token(token)
+    if start_key:
+        kwargs['ExclusiveStartKey'] = start_key
+    response = table.query(**kwargs)
+    return response.get('Items', []), encode_token(response.get('LastEvaluatedKey'))
+
+
+def neighbours(table, entity_id, relationships=None, cap=None):
+    """All (neighbour, relationship) pairs of one node, following LastEvaluatedKey; stops at `cap`."""
+    cached = cache.get(entity_id, relationships)
+    if cached is not None:
+        if cap is not None and len(cached) >= cap:
+            return cached[:cap], True
+        return cached, False
+
+    found = []
+    for kwargs in _adjacency_queries(entity_id, relationships):
+        while True:
+            response = table.query(**kwargs)
+            found.extend((item['SK'], item.get('relationship')) for item in response.get('Items', []))
+            if cap is not None and len(found) >= cap:
+                return found[:cap], True  # partial: never cached
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    cache.put(entity_id, found, relationships)
+    return found, False
+
+
+def _worker_neighbours(table_name, entity_id, relationships, cap):
+    # Pool workers never share the caller's Table: boto3 resources are not thread-safe
+    with worker_table(table_name) as table:
+        return neighbours(table, entity_id, relationships, cap=cap)
+
+
+def parse_path(params):
+    """
+    Relationship filter per hop:
+      path=treats,isTreatedBy        -> hop 1 follows 'treats', hop 2 'isTreatedBy' (hops = len(path))
+      hops=2&relationship=a,b        -> both hops follow 'a' or 'b'
+      hops=2                         -> any relationship
+    Returns a list with one set (or None = any) per hop.
+    """
+    if params.get('path'):
+        path = [{part.strip()} for part in params['path'].split(',') if part.strip()]
+    else:
+        hops = int(params.get('hops', 1))
+        allowed = {r.strip() for r in (params.get('relationship') or '').split(',') if r.strip()} or None
+        path = [allowed] * hops
+    if not 1 <= len(path) <= MAX_HOPS:
+        raise ValueError(f"hops must be between 1 and {MAX_HOPS}")
+    return path
+
+
+def traverse(table, start, path, hop_limit=DEFAULT_HOP_LIMIT, max_nodes=MAX_TOTAL_NODES):
+    """
+    BFS from `start`, one hop per entry in `path`.
+    Returns {"nodes": [{id, hop, via, relationship}], "truncated": bool}; nodes are in BFS order.
+    """
+    visited = {start}
+    frontier = [start]
+    nodes = []
+    truncated = False
+
+    with ThreadPoolExecutor(max_workers=QUERY_WORKERS) as pool:
+        for hop, relationships in enumerate(path, start=1):
+            if not frontier:
+                break
+            # Each node can contribute at most hop_limit edges; pool.map keeps frontier order
+            results = pool.map(
+                lambda node: _worker_neighbours(table.name, node, relationships, hop_limit), frontier
+            )
+
+            next_frontier = []
+            for source, (edges, capped) in zip(frontier, results):
+                truncated = truncated or capped
+                for neighbour, relationship in edges:
+                    if neighbour in visited:
+                        continue
+                    if len(next_frontier) >= hop_limit or len(nodes) >= max_nodes:
+                        truncated = True
+                        break
+                    visited.add(neighbour)
+                    next_frontier.append(neighbour)
+                    nodes.append({'id': neighbour, 'hop': hop, 'via': source, 'relationship': relationship})
+            frontier = next_frontier
+
+    return {'nodes': nodes, 'truncated': truncated}
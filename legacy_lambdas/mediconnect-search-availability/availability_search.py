@@ -0,0 +1,105 @@
+from slot_index import index_bits
+
+try:
+    import numpy as np  # Optional: bundle numpy (or use a numpy layer) for the vectorized path
+except ImportError:
+    np = None
+
+# --- MULTI-DOCTOR FREE-SLOT SEARCH ---
+# Every slotIndex shares one UTC grid (epoch is a UTC midnight, slot length divides a day),
+# so the search window maps to the same column range for every doctor:
+#   offered  = D x S bit matrix cut out of each doctor's slotIndex
+#   booked   = D x S bit matrix from confirmed appointments
+#   free     = offered & ~booked
+# Ranking: earliest start first; ties go to the doctor with the most free slots in the window.
+
+
+def window_grid(from_ms, to_ms, slot_ms):
+    """First slot start >= from_ms on the shared grid and the number of slots starting before to_ms."""
+    start = -(-from_ms // slot_ms) * slot_ms
+    count = max(0, -(-(to_ms - start) // slot_ms))
+    return start, count
+
+
+def offered_row(slot_index, start_ms, count):
+    """The doctor's offered slots in the window as an int (bit 0 = start_ms)."""
+    epoch, slot_ms, _, bits = index_bits(slot_index)
+    offset = (start_ms - epoch) // slot_ms
+    if offset >= 0:
+        bits >>= offset
+    else:
+        bits <<= -offset
+    return bits & ((1 << count) - 1) if count else 0
+
+
+def booked_row(booked_starts, start_ms, count, slot_ms, duration_ms):
+    """Bitset of window slots overlapped by any [booking, booking + duration)."""
+    row = 0
+    end_ms = start_ms + count * slot_ms
+    for booked in booked_starts:
+        if booked >= end_ms or booked + duration_ms <= start_ms:
+            continue
+        first = max(0, (booked - start_ms) // slot_ms)
+        last = min(count, -(-(booked + duration_ms - start_ms) // slot_ms))
+        row |= ((1 << (last - first)) - 1) << first
+    return row
+
+
+def _bit_matrix(rows, count):
+    """int bitsets -> D x count bool matrix (one little-endian byte buffer, unpacked in one call)."""
+    width = (count + 7) // 8
+    packed = np.frombuffer(b''.join(r.to_bytes(width, 'little') for r in rows), dtype=np.uint8)
+    return np.unpackbits(packed.reshape(len(rows), width), axis=1, bitorder='little')[:, :count].astype(bool)
+
+
+def _rank_vectorized(offered, booked, count):
+    avail = _bit_matrix(offered, count)
+    taken = _bit_matrix(booked, count)
+    free = avail & ~taken
+    free_count = free.sum(axis=1)
+    order = np.argsort(-free_count, kind='stable')
+    by_rank = free[order].T  # S x D, doctors pre-sorted by free slots
+
+    def ranked():
+        # Column by column (earliest first); the caller stops as soon as it has `limit` slots
+        for col in np.flatnonzero(by_rank.any(axis=1)).tolist():
+            for row in order[np.flatnonzero(by_rank[col])].tolist():
+                yield row, col
+
+    return ranked(), free_count.tolist()
+
+
+def _rank_python(offered, booked, count):
+    free = [a & ~b for a, b in zip(offered, booked)]
+    free_count = [bin(f).count('1') for f in free]
+    candidates = []
+    for row, bits in enumerate(free):
+        while bits:
+            lowest = bits & -bits
+            candidates.append((lowest.bit_length() - 1, -free_count[row], row))
+            bits ^= lowest
+    candidates.sort()
+    return ((c[2], c[0]) for c in candidates), free_count
+
+
+def rank_free_slots(offered, booked, count, limit, per_doctor=0):
+    """
+    offered / booked: one int bitset per doctor (same order), `count` columns wide.
+    Returns ([(row, column)], free_count per row): best `limit` slots, at most `per_doctor`
+    per doctor when per_doctor > 0.
+    """
+    if not offered or not count:
+        return [], [0] * len(offered)
+    rank = _rank_vectorized if np is not None else _rank_python
+    ranked, free_count = rank(offered, booked, count)
+
+    picked = []
+    taken = {}
+    for row, col in ranked:
+        if per_doctor and taken.get(row, 0) >= per_doctor:
+            continue
+        taken[row] = taken.get(row, 0) + 1
+        picked.append((row, col))
+        if len(picked) >= limit:
+            break
+    return picked, free_count
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import random
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key, Attr
+from aws_clients import get_resource, get_table, worker_table
+from slot_index import materialize, covers, iso, parse_time, ScheduleError, SLOT_MINUTES, DAY_MS
+from availability_search import window_grid, offered_row, booked_row, rank_free_slots
+
+# --- MULTI-DOCTOR AVAILABILITY SEARCH ---
+# GET ?specialization=Cardiology&from=...&to=...  ->  ranked free slots across every matching doctor.
+# One call replaces N schedule GETs + N appointment queries: offered slots come from the
+# slotIndex bitmaps written by update-schedule, booked slots from the appointments DoctorIndex.
+
+DOCTORS_TABLE = "mediconnect-doctors"
+SCHEDULES_TABLE = "mediconnect-doctor-schedules"
+APPOINTMENTS_TABLE = "mediconnect-appointments"
+
+APPOINTMENT_MINUTES = int(os.environ.get('APPOINTMENT_MINUTES', '60'))  # matches the calendar event length
+DIRECTORY_TTL_SECONDS = int(os.environ.get('DIRECTORY_TTL_SECONDS', '300'))
+BOOKING_QUERY_WORKERS = 16
+MAX_SEARCH_DAYS = 14
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# Every cancellation variant (CANCELLED, CANCELLED_NO_SHOW, CANCELLED_DOCTOR_FAULT, ...) frees the slot
+INACTIVE_STATUS_PREFIX = 'CANCELLED'
+
+# Warm containers reuse the doctor directory (id, name, specialization) for DIRECTORY_TTL_SECONDS
+_directory = {'loaded': 0.0, 'doctors': []}
+
+
+def load_directory():
+    if time.time() - _directory['loaded'] < DIRECTORY_TTL_SECONDS:
+        return _directory['doctors']
+    table = get_table(DOCTORS_TABLE)
+    scan_kwargs = {
+        'FilterExpression': Attr('role').eq('doctor'),
+        'ProjectionExpression': 'doctorId, #n, specialization',
+        'ExpressionAttributeNames': {'#n': 'name'}
+    }
+    doctors = []
+    while True:
+        response = table.scan(**scan_kwargs)
+        doctors.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    _directory.update(loaded=time.time(), doctors=doctors)
+    return doctors
+
+
+def load_schedules(doctor_ids):
+    """{doctorId: schedule item} via BatchGetItem (100 keys per call, UnprocessedKeys retried)."""
+    dynamodb = get_resource('dynamodb')
+    found = {}
+    for start in range(0, len(doctor_ids), 100):
+        request = {SCHEDULES_TABLE: {
+            'Keys': [{'doctorId': d} for d in doctor_ids[start:start + 100]],
+            'ProjectionExpression': 'doctorId, schedule, timezone, slotIndex'
+        }}
+        attempt = 0
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(SCHEDULES_TABLE, []):
+                found[item['doctorId']] = item
+            request = response.get('UnprocessedKeys') or {}
+            if request:
+                attempt += 1
+                if attempt > 6:
+                    raise RuntimeError("Schedule lookup throttled; try again")
+                time.sleep(random.uniform(0, min(2.0, 0.05 * 2 ** attempt)))
+    return found
+
+
+def _booked_for(doctor_id, from_iso, to_iso):
+    kwargs = {
+        'IndexName': 'DoctorIndex',
+        'KeyConditionExpression': Key('doctorId').eq(doctor_id),
+        'FilterExpression': Attr('timeSlot').between(from_iso, to_iso) & ~Attr('status').begins_with(INACTIVE_STATUS_PREFIX),
+        'ProjectionExpression': 'timeSlot'
+    }
+    starts = []
+    # One Table handle per worker thread: boto3 resources are not thread-safe
+    with worker_table(APPOINTMENTS_TABLE) as table:
+        while True:
+            response = table.query(**kwargs)
+            for item in response.get('Items', []):
+                try:
+                    starts.append(parse_time(item['timeSlot']))
+                except (KeyError, ValueError):
+                    continue
+            if 'LastEvaluatedKey' not in response:
+                return starts
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def load_bookings(doctor_ids, from_ms, to_ms):
+    """{doctorId: [booked start ms]}; one DoctorIndex query per doctor, run in parallel."""
+    # Bookings that started up to one appointment length before the window still overlap it
+    from_iso = iso(from_ms - APPOINTMENT_MINUTES * 60000)
+    to_iso = iso(to_ms)
+    with ThreadPoolExecutor(max_workers=BOOKING_QUERY_WORKERS) as pool:
+        results = pool.map(lambda d: _booked_for(d, from_iso, to_iso), doctor_ids)
+        return dict(zip(doctor_ids, results))
+
+
+def lambda_handler(event, context):
+    # 🔒 STANDARD CORS HEADERS
+    headers = {
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Headers": "Content-Type,Authorization",
+        "Access-Control-Allow-Methods": "OPTIONS,GET"
+    }
+
+    try:
+        if event.get('httpMethod') == 'OPTIONS':
+            return {"statusCode": 200, "headers": headers, "body": json.dumps("OK")}
+
+        params = event.get('queryStringParameters') or {}
+        specialization = (params.get('specialization') or '').strip()
+        if not specialization or not params.get('from'):
+            return {
+                "statusCode": 400,
+                "headers": headers,
+                "body": json.dumps({"error": "specialization and from are required"})
+            }
+
+        try:
+            now_ms = int(datetime.datetime.now(datetime.timezone.utc).timestamp() * 1000)
+            from_ms = max(parse_time(params['from']), now_ms)
+            to_ms = parse_time(params['to']) if params.get('to') else from_ms + DAY_MS
+            limit = int(params.get('limit', DEFAULT_LIMIT))
+            per_doctor = int(params.get('perDoctor', 0))
+        except ValueError:
+            return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": "Invalid from/to/limit parameter"})}
+        if not 1 <= limit <= MAX_LIMIT or per_doctor < 0:
+            return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": f"limit must be between 1 and {MAX_LIMIT}, perDoctor must not be negative"})}
+        if to_ms - from_ms > MAX_SEARCH_DAYS * DAY_MS:
+            return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": f"Window too large (max {MAX_SEARCH_DAYS} days)"})}
+
+        # 1. Matching doctors (case-insensitive specialization)
+        wanted = specialization.lower()
+        doctors = [d for d in load_directory() if str(d.get('specialization', '')).lower() == wanted]
+        if not doctors:
+            return {"statusCode": 200, "headers": headers, "body": json.dumps({"count": 0, "slots": [], "doctors": {}})}
+        ids = [d['doctorId'] for d in doctors]
+
+        # 2. Offered slots (precomputed bitmaps) + booked slots
+        slot_ms = SLOT_MINUTES * 60000
+        start_ms, count = window_grid(from_ms, to_ms, slot_ms)
+        schedules = load_schedules(ids)
+        scheduled = [d for d in ids if d in schedules and schedules[d].get('schedule')]
+        bookings = load_bookings(scheduled, from_ms, to_ms)
+
+        offered, booked = [], []
+        for doctor_id in scheduled:
+            item = schedules[doctor_id]
+            slot_index = item.get('slotIndex')
+            if (not covers(slot_index, start_ms, start_ms + count * slot_ms)
+                    or int(slot_index['slotMinutes']) != SLOT_MINUTES):
+                # Stale or missing index: expand in memory (update-schedule persists a fresh one on its next read)
+                try:
+                    slot_index = materialize(item['schedule'], item.get('timezone', 'UTC'))
+                except ScheduleError as e:
+                    print(f"⚠️ Skipping {doctor_id}: {str(e)}")
+                    slot_index = None
+            offered.append(offered_row(slot_index, start_ms, count) if slot_index else 0)
+            booked.append(booked_row(bookings.get(doctor_id, []), start_ms, count, slot_ms, APPOINTMENT_MINUTES * 60000))
+
+        # 3. AND + rank
+        picked, free_count = rank_free_slots(offered, booked, count, limit, per_doctor)
+
+        by_id = {d['doctorId']: d for d in doctors}
+        slots = [{
+            "doctorId": scheduled[row],
+            "start": iso(start_ms + col * slot_ms),
+            "end": iso(start_ms + (col + 1) * slot_ms)
+        } for row, col in picked]
+        summary = {
+            doctor_id: {
+                "name": by_id[doctor_id].get('name'),
+                "timezone": schedules[doctor_id].get('timezone', 'UTC'),
+                "freeSlots": int(free_count[row])
+            }
+            for row, doctor_id in enumerate(scheduled) if free_count[row]
+        }
+
+        return {
+            "statusCode": 200,
+            "headers": headers,
+            "body": json.dumps({
+                "specialization": specialization,
+                "from": iso(from_ms),
+                "to": iso(to_ms),
+                "slotMinutes": SLOT_MINUTES,
+                "doctorsSearched": len(scheduled),
+                "count": len(slots),
+                "slots": slots,
+                "doctors": summary
+            })
+        }
+
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return {
+            "statusCode": 500,
+            "headers": headers,
+            "body": json.dumps({"error": str(e)})
+        }
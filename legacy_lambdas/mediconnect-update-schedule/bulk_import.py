@@ -0,0 +1,203 @@
+import os
+import csv
+import io
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key, Attr
+from aws_clients import worker_table
+from slot_index import (
+    normalize_template, template_to_schedule, get_zone, materialize_template,
+    offered_intervals, parse_time, iso, ScheduleError, MATERIALIZE_WEEKS
+)
+from interval_tree import IntervalTree
+
+# --- BULK SCHEDULE IMPORT (clinic onboarding) ---
+# One POST carries many doctors, either as JSON
+#   {"doctors": [{"doctorId", "timezone", "schedule"}, ...], "onConflict": "skip"|"overwrite", "dryRun": false}
+# or as CSV (Content-Type: text/csv, or {"csv": "..."}) with one row per working interval:
+#   doctorId,timezone,day,start,end
+# Every template is validated strictly (overlaps are errors, not silently merged), normalized to the
+# canonical {"Monday": ["09:00-12:00"]} form and materialized once. Future bookings that the new
+# template no longer covers are found with an interval tree per doctor, then everything that passes
+# is written through a single batch_writer.
+
+APPOINTMENTS_TABLE = "mediconnect-appointments"
+APPOINTMENT_MINUTES = int(os.environ.get('APPOINTMENT_MINUTES', '60'))
+MAX_BULK_DOCTORS = 1000
+BOOKING_QUERY_WORKERS = 16
+CONFLICT_POLICIES = ('skip', 'overwrite')
+CSV_COLUMNS = ('doctorId', 'timezone', 'day', 'start', 'end')
+
+
+def is_csv(event):
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == 'content-type' and value:
+            return 'text/csv' in value
+    return False
+
+
+def _cell(row, column):
+    # Short rows give None for the missing columns
+    return (row.get(column) or '').strip()
+
+
+def parse_csv(text):
+    """CSV rows -> [{"doctorId", "timezone", "schedule"}] (rows grouped per doctor, order kept)."""
+    if not isinstance(text, str):
+        raise ScheduleError("CSV body must be text")
+    reader = csv.DictReader(io.StringIO(text.strip()))
+    missing = [c for c in CSV_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ScheduleError(f"CSV is missing columns: {', '.join(missing)}")
+
+    doctors = {}
+    for line, row in enumerate(reader, start=2):
+        if None in row:
+            raise ScheduleError(f"Line {line}: more values than columns")
+        doctor_id = _cell(row, 'doctorId')
+        if not doctor_id:
+            raise ScheduleError(f"Line {line}: missing doctorId")
+        day, start, end = _cell(row, 'day'), _cell(row, 'start'), _cell(row, 'end')
+        if not day or not start or not end:
+            raise ScheduleError(f"Line {line}: day, start and end are required")
+        timezone = _cell(row, 'timezone') or 'UTC'
+        entry = doctors.setdefault(doctor_id, {'doctorId': doctor_id, 'timezone': timezone, 'schedule': {}})
+        if entry['timezone'] != timezone:
+            raise ScheduleError(f"Line {line}: doctor {doctor_id} has more than one timezone")
+        entry['schedule'].setdefault(day, []).append(f"{start}-{end}")
+    return list(doctors.values())
+
+
+def validate(entries, now):
+    """Returns (prepared doctors, errors). Each template/timezone is parsed exactly once."""
+    prepared, errors, seen = [], [], set()
+    zones = {}
+    for position, entry in enumerate(entries):
+        doctor_id = entry.get('doctorId') if isinstance(entry, dict) else None
+        try:
+            if not doctor_id or not entry.get('schedule'):
+                raise ScheduleError("Missing doctorId or schedule data")
+            if doctor_id in seen:
+                raise ScheduleError("Duplicate doctorId in import")
+            seen.add(doctor_id)
+            timezone = entry.get('timezone') or 'UTC'
+            if timezone not in zones:
+                zones[timezone] = get_zone(timezone)
+            template = normalize_template(entry['schedule'], strict=True)
+            prepared.append({
+                'doctorId': doctor_id,
+                'timezone': timezone,
+                'schedule': template_to_schedule(template),
+                'slotIndex': materialize_template(template, zones[timezone], now=now)
+            })
+        except ScheduleError as e:
+            errors.append({'index': position, 'doctorId': doctor_id, 'error': str(e)})
+    return prepared, errors
+
+
+def _future_bookings(doctor_id, from_iso, to_iso):
+    kwargs = {
+        'IndexName': 'DoctorIndex',
+        'KeyConditionExpression': Key('doctorId').eq(doctor_id),
+        # Any CANCELLED_* variant (no-show, doctor fault) no longer holds the slot
+        'FilterExpression': Attr('timeSlot').between(from_iso, to_iso) & ~Attr('status').begins_with('CANCELLED'),
+        'ProjectionExpression': 'appointmentId, timeSlot'
+    }
+    bookings = []
+    # One Table handle per worker thread: boto3 resources are not thread-safe
+    with worker_table(APPOINTMENTS_TABLE) as table:
+        while True:
+            response = table.query(**kwargs)
+            for item in response.get('Items', []):
+                try:
+                    start = parse_time(item['timeSlot'])
+                except (KeyError, ValueError):
+                    continue
+                bookings.append((start, start + APPOINTMENT_MINUTES * 60000, item.get('appointmentId')))
+            if 'LastEvaluatedKey' not in response:
+                return bookings
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def load_bookings(doctor_ids, from_ms, to_ms):
+    """{doctorId: [(start_ms, end_ms, appointmentId)]}; DoctorIndex queries run in parallel."""
+    from_iso, to_iso = iso(from_ms), iso(to_ms)
+    with ThreadPoolExecutor(max_workers=BOOKING_QUERY_WORKERS) as pool:
+        results = pool.map(lambda d: _future_bookings(d, from_iso, to_iso), doctor_ids)
+        return dict(zip(doctor_ids, results))
+
+
+def find_conflicts(slot_index, bookings, from_ms, to_ms):
+    """
+    Bookings not fully inside the new offered hours. The tree holds the bookings; it is probed
+    once per gap between offered runs, so cost is O(gaps * log n + conflicts), not O(n * runs).
+    """
+    if not bookings:
+        return []
+    tree = IntervalTree((start, end, position) for position, (start, end, _) in enumerate(bookings))
+    hits = set()
+    cursor = from_ms
+    for start, end in offered_intervals(slot_index, from_ms, to_ms) + [(to_ms, to_ms)]:
+        if start > cursor:
+            hits.update(tree.overlapping(cursor, start))
+        cursor = max(cursor, end)
+    return [{'appointmentId': bookings[i][2], 'timeSlot': iso(bookings[i][0])} for i in sorted(hits)]
+
+
+def write_schedules(table, prepared):
+    stamp = str(datetime.datetime.now())
+    with table.batch_writer(overwrite_by_pkeys=['doctorId']) as batch:
+        for doctor in prepared:
+            batch.put_item(Item={**doctor, 'lastUpdated': stamp})
+
+
+def bulk_import(table, body):
+    """Returns (statusCode, payload)."""
+    try:
+        if isinstance(body, str):
+            entries = parse_csv(body)
+            options = {}
+        elif isinstance(body, list):
+            entries, options = body, {}
+        elif body.get('csv'):
+            entries, options = parse_csv(body['csv']), body
+        else:
+            entries, options = body.get('doctors') or [], body
+    except ScheduleError as e:
+        return 400, {"error": str(e)}
+
+    policy = options.get('onConflict', 'skip')
+    if policy not in CONFLICT_POLICIES:
+        return 400, {"error": f"onConflict must be one of {', '.join(CONFLICT_POLICIES)}"}
+    if not entries:
+        return 400, {"error": "No doctors to import"}
+    if len(entries) > MAX_BULK_DOCTORS:
+        return 400, {"error": f"Too many doctors (max {MAX_BULK_DOCTORS} per request)"}
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    now_ms = int(now.timestamp() * 1000)
+    horizon_ms = now_ms + MATERIALIZE_WEEKS * 7 * 86400000
+
+    prepared, errors = validate(entries, now)
+    bookings = load_bookings([d['doctorId'] for d in prepared], now_ms, horizon_ms)
+
+    conflicts, to_write = {}, []
+    for doctor in prepared:
+        found = find_conflicts(doctor['slotIndex'], bookings.get(doctor['doctorId'], []), now_ms, horizon_ms)
+        if found:
+            conflicts[doctor['doctorId']] = found
+        if not found or policy == 'overwrite':
+            to_write.append(doctor)
+
+    dry_run = bool(options.get('dryRun'))
+    if to_write and not dry_run:
+        write_schedules(table, to_write)
+
+    return 200, {
+        "message": "Dry run: nothing written" if dry_run else "Bulk schedule import complete",
+        "received": len(entries),
+        "imported": 0 if dry_run else len(to_write),
+        "skipped": [d for d in conflicts if policy == 'skip'],
+        "errors": errors,
+        "conflicts": conflicts
+    }
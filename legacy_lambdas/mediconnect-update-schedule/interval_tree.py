@@ -0,0 +1,48 @@
+# --- STATIC INTERVAL TREE ---
+# Built once from a list of half-open [start, end) intervals (bookings), then queried many times.
+# Layout: intervals sorted by start form an implicit balanced BST (node = midpoint of its range);
+# each node keeps the max end of its subtree, so a query skips any subtree that ends before it.
+# Query cost: O(log n + k) for k hits.
+
+
+class IntervalTree:
+    def __init__(self, intervals):
+        """intervals: iterable of (start, end, payload)."""
+        self.items = sorted(intervals, key=lambda i: (i[0], i[1]))
+        self.starts = [i[0] for i in self.items]
+        self.max_end = [0] * len(self.items)
+        self._build(0, len(self.items) - 1)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _build(self, lo, hi):
+        if lo > hi:
+            return None
+        mid = (lo + hi) // 2
+        best = self.items[mid][1]
+        for child in (self._build(lo, mid - 1), self._build(mid + 1, hi)):
+            if child is not None and child > best:
+                best = child
+        self.max_end[mid] = best
+        return best
+
+    def overlapping(self, start, end):
+        """Payloads of every interval that intersects [start, end)."""
+        hits = []
+        stack = [(0, len(self.items) - 1)]
+        items, max_end = self.items, self.max_end
+        while stack:
+            lo, hi = stack.pop()
+            if lo > hi:
+                continue
+            mid = (lo + hi) // 2
+            if max_end[mid] <= start:
+                continue  # whole subtree ends before the query
+            stack.append((lo, mid - 1))
+            if items[mid][0] < end:
+                # Everything to the right starts even later, so it only matters while this node starts before `end`
+                if items[mid][1] > start:
+                    hits.append(items[mid][2])
+                stack.append((mid + 1, hi))
+        return hits
@@ -1,12 +1,62 @@
 import json
-import boto3
+import base64
 import datetime
 from botocore.exceptions import ClientError
+from aws_clients import get_table
+from slot_index import (
+    materialize, covers, available_slots, iso, parse_time,
+    ScheduleError, DAY_MS, MAX_QUERY_DAYS, MATERIALIZE_WEEKS
+)
+from bulk_import import bulk_import, is_csv
 
-# 🟢 CONNECT TO DB
-dynamodb = boto3.resource('dynamodb')
+# 🟢 CONNECT TO DB (lazily, on first request)
 TABLE_NAME = "mediconnect-doctor-schedules"
 
+def availability_response(table, item, params, headers):
+    """Serves GET ?doctorId&from&to straight from the stored slot bitmap."""
+    if not item.get('schedule'):
+        return {"statusCode": 404, "headers": headers, "body": json.dumps({"error": "No schedule for this doctor"})}
+
+    try:
+        now_ms = int(datetime.datetime.now(datetime.timezone.utc).timestamp() * 1000)
+        from_ms = max(parse_time(params['from']) if params.get('from') else now_ms, now_ms)
+        to_ms = parse_time(params['to']) if params.get('to') else from_ms + 7 * DAY_MS
+    except ValueError:
+        return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": "from/to must be ISO-8601 or epoch time"})}
+    if to_ms - from_ms > MAX_QUERY_DAYS * DAY_MS:
+        return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": f"Range too large (max {MAX_QUERY_DAYS} days)"})}
+
+    slot_index = item.get('slotIndex')
+    if not covers(slot_index, from_ms, to_ms):
+        # Index missing or rolled past its horizon: rebuild from the template and keep it
+        weeks = max(MATERIALIZE_WEEKS, -(-(to_ms - now_ms) // (7 * DAY_MS)) + 1)
+        try:
+            slot_index = materialize(item['schedule'], item.get('timezone', 'UTC'), weeks=weeks)
+        except ScheduleError as e:
+            return {"statusCode": 422, "headers": headers, "body": json.dumps({"error": f"Stored schedule is invalid: {str(e)}"})}
+        try:
+            table.update_item(
+                Key={'doctorId': item['doctorId']},
+                UpdateExpression="SET slotIndex = :s",
+                ExpressionAttributeValues={':s': slot_index}
+            )
+        except ClientError as e:
+            print(f"⚠️ Could not persist refreshed slot index: {str(e)}")
+
+    slots = available_slots(slot_index, from_ms, to_ms)
+    return {
+        "statusCode": 200,
+        "headers": headers,
+        "body": json.dumps({
+            "doctorId": item['doctorId'],
+            "timezone": item.get('timezone', 'UTC'),
+            "slotMinutes": int(slot_index['slotMinutes']),
+            "from": iso(from_ms),
+            "to": iso(to_ms),
+            "slots": [iso(ms) for ms in slots]
+        })
+    }
+
 def lambda_handler(event, context):
     # 🔒 STANDARD CORS HEADERS
     headers = {
@@ -24,7 +74,7 @@ def lambda_handler(event, context):
                 "body": json.dumps("OK")
             }
 
-        table = dynamodb.Table(TABLE_NAME)
+        table = get_table(TABLE_NAME)
         http_method = event.get('httpMethod')
 
         # ---------------------------------------------------------
@@ -44,6 +94,13 @@ def lambda_handler(event, context):
             # Fetch from DynamoDB
             response = table.get_item(Key={'doctorId': doctor_id})
             item = response.get('Item', {})
+
+            # 🟢 AVAILABILITY QUERY: ?doctorId&from&to -> concrete UTC slots from the bitmap
+            if params.get('from') or params.get('to'):
+                return availability_response(table, item, params, headers)
+
+            # The bitmap is an internal index, not part of the schedule payload
+            item.pop('slotIndex', None)
             
             # If no timezone is set, default to UTC to prevent frontend errors
             if 'timezone' not in item:
@@ -60,11 +117,23 @@ def lambda_handler(event, context):
         # ---------------------------------------------------------
         elif http_method == 'POST':
             # Parse Body safely
-            if 'body' in event:
+            if is_csv(event):
+                raw = event.get('body') or ''
+                body = base64.b64decode(raw).decode('utf-8') if event.get('isBase64Encoded') else raw
+            elif 'body' in event:
                 body = json.loads(event['body']) if isinstance(event['body'], str) else event['body']
             else:
                 body = event or {}
 
+            # 🟢 BULK IMPORT: CSV, JSON array, or {"doctors": [...]} / {"csv": "..."}
+            if isinstance(body, (str, list)) or 'doctors' in body or 'csv' in body:
+                status, payload = bulk_import(table, body)
+                return {
+                    "statusCode": status,
+                    "headers": headers,
+                    "body": json.dumps(payload)
+                }
+
             doctor_id = body.get('doctorId')
             weekly_schedule = body.get('schedule')
             # 🟢 NEW: Capture Timezone (Critical for international doctors)
@@ -77,11 +146,22 @@ def lambda_handler(event, context):
                     "body": json.dumps({"error": "Missing doctorId or schedule data"})
                 }
 
-            # Update DynamoDB with Timezone info
+            # 🟢 Expand the template ONCE into UTC slot bitmaps (timezone/DST aware)
+            try:
+                slot_index = materialize(weekly_schedule, timezone)
+            except ScheduleError as e:
+                return {
+                    "statusCode": 400,
+                    "headers": headers,
+                    "body": json.dumps({"error": str(e)})
+                }
+
+            # Update DynamoDB with Timezone info + materialized slot index
             table.put_item(Item={
                 'doctorId': doctor_id,
                 'schedule': weekly_schedule,
                 'timezone': timezone,
+                'slotIndex': slot_index,
                 'lastUpdated': str(datetime.datetime.now())
             })
 
@@ -90,7 +170,8 @@ def lambda_handler(event, context):
                 "headers": headers,
                 "body": json.dumps({
                     "message": "Schedule and Timezone updated successfully",
-                    "savedTimezone": timezone
+                    "savedTimezone": timezone,
+                    "materializedWeeks": MATERIALIZE_WEEKS
                 })
             }
 
@@ -0,0 +1,236 @@
+import os
+import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# --- MATERIALIZED AVAILABILITY SLOT INDEX ---
+# The weekly template (local wall-clock hours + timezone) is expanded ONCE, on POST,
+# into a UTC bitmap: bit i == 1  <=>  slot [epoch + i*slot, epoch + (i+1)*slot) is offered.
+# epoch is a UTC midnight, so every doctor shares the same slot grid (bitmaps can be ANDed).
+# A slot that would not start on that grid (zone offset not a multiple of the slot size) is a
+# ScheduleError, never rounded.
+# Stored on the schedule item as slotIndex = {epoch, slotMinutes, days, bits (Binary)}:
+# 8 weeks of 30-minute slots = 2688 bits = 336 bytes.
+
+SLOT_MINUTES = int(os.environ.get('SLOT_MINUTES', '30'))
+MATERIALIZE_WEEKS = int(os.environ.get('MATERIALIZE_WEEKS', '8'))
+MAX_QUERY_DAYS = 62
+
+DAY_MS = 86400000
+DAY_NAMES = {
+    'monday': 0, 'mon': 0, 'tuesday': 1, 'tue': 1, 'tues': 1, 'wednesday': 2, 'wed': 2,
+    'thursday': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'friday': 4, 'fri': 4,
+    'saturday': 5, 'sat': 5, 'sunday': 6, 'sun': 6
+}
+DAY_LABELS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+class ScheduleError(ValueError):
+    """The weekly template or timezone could not be understood."""
+
+
+def get_zone(name):
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ScheduleError(f"Unknown timezone: {name}")
+
+
+def _minutes(text):
+    try:
+        hours, minutes = str(text).strip().split(':')[:2]
+        value = int(hours) * 60 + int(minutes)
+    except (ValueError, AttributeError):
+        raise ScheduleError(f"Invalid time: {text}")
+    if not 0 <= value <= 1440:
+        raise ScheduleError(f"Invalid time: {text}")
+    return value
+
+
+def _intervals(value):
+    """Accepts the shapes the frontend has sent over time and yields (start_min, end_min)."""
+    if not value:
+        return
+    if isinstance(value, str):
+        start, _, end = value.partition('-')
+        yield _minutes(start), _minutes(end)
+    elif isinstance(value, dict):
+        if value.get('active') is False or value.get('enabled') is False or value.get('available') is False:
+            return
+        if 'slots' in value:
+            yield from _intervals(value['slots'])
+        elif 'start' in value and 'end' in value:
+            yield _minutes(value['start']), _minutes(value['end'])
+    elif isinstance(value, (list, tuple)):
+        for part in value:
+            yield from _intervals(part)
+
+
+def normalize_template(schedule, strict=False):
+    """
+    {"Monday": {"start": "09:00", "end": "17:00"}, "tue": ["09:00-12:00", "13:00-17:00"], ...}
+      -> {0: [(540, 1020)], 1: [(540, 720), (780, 1020)]}   (weekday Mon=0, minutes since local midnight)
+    Overlapping/adjacent intervals are merged; with strict=True an overlap is an error instead.
+    """
+    if not isinstance(schedule, dict):
+        raise ScheduleError("schedule must be an object keyed by weekday")
+    template = {}
+    for key, value in schedule.items():
+        day = DAY_NAMES.get(str(key).strip().lower())
+        if day is None and str(key).isdigit() and 0 <= int(key) <= 6:
+            day = int(key)
+        if day is None:
+            raise ScheduleError(f"Unknown weekday: {key}")
+        for start, end in _intervals(value):
+            if end <= start:
+                raise ScheduleError(f"Interval ends before it starts on {key}")
+            template.setdefault(day, []).append((start, end))
+
+    for day, intervals in template.items():
+        intervals.sort()
+        merged = [intervals[0]]
+        for start, end in intervals[1:]:
+            if strict and start < merged[-1][1]:
+                raise ScheduleError(f"Overlapping intervals on {DAY_LABELS[day]}")
+            if start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        template[day] = merged
+    return template
+
+
+def _to_utc_ms(local_date, minute, zone):
+    """Local wall-clock time -> UTC epoch ms, or None if it does not exist (spring-forward gap)."""
+    wall = datetime.datetime.combine(local_date, datetime.time()) + datetime.timedelta(minutes=minute)
+    aware = wall.replace(tzinfo=zone)
+    utc = aware.astimezone(datetime.timezone.utc)
+    # Round-trip: nonexistent local times come back shifted
+    if utc.astimezone(zone).replace(tzinfo=None) != wall:
+        return None
+    return int(utc.timestamp() * 1000)
+
+
+def template_to_schedule(template):
+    """Normalized template -> canonical stored form {"Monday": ["09:00-12:00", ...]}."""
+    def hhmm(minute):
+        return f"{minute // 60:02d}:{minute % 60:02d}"
+    return {
+        DAY_LABELS[day]: [f"{hhmm(start)}-{hhmm(end)}" for start, end in intervals]
+        for day, intervals in sorted(template.items())
+    }
+
+
+def materialize(schedule, timezone, weeks=MATERIALIZE_WEEKS, slot_minutes=SLOT_MINUTES, now=None):
+    """Expands the weekly template for the next `weeks` weeks into a slotIndex dict."""
+    return materialize_template(normalize_template(schedule), get_zone(timezone), weeks, slot_minutes, now)
+
+
+def materialize_template(template, zone, weeks=MATERIALIZE_WEEKS, slot_minutes=SLOT_MINUTES, now=None):
+    """materialize() for an already normalized template and resolved ZoneInfo."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    slot_ms = slot_minutes * 60000
+
+    first_local = now.astimezone(zone).date()
+    epoch = int(datetime.datetime.combine(now.date(), datetime.time(), tzinfo=datetime.timezone.utc).timestamp() * 1000)
+    # Local "today" can be the UTC day before; start the grid one day earlier so it is covered
+    epoch -= DAY_MS
+    days = weeks * 7 + 2
+    total_slots = days * DAY_MS // slot_ms
+
+    bits = 0
+    for offset in range(weeks * 7 + 1):
+        local_date = first_local + datetime.timedelta(days=offset)
+        for start, end in template.get(local_date.weekday(), ()):
+            for minute in range(start, end - slot_minutes + 1, slot_minutes):
+                utc_ms = _to_utc_ms(local_date, minute, zone)
+                if utc_ms is None:
+                    continue
+                index, misalignment = divmod(utc_ms - epoch, slot_ms)
+                if misalignment:
+                    # e.g. UTC+05:45, or UTC+05:30 with 60-minute slots: flooring would offer the slot early
+                    raise ScheduleError(
+                        f"{local_date} {minute // 60:02d}:{minute % 60:02d} in {zone.key} does not start on "
+                        f"the {slot_minutes}-minute UTC slot grid"
+                    )
+                if 0 <= index < total_slots:
+                    bits |= 1 << index
+
+    return {
+        'epoch': epoch,
+        'slotMinutes': slot_minutes,
+        'days': days,
+        'bits': bits.to_bytes((total_slots + 7) // 8, 'little')
+    }
+
+
+def index_bits(slot_index):
+    """slotIndex -> (epoch, slot_ms, total_slots, bitset as int)."""
+    raw = slot_index['bits']
+    raw = bytes(raw.value) if hasattr(raw, 'value') else bytes(raw)  # boto3 returns Binary
+    slot_ms = int(slot_index['slotMinutes']) * 60000
+    total = int(slot_index['days']) * DAY_MS // slot_ms
+    return int(slot_index['epoch']), slot_ms, total, int.from_bytes(raw, 'little')
+
+
+def offered_intervals(slot_index, from_ms, to_ms):
+    """Runs of consecutive offered slots in [from_ms, to_ms) as [(start_ms, end_ms)]."""
+    epoch, slot_ms, _, _ = index_bits(slot_index)
+    first, mask = range_mask(slot_index, from_ms, to_ms)
+    runs = []
+    position = 0
+    while mask:
+        skip = (mask & -mask).bit_length() - 1        # zeros before the run
+        mask >>= skip
+        length = (~mask & (mask + 1)).bit_length() - 1  # ones in the run
+        mask >>= length
+        start = epoch + (first + position + skip) * slot_ms
+        runs.append((start, start + length * slot_ms))
+        position += skip + length
+    return runs
+
+
+def covers(slot_index, from_ms, to_ms):
+    if not slot_index:
+        return False
+    epoch, slot_ms, total, _ = index_bits(slot_index)
+    return epoch <= from_ms and to_ms <= epoch + total * slot_ms
+
+
+def range_mask(slot_index, from_ms, to_ms):
+    """(first_index, bitset) for the slots starting in [from_ms, to_ms), shifted so bit 0 = first_index."""
+    epoch, slot_ms, total, bits = index_bits(slot_index)
+    first = max(0, -(-(from_ms - epoch) // slot_ms))  # ceil: only slots that start inside the range
+    last = min(total, -(-(to_ms - epoch) // slot_ms))
+    if last <= first:
+        return first, 0
+    return first, (bits >> first) & ((1 << (last - first)) - 1)
+
+
+def available_slots(slot_index, from_ms, to_ms):
+    """UTC start times (epoch ms) of offered slots in [from_ms, to_ms). O(range)."""
+    epoch, slot_ms, _, _ = index_bits(slot_index)
+    first, mask = range_mask(slot_index, from_ms, to_ms)
+    starts = []
+    while mask:
+        lowest = mask & -mask
+        starts.append(epoch + (first + lowest.bit_length() - 1) * slot_ms)
+        mask ^= lowest
+    return starts
+
+
+def iso(ms):
+    return datetime.datetime.fromtimestamp(ms / 1000, tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def parse_time(value):
+    """ISO-8601 or epoch (s/ms) -> epoch ms."""
+    text = str(value).strip()
+    try:
+        number = float(text)
+        return int(number * 1000) if number < 1e11 else int(number)
+    except ValueError:
+        pass
+    parsed = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return int(parsed.timestamp() * 1000)
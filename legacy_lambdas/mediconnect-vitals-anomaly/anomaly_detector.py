@@ -0,0 +1,146 @@
+import math
+
+# --- STREAMING VITALS ANOMALY DETECTOR ---
+# Consumes readings in time order and keeps O(1) state per (patient, metric):
+# EWMA mean + EW variance (rolling z-score), last value/time (rate of change).
+# No history is ever re-queried; each reading costs a handful of float ops.
+
+METRICS = ('heartRate', 'systolicBP', 'diastolicBP', 'oxygenLevel')
+
+# Absolute limits -> CRITICAL (heartRate > 150 matches patient-service emergency.ts)
+HARD_LIMITS = {
+    'heartRate': (40, 150),
+    'systolicBP': (90, 180),
+    'diastolicBP': (50, 120),
+    'oxygenLevel': (90, None)
+}
+
+# Sudden jump -> WARNING: the step must be at least MIN_JUMP *and* faster than RATE_LIMITS per minute
+# (the absolute floor keeps sensor noise on high-frequency streams from tripping the rate rule)
+RATE_LIMITS = {
+    'heartRate': 30.0,
+    'systolicBP': 40.0,
+    'diastolicBP': 25.0,
+    'oxygenLevel': 4.0
+}
+MIN_JUMP = {
+    'heartRate': 25.0,
+    'systolicBP': 30.0,
+    'diastolicBP': 20.0,
+    'oxygenLevel': 4.0
+}
+
+DEFAULT_ALPHA = 0.1        # EWMA smoothing (~ last 20 readings dominate)
+DEFAULT_Z_THRESHOLD = 3.5
+DEFAULT_WARMUP = 20        # readings before z-scores are trusted
+MAX_RATE_GAP_MS = 600000   # ignore rate of change across gaps > 10 min
+MIN_STD = {'heartRate': 1.0, 'systolicBP': 2.0, 'diastolicBP': 2.0, 'oxygenLevel': 0.5}
+
+
+class MetricState:
+    """Rolling statistics for one metric of one patient (5 numbers)."""
+    __slots__ = ('n', 'mean', 'var', 'last', 'last_ts')
+
+    def __init__(self, n=0, mean=0.0, var=0.0, last=0.0, last_ts=0):
+        self.n = n
+        self.mean = mean
+        self.var = var
+        self.last = last
+        self.last_ts = last_ts
+
+    def pack(self):
+        return [self.n, round(self.mean, 4), round(self.var, 4), self.last, self.last_ts]
+
+    @classmethod
+    def unpack(cls, packed):
+        n, mean, var, last, last_ts = packed
+        return cls(int(n), float(mean), float(var), float(last), int(last_ts))
+
+
+class StreamingDetector:
+    """
+    detector.update(patient_id, ts_ms, {metric: value}) -> [anomaly, ...]
+
+    Readings at or before the last seen timestamp for a metric are ignored,
+    so replaying a stream batch never double-counts or re-alerts.
+    """
+
+    def __init__(self, alpha=DEFAULT_ALPHA, z_threshold=DEFAULT_Z_THRESHOLD, warmup=DEFAULT_WARMUP):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.states = {}  # patient_id -> {metric: MetricState}
+
+    # --- state store (compact: one short list per metric) ---
+    def export_state(self, patient_id):
+        metrics = self.states.get(patient_id, {})
+        return {metric: state.pack() for metric, state in metrics.items()}
+
+    def load_state(self, patient_id, packed):
+        self.states[patient_id] = {metric: MetricState.unpack(values) for metric, values in packed.items()}
+
+    def last_ts(self, patient_id):
+        metrics = self.states.get(patient_id)
+        return max((s.last_ts for s in metrics.values()), default=0) if metrics else 0
+
+    # --- detection ---
+    def update(self, patient_id, ts_ms, values):
+        patient = self.states.get(patient_id)
+        if patient is None:
+            patient = self.states[patient_id] = {}
+
+        anomalies = []
+        alpha = self.alpha
+        for metric, raw in values.items():
+            if raw is None:
+                continue
+            x = float(raw)
+            state = patient.get(metric)
+            if state is None:
+                state = patient[metric] = MetricState()
+            elif ts_ms <= state.last_ts:
+                continue
+
+            low, high = HARD_LIMITS.get(metric, (None, None))
+            if (low is not None and x < low) or (high is not None and x > high):
+                anomalies.append(self._flag(patient_id, ts_ms, metric, x, 'HARD_LIMIT', 'CRITICAL', low if low is not None and x < low else high))
+
+            if state.n >= self.warmup:
+                std = max(math.sqrt(state.var), MIN_STD.get(metric, 1.0))
+                z = (x - state.mean) / std
+                if abs(z) >= self.z_threshold:
+                    anomalies.append(self._flag(patient_id, ts_ms, metric, x, 'Z_SCORE', 'WARNING', round(z, 2)))
+
+            step = x - state.last
+            if state.n and abs(step) >= MIN_JUMP.get(metric, 0.0) and 0 < ts_ms - state.last_ts <= MAX_RATE_GAP_MS:
+                per_minute = step * 60000.0 / (ts_ms - state.last_ts)
+                limit = RATE_LIMITS.get(metric)
+                if limit is not None and abs(per_minute) > limit:
+                    anomalies.append(self._flag(patient_id, ts_ms, metric, x, 'RATE_OF_CHANGE', 'WARNING', round(per_minute, 2)))
+
+            # EWMA / EW variance update (West's incremental form)
+            if state.n == 0:
+                state.mean = x
+                state.var = 0.0
+            else:
+                diff = x - state.mean
+                incr = alpha * diff
+                state.mean += incr
+                state.var = (1 - alpha) * (state.var + diff * incr)
+            state.n += 1
+            state.last = x
+            state.last_ts = ts_ms
+
+        return anomalies
+
+    @staticmethod
+    def _flag(patient_id, ts_ms, metric, value, rule, severity, detail):
+        return {
+            'patientId': patient_id,
+            'timestamp': ts_ms,
+            'metric': metric,
+            'value': value,
+            'rule': rule,
+            'severity': severity,
+            'detail': detail
+        }
@@ -0,0 +1,101 @@
+"""
+Replayable throughput benchmark for the streaming vitals anomaly detector.
+
+Generates a deterministic (seeded) multi-patient vitals stream with injected
+spikes, or replays a JSON-lines capture of real readings, feeds it through
+StreamingDetector in time order and reports readings/second on one core.
+
+Usage:
+    python benchmark.py                                  # 200 patients x 1000 readings, seed 42
+    python benchmark.py --patients 1000 --readings 500 --seed 7
+    python benchmark.py --replay vitals.jsonl            # {"patientId", "timestamp", "heartRate", ...} per line
+    python benchmark.py --dump stream.jsonl              # save the synthetic stream for later replay
+"""
+import argparse
+import json
+import random
+import time
+from anomaly_detector import StreamingDetector, METRICS
+
+
+def synthetic_stream(patients, readings, seed, interval_ms=5000, spike_rate=0.002):
+    rng = random.Random(seed)
+    start = 1767225600000  # 2026-01-01T00:00:00Z
+    baselines = {
+        f"p-{i}": (rng.uniform(60, 90), rng.uniform(110, 135), rng.uniform(70, 85), rng.uniform(95, 99))
+        for i in range(patients)
+    }
+    stream = []
+    for step in range(readings):
+        ts = start + step * interval_ms
+        for patient_id, (hr, sys_bp, dia_bp, spo2) in baselines.items():
+            values = {
+                'heartRate': round(rng.gauss(hr, 3), 1),
+                'systolicBP': round(rng.gauss(sys_bp, 4), 1),
+                'diastolicBP': round(rng.gauss(dia_bp, 3), 1),
+                'oxygenLevel': round(min(100.0, rng.gauss(spo2, 0.7)), 1)
+            }
+            if rng.random() < spike_rate:
+                values['heartRate'] = round(hr + rng.uniform(60, 90), 1)
+            stream.append((patient_id, ts, values))
+    return stream
+
+
+def load_replay(path):
+    stream = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            ts = float(item['timestamp'])
+            stream.append((item['patientId'], int(ts * 1000) if ts < 1e11 else int(ts),
+                           {m: item[m] for m in METRICS if item.get(m) is not None}))
+    stream.sort(key=lambda r: r[1])
+    return stream
+
+
+def run(stream, repeat):
+    best = None
+    for _ in range(repeat):
+        detector = StreamingDetector()
+        update = detector.update
+        started = time.perf_counter()
+        flagged = 0
+        for patient_id, ts, values in stream:
+            flagged += len(update(patient_id, ts, values))
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best[0]:
+            best = (elapsed, flagged, detector)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming vitals anomaly detector.")
+    parser.add_argument('--patients', type=int, default=200)
+    parser.add_argument('--readings', type=int, default=1000, help="Readings per patient")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs; the fastest is reported")
+    parser.add_argument('--replay', help="JSON-lines file of readings to replay instead of synthetic data")
+    parser.add_argument('--dump', help="Write the synthetic stream to this JSON-lines file")
+    args = parser.parse_args()
+
+    stream = load_replay(args.replay) if args.replay else synthetic_stream(args.patients, args.readings, args.seed)
+
+    if args.dump:
+        with open(args.dump, 'w') as f:
+            for patient_id, ts, values in stream:
+                f.write(json.dumps({'patientId': patient_id, 'timestamp': ts, **values}) + "\n")
+
+    elapsed, flagged, detector = run(stream, args.repeat)
+    state_bytes = sum(len(json.dumps(detector.export_state(p))) for p in detector.states)
+    print(f"readings:        {len(stream)}")
+    print(f"patients:        {len(detector.states)}")
+    print(f"anomalies:       {flagged}")
+    print(f"elapsed:         {elapsed:.3f} s")
+    print(f"throughput:      {len(stream) / elapsed:,.0f} readings/s (single core)")
+    print(f"state per patient: ~{state_bytes // max(1, len(detector.states))} bytes packed")
+
+
+if __name__ == '__main__':
+    main()
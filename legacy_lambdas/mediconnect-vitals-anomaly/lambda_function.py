@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import random
+from decimal import Decimal
+from boto3.dynamodb.types import TypeDeserializer
+from vitals_time import parse_time
+from aws_clients import get_client, get_resource, get_table
+from anomaly_detector import StreamingDetector, METRICS
+
+# --- STREAMING VITALS ANOMALY DETECTION ---
+# Trigger: DynamoDB Stream on mediconnect-iot-vitals (NEW_IMAGE), same feed as the rollup stage,
+# or a direct IoT rule invocation with the reading payload.
+# Per-patient detector state (a few numbers per metric) lives in STATE_TABLE and in this
+# container's memory between invocations; history is never re-queried.
+# A batch runs on a scratch copy of that state: the warm copy and STATE_TABLE only move forward once
+# the anomalies are stored and alerted, so a failed batch is retried by the stream and re-detected.
+
+STATE_TABLE = os.environ.get('STATE_TABLE', 'mediconnect-vitals-detector-state')
+ANOMALY_TABLE = os.environ.get('ANOMALY_TABLE', 'mediconnect-vitals-anomalies')
+ALERT_TOPIC_ARN = os.environ.get('ALERT_TOPIC_ARN')
+MAX_RETRIES = 6
+BASE_BACKOFF_SECONDS = 0.05
+MAX_BACKOFF_SECONDS = 2.0
+
+_deserializer = TypeDeserializer()
+# Warm containers keep the detector (and its state) across invocations
+detector = StreamingDetector()
+
+
+def _backoff(attempt):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+def extract_readings(event):
+    """Returns [(patientId, ts_ms, {metric: value})] in time order from a stream batch or IoT payload."""
+    if 'Records' in event:
+        raw = []
+        for record in event['Records']:
+            if record.get('eventName') != 'INSERT':
+                continue
+            image = record.get('dynamodb', {}).get('NewImage')
+            if image:
+                raw.append({k: _deserializer.deserialize(v) for k, v in image.items()})
+    else:
+        raw = event if isinstance(event, list) else [event]
+
+    readings = []
+    for item in raw:
+        if not item.get('patientId') or item.get('timestamp') in (None, ''):
+            continue
+        try:
+            ts = parse_time(item['timestamp'])
+        except (TypeError, ValueError):
+            continue
+        values = {m: item[m] for m in METRICS if item.get(m) is not None}
+        if values:
+            readings.append((item['patientId'], ts, values))
+    readings.sort(key=lambda r: (r[0], r[1]))
+    return readings
+
+
+def _to_dynamo(value):
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, list):
+        return [_to_dynamo(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_dynamo(v) for k, v in value.items()}
+    return value
+
+
+def load_states(patient_ids):
+    """Refreshes detector state from STATE_TABLE unless this container already has newer state."""
+    dynamodb = get_resource('dynamodb')
+    patient_ids = list(patient_ids)
+    for start in range(0, len(patient_ids), 100):
+        request = {STATE_TABLE: {'Keys': [{'patientId': p} for p in patient_ids[start:start + 100]]}}
+        attempt = 0
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(STATE_TABLE, []):
+                if int(item.get('lastTs', 0)) > detector.last_ts(item['patientId']):
+                    detector.load_state(item['patientId'], item.get('state', {}))
+            request = response.get('UnprocessedKeys') or {}
+            if request:
+                # Fail the batch rather than detect on stale state; the stream retries it
+                if attempt >= MAX_RETRIES:
+                    pending = len(request.get(STATE_TABLE, {}).get('Keys', []))
+                    raise RuntimeError(f"BatchGetItem gave up with {pending} unprocessed keys")
+                time.sleep(_backoff(attempt))
+                attempt += 1
+
+
+def save_states(source, patient_ids):
+    with get_table(STATE_TABLE).batch_writer() as batch:
+        for patient_id in patient_ids:
+            batch.put_item(Item={
+                'patientId': patient_id,
+                'lastTs': source.last_ts(patient_id),
+                'state': _to_dynamo(source.export_state(patient_id))
+            })
+
+
+def scratch_detector(patient_ids):
+    """A detector holding a copy of the warm state for these patients; updates leave the original untouched."""
+    scratch = StreamingDetector(detector.alpha, detector.z_threshold, detector.warmup)
+    for patient_id in patient_ids:
+        if patient_id in detector.states:
+            scratch.load_state(patient_id, detector.export_state(patient_id))
+    return scratch
+
+
+def record_anomalies(anomalies):
+    # Deterministic anomalyId -> a replayed batch overwrites instead of duplicating
+    with get_table(ANOMALY_TABLE).batch_writer(overwrite_by_pkeys=['patientId', 'anomalyId']) as batch:
+        for anomaly in anomalies:
+            batch.put_item(Item=_to_dynamo({
+                **anomaly,
+                'anomalyId': f"{anomaly['timestamp']}#{anomaly['metric']}#{anomaly['rule']}"
+            }))
+
+    critical = [a for a in anomalies if a['severity'] == 'CRITICAL']
+    if critical and ALERT_TOPIC_ARN:
+        lines = [f"Patient {a['patientId']}: {a['metric']} = {a['value']} ({a['rule']})" for a in critical[:20]]
+        get_client('sns').publish(
+            TopicArn=ALERT_TOPIC_ARN,
+            Subject="CRITICAL vitals anomaly",
+            Message="\n".join(lines)
+        )
+
+
+def lambda_handler(event, context):
+    readings = extract_readings(event)
+    if not readings:
+        return {"statusCode": 200, "body": json.dumps({"message": "No vitals readings in event"})}
+
+    patients = {r[0] for r in readings}
+    load_states(patients)
+
+    scratch = scratch_detector(patients)
+    anomalies = []
+    for patient_id, ts, values in readings:
+        anomalies.extend(scratch.update(patient_id, ts, values))
+
+    if anomalies:
+        record_anomalies(anomalies)
+        print(f"⚠️ {len(anomalies)} anomalies in {len(readings)} readings")
+    save_states(scratch, patients)
+    # Commit: only now does the warm container see this batch
+    detector.states.update(scratch.states)
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({"readings": len(readings), "anomalies": len(anomalies)})
+    }
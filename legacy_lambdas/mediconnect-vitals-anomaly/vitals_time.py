@@ -0,0 +1,22 @@
+import datetime
+
+# --- VITALS TIMESTAMPS ---
+# Shared by get-vitals, vitals-rollup and vitals-anomaly (one identical copy per Lambda), so every
+# stage reads the same timestamp formats: epoch seconds, epoch ms, or ISO-8601 (VITALS_TS_FORMAT=iso).
+
+
+def parse_time(value):
+    """Accepts epoch seconds, epoch ms or ISO-8601 and returns epoch milliseconds (UTC)."""
+    if value is None or value == '':
+        return None
+    text = str(value).strip()
+    try:
+        number = float(text)
+        # Anything below ~1973 in ms is really seconds
+        return int(number * 1000) if number < 1e11 else int(number)
+    except ValueError:
+        pass
+    parsed = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return int(parsed.timestamp() * 1000)
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import random
+from decimal import Decimal
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from vitals_time import parse_time
+from aws_clients import get_resource, get_table
+
+# --- VITALS ROLLUP STAGE ---
+# Trigger: DynamoDB Stream on mediconnect-iot-vitals (NEW_IMAGE), or an IoT rule action
+# that invokes this function directly with the reading payload.
+# Maintains 1-minute / 1-hour / 1-day aggregates per patient so long-range charts
+# (get-vitals ?resolution=) read hundreds of items instead of hundreds of thousands.
+#
+# Rollup table: PK rollupKey = "<patientId>#<resolution>", SK bucket = bucket start (epoch ms, Number)
+#   per metric: { count, sum, min, max, mean, last }, plus lastTs / version / expiresAt (TTL)
+
+ROLLUP_TABLE = os.environ.get('ROLLUP_TABLE', 'mediconnect-iot-vitals-rollup')
+METRICS = ('heartRate', 'systolicBP', 'diastolicBP', 'oxygenLevel')
+
+DAY_MS = 86400000
+# (resolution, bucket width ms, retention days or None = keep forever)
+# ⚠️ Keep in sync with mediconnect-get-vitals/rollups.py
+TIERS = (
+    ('1m', 60000, 30),
+    ('1h', 3600000, 400),
+    ('1d', DAY_MS, None)
+)
+
+MAX_CONFLICT_RETRIES = 3
+BATCH_GET_LIMIT = 100      # DynamoDB hard limit per BatchGetItem call
+MAX_RETRIES = 6
+BASE_BACKOFF_SECONDS = 0.05
+MAX_BACKOFF_SECONDS = 2.0
+_deserializer = TypeDeserializer()
+
+
+def extract_readings(event):
+    """Returns [(patientId, ts_ms, {metric: Decimal})] from a stream batch or a direct IoT payload."""
+    if 'Records' in event:
+        raw = []
+        for record in event['Records']:
+            if record.get('eventName') != 'INSERT':
+                continue
+            image = record.get('dynamodb', {}).get('NewImage')
+            if image:
+                raw.append({k: _deserializer.deserialize(v) for k, v in image.items()})
+    else:
+        raw = event if isinstance(event, list) else [event]
+
+    readings = []
+    for item in raw:
+        patient_id = item.get('patientId')
+        timestamp = item.get('timestamp')
+        if not patient_id or timestamp in (None, ''):
+            continue
+        try:
+            ts = parse_time(timestamp)
+        except (TypeError, ValueError):
+            print(f"⚠️ Skipping reading with bad timestamp: {timestamp}")
+            continue
+        values = {}
+        for metric in METRICS:
+            if item.get(metric) is not None:
+                try:
+                    values[metric] = Decimal(str(item[metric]))
+                except Exception:
+                    continue
+        if values:
+            readings.append((patient_id, ts, values))
+
+    readings.sort(key=lambda r: (r[0], r[1]))
+    return readings
+
+
+def group_by_bucket(readings):
+    """{(rollupKey, bucket): [(ts, values)]} across every tier."""
+    groups = {}
+    for patient_id, ts, values in readings:
+        for resolution, width, _ in TIERS:
+            key = (f"{patient_id}#{resolution}", ts - ts % width)
+            groups.setdefault(key, []).append((ts, values))
+    return groups
+
+
+def _backoff(attempt):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+def _fetch_existing(keys):
+    """
+    BatchGetItem the current rollup items (100 keys per call). UnprocessedKeys are retried
+    with backoff; raises RuntimeError (the stream batch is retried) if they never drain.
+    """
+    dynamodb = get_resource('dynamodb')
+    existing = {}
+    keys = list(keys)
+    for start in range(0, len(keys), BATCH_GET_LIMIT):
+        chunk = keys[start:start + BATCH_GET_LIMIT]
+        request = {ROLLUP_TABLE: {'Keys': [{'rollupKey': k, 'bucket': b} for k, b in chunk]}}
+        attempt = 0
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(ROLLUP_TABLE, []):
+                existing[(item['rollupKey'], int(item['bucket']))] = item
+            request = response.get('UnprocessedKeys') or {}
+            if request:
+                if attempt >= MAX_RETRIES:
+                    pending = len(request.get(ROLLUP_TABLE, {}).get('Keys', []))
+                    raise RuntimeError(f"BatchGetItem gave up with {pending} unprocessed keys")
+                time.sleep(_backoff(attempt))
+                attempt += 1
+    return existing
+
+
+def merge_readings(item, rollup_key, bucket, readings):
+    """
+    Folds readings into a rollup item. Readings at or before the item's lastTs are
+    skipped, which makes stream retries idempotent (readings arrive in time order).
+    A genuinely late reading (a device flushing its buffer) looks the same as a replay,
+    so it is skipped too, but counted.
+    Returns (new item or None if nothing was applied, readings skipped).
+    """
+    patient_id, resolution = rollup_key.rsplit('#', 1)
+    merged = dict(item) if item else {
+        'rollupKey': rollup_key,
+        'bucket': bucket,
+        'patientId': patient_id,
+        'resolution': resolution,
+        'count': 0,
+        'lastTs': 0,
+        'version': 0
+    }
+    last_ts = int(merged.get('lastTs', 0))
+    applied = skipped = 0
+
+    for ts, values in readings:
+        if ts <= last_ts:
+            skipped += 1
+            continue
+        for metric, value in values.items():
+            stats = merged.get(metric)
+            if stats is None:
+                merged[metric] = {'count': 1, 'sum': value, 'min': value, 'max': value, 'last': value}
+            else:
+                stats = dict(stats)
+                stats['count'] = stats['count'] + 1
+                stats['sum'] = stats['sum'] + value
+                stats['min'] = min(stats['min'], value)
+                stats['max'] = max(stats['max'], value)
+                stats['last'] = value
+                merged[metric] = stats
+        merged['count'] = merged['count'] + 1
+        last_ts = ts
+        applied += 1
+
+    if not applied:
+        return None, skipped
+
+    for metric in METRICS:
+        if metric in merged:
+            stats = merged[metric]
+            stats['mean'] = (stats['sum'] / stats['count']).quantize(Decimal('0.001'))
+
+    retention = next(days for res, _, days in TIERS if res == resolution)
+    if retention:
+        merged['expiresAt'] = int((bucket + retention * DAY_MS) / 1000)
+    merged['lastTs'] = last_ts
+    return merged, skipped
+
+
+def _write(table, merged):
+    """Conditional put: only succeeds if nobody else bumped the version since we read it."""
+    expected = int(merged.get('version', 0))
+    merged['version'] = expected + 1
+    if expected == 0:
+        table.put_item(Item=merged, ConditionExpression='attribute_not_exists(rollupKey)')
+    else:
+        table.put_item(
+            Item=merged,
+            ConditionExpression='#v = :expected',
+            ExpressionAttributeNames={'#v': 'version'},
+            ExpressionAttributeValues={':expected': expected}
+        )
+
+
+def apply_rollups(readings):
+    """Returns (buckets written, readings skipped as at or before a bucket's lastTs)."""
+    table = get_table(ROLLUP_TABLE)
+    groups = group_by_bucket(readings)
+    existing = _fetch_existing(groups.keys())
+    written = skipped = 0
+
+    for (rollup_key, bucket), bucket_readings in groups.items():
+        current = existing.get((rollup_key, bucket))
+        for attempt in range(MAX_CONFLICT_RETRIES):
+            merged, late = merge_readings(current, rollup_key, bucket, bucket_readings)
+            if merged is None:
+                skipped += late
+                break
+            try:
+                _write(table, merged)
+                written += 1
+                skipped += late
+                break
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+                # Concurrent writer (e.g. shard split): re-read and fold again
+                current = table.get_item(
+                    Key={'rollupKey': rollup_key, 'bucket': bucket}, ConsistentRead=True
+                ).get('Item')
+        else:
+            raise RuntimeError(f"Rollup write kept conflicting for {rollup_key} @ {bucket}")
+
+    return written, skipped
+
+
+def lambda_handler(event, context):
+    readings = extract_readings(event)
+    if not readings:
+        return {"statusCode": 200, "body": json.dumps({"message": "No vitals readings in event"})}
+
+    # Any exception propagates so the stream batch is retried; lastTs guards make that safe.
+    written, skipped = apply_rollups(readings)
+    print(f"✅ Rolled up {len(readings)} readings into {written} buckets")
+    if skipped:
+        # Counted once per tier: replays, or readings older than their bucket's newest one
+        print(f"⚠️ {skipped} bucket updates skipped (reading at or before the bucket's lastTs)")
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({"readings": len(readings), "bucketsWritten": written, "skippedLate": skipped})
+    }
@@ -0,0 +1,105 @@
+"""
+Import-time profiler for the Python Lambdas in this folder.
+
+Imports each function's handler module in a fresh interpreter with
+``python -X importtime`` (the same work Lambda does during INIT) and prints
+a per-function report: total import time, number of modules loaded and the
+heaviest imports. Run it before and after a change to measure the
+init-duration saved per function.
+
+Usage:
+    python profile_imports.py                       # every Python function
+    python profile_imports.py mediconnect-ai-service --top 10
+    python profile_imports.py --json > init_report.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+LAMBDAS_DIR = os.path.dirname(os.path.abspath(__file__))
+HANDLER_MODULES = ('lambda_function', 'handler')
+
+
+def find_functions():
+    """Yields (function_dir, handler_module) for every Python Lambda in this folder."""
+    for name in sorted(os.listdir(LAMBDAS_DIR)):
+        path = os.path.join(LAMBDAS_DIR, name)
+        if not os.path.isdir(path):
+            continue
+        for module in HANDLER_MODULES:
+            if os.path.exists(os.path.join(path, f"{module}.py")):
+                yield name, module
+                break
+
+
+def parse_importtime(stderr):
+    """Parses `-X importtime` output into a list of (self_us, cumulative_us, module)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len('import time:'):].split('|', 2)
+            rows.append((int(self_us), int(cumulative_us), module.rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def profile_function(function_dir, module, top=5):
+    """Imports one handler module in a clean subprocess and summarises the cost."""
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=os.path.join(LAMBDAS_DIR, function_dir),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    rows = parse_importtime(result.stderr)
+    handler_row = next((row for row in reversed(rows) if row[2].strip() == module), None)
+
+    report = {
+        'function': function_dir,
+        'handler': module,
+        'ok': result.returncode == 0,
+        'modulesLoaded': len(rows),
+        'totalImportMs': round(handler_row[1] / 1000, 2) if handler_row else None,
+        'heaviest': [
+            {'module': name.strip(), 'cumulativeMs': round(cumulative / 1000, 2), 'selfMs': round(own / 1000, 2)}
+            for own, cumulative, name in sorted(rows, key=lambda r: r[1], reverse=True)
+            if name.strip() != module
+        ][:top]
+    }
+    if result.returncode != 0:
+        report['error'] = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed'
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure INIT import cost of the Python Lambdas.")
+    parser.add_argument('functions', nargs='*', help="Function folders to profile (default: all)")
+    parser.add_argument('--top', type=int, default=5, help="How many of the heaviest imports to list")
+    parser.add_argument('--json', action='store_true', help="Emit the report as JSON")
+    args = parser.parse_args()
+
+    targets = [(name, module) for name, module in find_functions() if not args.functions or name in args.functions]
+    reports = [profile_function(name, module, args.top) for name, module in targets]
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    for report in reports:
+        total = f"{report['totalImportMs']} ms" if report['totalImportMs'] is not None else "n/a"
+        print(f"{report['function']} ({report['handler']}.py): {total}, {report['modulesLoaded']} modules")
+        if not report['ok']:
+            print(f"    ⚠️ {report['error']}")
+        for heavy in report['heaviest']:
+            print(f"    {heavy['cumulativeMs']:>9.2f} ms  {heavy['module']}")
+
+
+if __name__ == '__main__':
+    main()
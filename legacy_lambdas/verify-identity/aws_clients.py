@@ -0,0 +1,121 @@
+import os
+import threading
+from contextlib import contextmanager
+import boto3
+from botocore.config import Config
+
+# --- LAZY AWS CLIENT REGISTRY ---
+# Clients are built the first time a request actually needs them (not at import),
+# so a cold start only pays for the services that invocation touches.
+# Everything shares ONE boto3 session -> one botocore loader, one credential cache.
+# Low-level clients are thread-safe and may be shared by worker threads; boto3 resources (and
+# their Table handles) are not, so thread-pool workers borrow their own via worker_resource /
+# worker_table. Borrowed resources go back to an idle pool and are reused by later invocations.
+
+DEFAULT_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+
+BASE_CONFIG = Config(
+    connect_timeout=float(os.environ.get('AWS_CONNECT_TIMEOUT', '2')),
+    read_timeout=float(os.environ.get('AWS_READ_TIMEOUT', '15')),
+    max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32')),
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+
+# Per-service tweaks merged on top of BASE_CONFIG
+SERVICE_CONFIG = {
+    's3': Config(signature_version='s3v4'),
+    'bedrock-runtime': Config(read_timeout=60),
+    'transcribe': Config(read_timeout=30)
+}
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_resources = {}
+_tables = {}
+_idle_resources = {}  # (service, region) -> [resource, ...] not currently borrowed
+
+
+def get_session():
+    """Returns the process-wide boto3 session (created once per container)."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = boto3.session.Session()
+    return _session
+
+
+def _config_for(service_name, extra_config=None):
+    config = BASE_CONFIG
+    if service_name in SERVICE_CONFIG:
+        config = config.merge(SERVICE_CONFIG[service_name])
+    if extra_config is not None:
+        config = config.merge(extra_config)
+    return config
+
+
+def get_client(service_name, region_name=None):
+    """Returns a memoized low-level client, building it on first use."""
+    region = region_name or DEFAULT_REGION
+    key = (service_name, region)
+    client = _clients.get(key)
+    if client is None:
+        session = get_session()
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = session.client(service_name, region_name=region, config=_config_for(service_name))
+                _clients[key] = client
+    return client
+
+
+def get_resource(service_name, region_name=None):
+    """Returns a memoized boto3 resource (e.g. dynamodb), building it on first use."""
+    region = region_name or DEFAULT_REGION
+    key = (service_name, region)
+    resource = _resources.get(key)
+    if resource is None:
+        session = get_session()
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = session.resource(service_name, region_name=region, config=_config_for(service_name))
+                _resources[key] = resource
+    return resource
+
+
+def get_table(table_name, region_name=None):
+    """Returns a memoized DynamoDB Table handle."""
+    key = (table_name, region_name or DEFAULT_REGION)
+    table = _tables.get(key)
+    if table is None:
+        table = get_resource('dynamodb', region_name).Table(table_name)
+        _tables[key] = table
+    return table
+
+
+@contextmanager
+def worker_resource(service_name, region_name=None):
+    """A boto3 resource used by the calling thread only, for the duration of the with-block."""
+    key = (service_name, region_name or DEFAULT_REGION)
+    with _lock:
+        idle = _idle_resources.setdefault(key, [])
+        resource = idle.pop() if idle else None
+    if resource is None:
+        session = get_session()
+        with _lock:  # building from the shared session is not thread-safe either
+            resource = session.resource(service_name, region_name=key[1], config=_config_for(service_name))
+    try:
+        yield resource
+    finally:
+        with _lock:
+            _idle_resources[key].append(resource)
+
+
+@contextmanager
+def worker_table(table_name, region_name=None):
+    """DynamoDB Table handle for one worker thread (see worker_resource)."""
+    with worker_resource('dynamodb', region_name) as dynamodb:
+        yield dynamodb.Table(table_name)
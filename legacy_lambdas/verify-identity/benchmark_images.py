@@ -0,0 +1,95 @@
+"""
+Local corpus benchmark for the verify-identity image normalization stage (image_prep.normalize).
+
+Runs every image in a directory (or a generated synthetic corpus of phone-sized JPEGs with
+EXIF orientation tags) through normalize() and reports bytes in/out and decode+encode latency.
+Requires Pillow locally.
+
+Usage:
+    python benchmark_images.py --corpus ./selfies              # *.jpg / *.jpeg / *.png in a folder
+    python benchmark_images.py --synthetic 20                  # 20 generated 4032x3024 JPEGs, seed 42
+    python benchmark_images.py --synthetic 20 --max-edge 960 --quality 80
+"""
+import os
+import io
+import glob
+import time
+import random
+import argparse
+import statistics
+import image_prep
+
+
+def synthetic_corpus(count, seed, size=(4032, 3024)):
+    from PIL import Image, ImageFilter
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        # Smooth gradients + noise compress like real photos (pure noise would not)
+        base = Image.linear_gradient('L').resize(size).convert('RGB')
+        noise = Image.effect_noise(size, rng.uniform(20, 60)).convert('RGB')
+        image = Image.blend(base, noise, 0.35).filter(ImageFilter.GaussianBlur(1.5))
+        exif = Image.Exif()
+        exif[image_prep.EXIF_ORIENTATION] = rng.choice([1, 3, 6, 8])
+        out = io.BytesIO()
+        image.save(out, format='JPEG', quality=92, exif=exif)
+        corpus.append((f"synthetic-{i}.jpg", out.getvalue()))
+    return corpus
+
+
+def load_corpus(directory):
+    paths = []
+    for pattern in ('*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG'):
+        paths.extend(glob.glob(os.path.join(directory, pattern)))
+    corpus = []
+    for path in sorted(set(paths)):
+        with open(path, 'rb') as f:
+            corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark verify-identity image normalization.")
+    parser.add_argument('--corpus', help="Directory of sample images")
+    parser.add_argument('--synthetic', type=int, default=0, help="Generate N phone-sized JPEGs instead")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-edge', type=int, help="Override NORMALIZE_MAX_EDGE")
+    parser.add_argument('--quality', type=int, help="Override NORMALIZE_QUALITY")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per image; the fastest is reported")
+    args = parser.parse_args()
+
+    if not image_prep.available():
+        parser.error("Pillow is not installed")
+    if args.max_edge:
+        image_prep.MAX_EDGE = args.max_edge
+    if args.quality:
+        image_prep.QUALITY = args.quality
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.synthetic or 10, args.seed)
+    if not corpus:
+        parser.error("No images found")
+
+    timings, bytes_in, bytes_out = [], 0, 0
+    for name, data in corpus:
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            encoded, info = image_prep.normalize(data)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+        bytes_in += info['bytesIn']
+        bytes_out += info['bytesOut']
+        print(f"{name:28s} {info['bytesIn'] / 1024:8.0f} KB -> {info['bytesOut'] / 1024:6.0f} KB "
+              f"{info.get('width', '?')}x{info.get('height', '?')}  {best * 1000:6.1f} ms")
+
+    timings.sort()
+    print(f"\nimages:     {len(corpus)}")
+    print(f"bytes:      {bytes_in / 1048576:.1f} MB -> {bytes_out / 1048576:.1f} MB ({bytes_out / bytes_in:.1%})")
+    print(f"latency:    p50 {statistics.median(timings) * 1000:.1f} ms, "
+          f"p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000:.1f} ms")
+    print(f"settings:   max edge {image_prep.MAX_EDGE}px, quality {image_prep.QUALITY}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import io
+import shutil
+import tempfile
+
+try:
+    from PIL import Image, ImageOps  # Optional: listed in requirements.txt (or use a Pillow layer)
+except ImportError:
+    Image = None
+
+# --- IMAGE NORMALIZATION BEFORE compare_faces ---
+# Phone selfies arrive at 12+ MP; Rekognition only needs faces of a few hundred pixels.
+# One decode, in this order:
+#   1. JPEG draft mode: libjpeg decodes directly at 1/2, 1/4 or 1/8 scale (DCT scaling), so a
+#      4032x3024 selfie is never materialized at full size
+#   2. EXIF orientation applied to the pixels (Rekognition ignores the EXIF tag)
+#   3. downsize so the long edge is <= NORMALIZE_MAX_EDGE
+#   4. re-encode as baseline JPEG at NORMALIZE_QUALITY
+# Images that are already small, upright JPEGs are passed through untouched (no re-encode).
+# Without Pillow every image is passed through as-is.
+# A streamed source (S3 Body) is spooled to a temp file past SPOOL_MEMORY_BYTES instead of being read
+# into memory: the decoder needs a seekable file, and draft mode only reads what the scaled decode needs.
+
+MAX_EDGE = int(os.environ.get('NORMALIZE_MAX_EDGE', '1280'))
+QUALITY = int(os.environ.get('NORMALIZE_QUALITY', '85'))
+PASS_THROUGH_BYTES = 300 * 1024
+SPOOL_MEMORY_BYTES = 1024 * 1024
+EXIF_ORIENTATION = 0x0112
+
+
+class UnreadableImage(ValueError):
+    """The bytes could not be decoded as an image."""
+
+
+def available():
+    return Image is not None
+
+
+def normalize(source):
+    """
+    source: bytes or a binary file-like object (e.g. a streaming S3 Body).
+    Returns (jpeg_bytes, info) where info = {"normalized", "width", "height", "bytesIn", "bytesOut"}.
+    Raises UnreadableImage if Pillow cannot decode the source.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        if Image is None:
+            return bytes(source), {'normalized': False, 'bytesIn': len(source), 'bytesOut': len(source)}
+        return _normalize_file(io.BytesIO(source), len(source))
+    if Image is None:
+        data = source.read()
+        return data, {'normalized': False, 'bytesIn': len(data), 'bytesOut': len(data)}
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as spool:
+        shutil.copyfileobj(source, spool)
+        size = spool.tell()
+        spool.seek(0)
+        return _normalize_file(spool, size)
+
+
+def _normalize_file(file, size):
+    try:
+        return _decode(file, size)
+    except Exception as e:
+        # Pillow raises OSError, ValueError, SyntaxError or DecompressionBombError on bad input
+        raise UnreadableImage(str(e)) from e
+
+
+def _decode(file, size):
+    image = Image.open(file)
+    width, height = image.size
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    if (image.format == 'JPEG' and orientation == 1 and max(width, height) <= MAX_EDGE
+            and size <= PASS_THROUGH_BYTES):
+        file.seek(0)
+        return file.read(), {'normalized': False, 'width': width, 'height': height,
+                             'bytesIn': size, 'bytesOut': size}
+
+    if image.format == 'JPEG':
+        # Ask libjpeg for the smallest DCT scale that still covers MAX_EDGE on the long side
+        scale = max(width, height) / MAX_EDGE
+        if scale > 1:
+            image.draft('RGB', (round(width / scale), round(height / scale)))
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((MAX_EDGE, MAX_EDGE), Image.LANCZOS)
+
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=QUALITY, optimize=False, progressive=False)
+    encoded = out.getvalue()
+    return encoded, {'normalized': True, 'width': image.width, 'height': image.height,
+                     'bytesIn': size, 'bytesOut': len(encoded)}
@@ -1,27 +1,219 @@
 import json
-import boto3
 import base64
 import os
+from concurrent.futures import ThreadPoolExecutor
+from aws_clients import get_client, get_table
+from upload_flow import (
+    issue_upload_urls, upload_keys, valid_upload_id, check_uploads, normalize_upload,
+    NORMALIZE_OVER_BYTES, AUTO_DELETE_TAGGING
+)
+import image_prep
+import match_cache
+import verify_jobs
 
-# Initialize Clients
-s3 = boto3.client('s3')
-rekognition = boto3.client('rekognition')
-dynamodb = boto3.resource('dynamodb')
+# Clients are created lazily and memoized per container (see aws_clients.py)
 
 # Ensure this bucket name is correct
 BUCKET_NAME = "mediconnect-identity-verification"
+SIMILARITY_THRESHOLD = 80
+COMPARISON_FAILED = "Face comparison failed. Ensure images are clear."
+
+
+def compare_faces(rekognition, source_image, target_image):
+    """Returns (verified, confidence, message). Lets InvalidS3ObjectException propagate."""
+    try:
+        response = rekognition.compare_faces(
+            SourceImage=source_image,
+            TargetImage=target_image,
+            SimilarityThreshold=SIMILARITY_THRESHOLD
+        )
+        if len(response['FaceMatches']) > 0:
+            confidence = response['FaceMatches'][0]['Similarity']
+            print(f"✅ Identity Verification: SUCCESS. Match Confidence: {confidence:.2f}%")
+            return True, confidence, f"Identity Verified. Confidence: {confidence:.2f}%"
+        return False, 0, "Face does not match the provided ID card."
+    except rekognition.exceptions.InvalidS3ObjectException:
+        raise
+    except Exception as e:
+        print(f"Rekognition Error: {str(e)}")
+        return False, 0, COMPARISON_FAILED
+
+
+def compare_faces_cached(rekognition, key, cached, user_id, source_image, target_image):
+    """
+    compare_faces unless `cached` (the caller's match_cache.lookup(key)) already holds the outcome.
+    Fresh outcomes are stored under `key`; Rekognition errors are returned but never cached.
+    """
+    if cached is not None:
+        print(f"⚡ Verification cache hit for {user_id}")
+        return cached['verified'], cached['confidence'], cached['message']
+    verified, confidence, message = compare_faces(rekognition, source_image, target_image)
+    if message != COMPARISON_FAILED:
+        match_cache.store(key, user_id, verified, confidence, message)
+    return verified, confidence, message
+
+
+def record_verified(s3, user_role, user_id, table_name, id_key_field, selfie_bytes=None, selfie_source_key=None):
+    """Stores the verified selfie as the avatar, updates the profile. Returns (presigned url, db status)."""
+    # Define the Path
+    selfie_key = f"{user_role}/{user_id}/selfie_verified.jpg"
+
+    if selfie_bytes is not None:
+        # Upload to S3
+        s3.put_object(Bucket=BUCKET_NAME, Key=selfie_key, Body=selfie_bytes, ContentType='image/jpeg')
+    else:
+        # Server-side copy; replace the upload's auto-delete tag (the avatar must survive the lifecycle rule)
+        s3.copy_object(
+            Bucket=BUCKET_NAME,
+            Key=selfie_key,
+            CopySource={'Bucket': BUCKET_NAME, 'Key': selfie_source_key},
+            ContentType='image/jpeg',
+            MetadataDirective='REPLACE',
+            TaggingDirective='REPLACE',
+            Tagging='verified=true'
+        )
+
+    # Only once the avatar exists: the profile must never point at a missing object
+    db_status = update_profile(user_role, user_id, table_name, id_key_field, selfie_key)
+
+    # Generate temporary link JUST for the immediate response (signed locally, no network call)
+    secure_url = s3.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': BUCKET_NAME, 'Key': selfie_key},
+        ExpiresIn=3600
+    )
+    return secure_url, db_status
+
+
+def update_profile(user_role, user_id, table_name, id_key_field, selfie_key):
+    try:
+        table = get_table(table_name)
+
+        # Update attributes.
+        # CRITICAL CHANGE: We save 'selfie_key' (the path), NOT the URL.
+        update_expr = "set avatar = :a, isIdentityVerified = :v, verificationStatus = :s"
+        expr_values = {
+            ':a': selfie_key,
+            ':v': True,
+            ':s': "PENDING_REVIEW" if user_role == 'doctor' else "VERIFIED"
+        }
+
+        table.update_item(
+            Key={id_key_field: user_id},
+            UpdateExpression=update_expr,
+            ExpressionAttributeValues=expr_values
+        )
+        db_status = "Profile Updated"
+    except Exception as e:
+        db_status = f"DB Error: {str(e)}"
+        print(db_status)
+    return db_status
+
+
+def profile_table(user_role):
+    """(table name, key attribute) of the profile a verification updates."""
+    if user_role == 'doctor':
+        return "mediconnect-doctors", 'doctorId'
+    return "mediconnect-patients", 'patientId'
+
+
+def run_verification(s3, rekognition, user_role, user_id, upload_id):
+    """Two-phase verify from the uploads under upload_id. Returns (statusCode, body payload)."""
+    table_name, id_key_field = profile_table(user_role)
+    id_key, selfie_upload_key = upload_keys(user_role, user_id, upload_id)
+    problem, objects = check_uploads(s3, BUCKET_NAME, (id_key, selfie_upload_key))
+    if problem:
+        return problem
+    # Keyed on the ETags of the uploads as PUT (before normalization rewrites them)
+    key = match_cache.cache_key(
+        user_role, user_id,
+        match_cache.etag_digest(objects[id_key]['etag']),
+        match_cache.etag_digest(objects[selfie_upload_key]['etag'])
+    )
+    cached = match_cache.lookup(key)
+    if cached is None and image_prep.available():
+        large = [object_key for object_key, head in objects.items() if head['size'] > NORMALIZE_OVER_BYTES]
+        if large:
+            try:
+                with ThreadPoolExecutor(max_workers=len(large)) as pool:
+                    for object_key, info in zip(large, pool.map(lambda k: normalize_upload(s3, BUCKET_NAME, k), large)):
+                        print(f"🖼️ Normalized {object_key}: {info}")
+            except image_prep.UnreadableImage as e:
+                print(f"⚠️ Upload is not a readable image: {str(e)}")
+                return 400, "Uploaded image could not be read. Please upload a JPEG or PNG."
+    try:
+        verified, confidence, message = compare_faces_cached(
+            rekognition, key, cached, user_id,
+            {'S3Object': {'Bucket': BUCKET_NAME, 'Name': id_key}},
+            {'S3Object': {'Bucket': BUCKET_NAME, 'Name': selfie_upload_key}}
+        )
+    except rekognition.exceptions.InvalidS3ObjectException:
+        return 400, "Uploaded image could not be read. Please upload a JPEG or PNG."
+    photo_url = None
+    if verified:
+        photo_url, _ = record_verified(s3, user_role, user_id, table_name, id_key_field, selfie_source_key=selfie_upload_key)
+    return 200, verification_payload(verified, confidence, message, photo_url)
+
+
+def run_verification_job(params):
+    """verify_jobs runner: the same two-phase verify, executed by the queue worker."""
+    return run_verification(
+        get_client('s3'), get_client('rekognition'), params['role'], params['userId'], params['uploadId']
+    )
+
+
+def verification_payload(verified, confidence, message, photo_url):
+    return {
+        "verified": verified,
+        "confidence": confidence,
+        "message": message,
+        "photoUrl": photo_url if verified else None
+    }
+
+
+def verification_response(headers, verified, confidence, message, photo_url):
+    return {
+        "statusCode": 200,
+        "headers": headers,
+        "body": json.dumps(verification_payload(verified, confidence, message, photo_url))
+    }
+
+
+def job_status_response(headers, job_id, user_id):
+    job = verify_jobs.get_job(job_id) if job_id else None
+    # A job is only visible to the user it belongs to
+    if not job or job.get('userId') != user_id:
+        return {"statusCode": 404, "headers": headers, "body": json.dumps("Verification job not found")}
+    return {"statusCode": 200, "headers": headers, "body": json.dumps(verify_jobs.status_payload(job))}
+
 
 def lambda_handler(event, context):
     headers = {
         "Access-Control-Allow-Origin": "*",
         "Access-Control-Allow-Headers": "Content-Type,Authorization",
-        "Access-Control-Allow-Methods": "OPTIONS,POST"
+        "Access-Control-Allow-Methods": "OPTIONS,GET,POST"
     }
 
+    # SQS worker: async verification jobs (see verify_jobs.py)
+    if 'Records' in event:
+        failures = []
+        for record in event['Records']:
+            if not verify_jobs.process(json.loads(record['body'])['jobId'], run_verification_job):
+                failures.append({"itemIdentifier": record['messageId']})
+        return {"batchItemFailures": failures}
+
     # 1. CORS Preflight
     if event.get('httpMethod') == 'OPTIONS':
         return {"statusCode": 200, "headers": headers, "body": ""}
 
+    # Job status polling
+    if event.get('httpMethod') == 'GET':
+        params = event.get('queryStringParameters') or {}
+        return job_status_response(headers, params.get('jobId'), params.get('userId'))
+
+    s3 = get_client('s3')
+    rekognition = get_client('rekognition')
+
     try:
         # 2. Parse Body
         body = json.loads(event['body']) if isinstance(event.get('body'), str) else event.get('body', {})
@@ -35,8 +227,39 @@ def lambda_handler(event, context):
         user_role = 'doctor' if raw_role == 'provider' else raw_role
         
         # Select DynamoDB Table
-        table_name = "mediconnect-doctors" if user_role == 'doctor' else "mediconnect-patients"
-        id_key_field = 'doctorId' if user_role == 'doctor' else 'patientId'
+        table_name, id_key_field = profile_table(user_role)
+
+        # 🟢 TWO-PHASE MODE, step 1: hand out presigned PUTs, the images never pass through Lambda
+        action = body.get('action')
+        if action == 'upload-urls':
+            return {
+                "statusCode": 200,
+                "headers": headers,
+                "body": json.dumps(issue_upload_urls(s3, BUCKET_NAME, user_role, user_id))
+            }
+
+        # 🟢 TWO-PHASE MODE, step 2: Rekognition reads both images straight from S3
+        if action == 'verify':
+            upload_id = body.get('uploadId')
+            if not valid_upload_id(upload_id):
+                return {"statusCode": 400, "headers": headers, "body": json.dumps("Missing or invalid uploadId")}
+            if body.get('async'):
+                if not verify_jobs.enabled():
+                    return {"statusCode": 400, "headers": headers, "body": json.dumps("Async verification is not enabled")}
+                # 🟢 ASYNC MODE: accept now, verify in the worker, client polls the job status
+                job_id = verify_jobs.submit(
+                    user_id, {'userId': user_id, 'role': user_role, 'uploadId': upload_id}, run_verification_job
+                )
+                return {
+                    "statusCode": 202,
+                    "headers": headers,
+                    "body": json.dumps({"jobId": job_id, "status": "QUEUED", "pollAfterMs": verify_jobs.POLL_AFTER_MS})
+                }
+            status_code, payload = run_verification(s3, rekognition, user_role, user_id, upload_id)
+            return {"statusCode": status_code, "headers": headers, "body": json.dumps(payload)}
+
+        if action == 'job-status':
+            return job_status_response(headers, body.get('jobId'), user_id)
 
         # 3. Decode Images
         if 'selfieImage' not in body:
@@ -47,121 +270,71 @@ def lambda_handler(event, context):
         except:
              return {"statusCode": 400, "headers": headers, "body": json.dumps("Invalid Selfie Base64")}
 
+        # 🟢 Decode once, fix EXIF orientation, downsize, re-encode (pass-through without Pillow)
+        try:
+            selfie_bytes, _ = image_prep.normalize(selfie_bytes)
+        except Exception as e:
+            print(f"⚠️ Selfie normalization skipped: {str(e)}")
+
         # 🟢 CRITICAL STEP: Upload the Source ID Card to S3 FIRST
         id_card_key = f"{user_role}/{user_id}/id_card.jpg"
+        cache_key, cached = None, None
         
         # We need an ID image to compare against. 
         # If frontend sent it, save it.
         if 'idImage' in body and body['idImage']:
             try:
                 id_bytes = base64.b64decode(body['idImage'])
-                
-                # 1. Upload the file
-                s3.put_object(
-                    Bucket=BUCKET_NAME, 
-                    Key=id_card_key, 
-                    Body=id_bytes, 
-                    ContentType='image/jpeg'
-                )
+                try:
+                    id_bytes, _ = image_prep.normalize(id_bytes)
+                except Exception as e:
+                    print(f"⚠️ ID card normalization skipped: {str(e)}")
 
-                # ---------------------------------------------------------
-                # NEW CODE: Add Tag for Auto-Deletion (Lifecycle Rule)
-                # ---------------------------------------------------------
-                s3.put_object_tagging(
-                    Bucket=BUCKET_NAME,
-                    Key=id_card_key,
-                    Tagging={
-                        'TagSet': [
-                            {'Key': 'auto-delete', 'Value': 'true'}
-                        ]
-                    }
+                # Same images as an earlier attempt -> reuse its outcome, no upload, no Rekognition
+                cache_key = match_cache.cache_key(
+                    user_role, user_id,
+                    match_cache.content_digest(id_bytes), match_cache.content_digest(selfie_bytes)
                 )
-                # ---------------------------------------------------------
-
-                print(f"✅ ID Card uploaded and tagged: {id_card_key}")
+                cached = match_cache.lookup(cache_key)
+                if cached is None:
+                    # One round trip: the auto-delete tag (Lifecycle Rule) is set by the PUT itself
+                    s3.put_object(
+                        Bucket=BUCKET_NAME,
+                        Key=id_card_key,
+                        Body=id_bytes,
+                        ContentType='image/jpeg',
+                        Tagging=AUTO_DELETE_TAGGING
+                    )
+                    print(f"✅ ID Card uploaded and tagged: {id_card_key}")
             except Exception as e:
                 print(f"⚠️ S3 Upload/Tag Error: {str(e)}")
                 return {"statusCode": 500, "headers": headers, "body": json.dumps("Failed to save ID card to S3.")}
         
         # 4. Run Rekognition (Compare Selfie vs ID Card in S3)
-        verification_result = False
-        confidence = 0
-        message = "Identity Verification Failed"
-
         try:
-            response = rekognition.compare_faces(
-                SourceImage={'S3Object': {'Bucket': BUCKET_NAME, 'Name': id_card_key}},
-                TargetImage={'Bytes': selfie_bytes},
-                SimilarityThreshold=80
-            )
-            
-            if len(response['FaceMatches']) > 0:
-                match = response['FaceMatches'][0]
-                confidence = match['Similarity']
-                verification_result = True
-                message = f"Identity Verified. Confidence: {confidence:.2f}%"
-                print(f"✅ Identity Verification: SUCCESS. Match Confidence: {confidence:.2f}%")
+            source_image = {'S3Object': {'Bucket': BUCKET_NAME, 'Name': id_card_key}}
+            if cache_key:
+                verification_result, confidence, message = compare_faces_cached(
+                    rekognition, cache_key, cached, user_id, source_image, {'Bytes': selfie_bytes}
+                )
             else:
-                message = "Face does not match the provided ID card."
-
+                # ID card from an earlier request: its bytes are unknown here, so no cache key
+                verification_result, confidence, message = compare_faces(
+                    rekognition, source_image, {'Bytes': selfie_bytes}
+                )
         except rekognition.exceptions.InvalidS3ObjectException:
             # This is the 404 error you saw before. 
             # It means the ID card wasn't uploaded in the previous step.
             return {"statusCode": 404, "headers": headers, "body": json.dumps("ID Document missing. Please ensure ID is uploaded.")}
-        except Exception as e:
-            print(f"Rekognition Error: {str(e)}")
-            message = "Face comparison failed. Ensure images are clear."
 
-       # 5. Update Database if Verified
-        db_status = "Skipped"
+        # 5. Update Database if Verified
         secure_url_for_frontend = None
-
         if verification_result:
-            # Define the Path
-            selfie_key = f"{user_role}/{user_id}/selfie_verified.jpg"
-            
-            # Upload to S3
-            s3.put_object(Bucket=BUCKET_NAME, Key=selfie_key, Body=selfie_bytes, ContentType='image/jpeg')
-
-            # Generate temporary link JUST for the immediate response
-            secure_url_for_frontend = s3.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': BUCKET_NAME, 'Key': selfie_key},
-                ExpiresIn=3600
+            secure_url_for_frontend, _ = record_verified(
+                s3, user_role, user_id, table_name, id_key_field, selfie_bytes=selfie_bytes
             )
-            
-            try:
-                table = dynamodb.Table(table_name)
-                
-                # Update attributes. 
-                # CRITICAL CHANGE: We save 'selfie_key' (the path), NOT the URL.
-                update_expr = "set avatar = :a, isIdentityVerified = :v, verificationStatus = :s"
-                expr_values = {
-                    ':a': selfie_key,
-                    ':v': True,
-                    ':s': "PENDING_REVIEW" if user_role == 'doctor' else "VERIFIED"
-                }
 
-                table.update_item(
-                    Key={id_key_field: user_id},
-                    UpdateExpression=update_expr,
-                    ExpressionAttributeValues=expr_values
-                )
-                db_status = "Profile Updated"
-            except Exception as e:
-                db_status = f"DB Error: {str(e)}"
-                print(db_status)
-
-        return {
-            "statusCode": 200,
-            "headers": headers,
-            "body": json.dumps({
-                "verified": verification_result,
-                "confidence": confidence,
-                "message": message,
-                "photoUrl": secure_url_for_frontend if verification_result else None
-            })
-        }
+        return verification_response(headers, verification_result, confidence, message, secure_url_for_frontend)
 
     except Exception as e:
         print(f"Global Error: {str(e)}")
@@ -0,0 +1,97 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+
+# --- FACE-MATCH RESULT CACHE ---
+# Users retry verification with the same photos. A compare_faces outcome is keyed by
+# (user, role, ID image digest, selfie digest), so a repeat with identical images skips the
+# ID upload and the Rekognition call.
+#   digest = SHA-256 of the normalized bytes (base64 mode), or "etag-<S3 ETag>" for two-phase
+#            uploads, whose single-part PUT ETag is already a content hash of the object
+# Two tiers: a per-container LRU, then (when VERIFICATION_CACHE_TABLE is set) a DynamoDB table
+#   PK cacheKey (S), TTL attribute expiresAt (enable DynamoDB TTL on it)
+# Only real comparisons are cached, never Rekognition errors. Mismatches expire sooner than
+# matches so a user who fixes lighting on a new photo is not affected (new bytes = new key anyway).
+
+CACHE_TABLE = os.environ.get('VERIFICATION_CACHE_TABLE')
+MATCH_TTL_SECONDS = int(os.environ.get('VERIFICATION_CACHE_TTL_SECONDS', str(24 * 3600)))
+MISMATCH_TTL_SECONDS = int(os.environ.get('VERIFICATION_CACHE_MISMATCH_TTL_SECONDS', '3600'))
+MAX_LOCAL_ENTRIES = 512
+
+_lock = threading.Lock()
+_local = OrderedDict()   # cache key -> (expires_at, result)
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def etag_digest(etag):
+    return 'etag-' + etag.strip('"')
+
+
+def cache_key(user_role, user_id, id_digest, selfie_digest):
+    seed = f"{user_role}|{user_id}|{id_digest}|{selfie_digest}"
+    return hashlib.sha256(seed.encode('utf-8')).hexdigest()
+
+
+def _remember(key, expires_at, result):
+    with _lock:
+        _local[key] = (expires_at, result)
+        _local.move_to_end(key)
+        while len(_local) > MAX_LOCAL_ENTRIES:
+            _local.popitem(last=False)
+
+
+def lookup(key):
+    """Returns the cached {"verified", "confidence", "message"} or None."""
+    now = time.time()
+    with _lock:
+        entry = _local.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _local.move_to_end(key)
+                return entry[1]
+            del _local[key]
+
+    if not CACHE_TABLE:
+        return None
+    try:
+        item = get_table(CACHE_TABLE).get_item(Key={'cacheKey': key}).get('Item')
+    except ClientError as e:
+        print(f"⚠️ Verification cache read failed: {str(e)}")
+        return None
+    # DynamoDB TTL deletes lazily: an expired item can still be read for a while
+    if not item or int(item.get('expiresAt', 0)) <= now:
+        return None
+    result = {
+        'verified': bool(item['verified']),
+        'confidence': float(item.get('confidence', 0)),
+        'message': item.get('message', '')
+    }
+    _remember(key, int(item['expiresAt']), result)
+    return result
+
+
+def store(key, user_id, verified, confidence, message):
+    expires_at = int(time.time()) + (MATCH_TTL_SECONDS if verified else MISMATCH_TTL_SECONDS)
+    result = {'verified': verified, 'confidence': confidence, 'message': message}
+    _remember(key, expires_at, result)
+    if not CACHE_TABLE:
+        return
+    try:
+        get_table(CACHE_TABLE).put_item(Item={
+            'cacheKey': key,
+            'userId': user_id,
+            'verified': verified,
+            'confidence': Decimal(str(round(confidence, 4))),
+            'message': message,
+            'expiresAt': expires_at
+        })
+    except ClientError as e:
+        print(f"⚠️ Verification cache write failed: {str(e)}")
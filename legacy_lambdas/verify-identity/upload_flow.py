@@ -0,0 +1,96 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+import image_prep
+
+# --- TWO-PHASE (DIRECT-TO-S3) VERIFICATION ---
+# Phase 1  POST {"action": "upload-urls", "userId", "role"}
+#          -> presigned PUT URLs for the ID card and the selfie + an uploadId.
+#          The browser PUTs the raw JPEG bytes straight to S3 (no base64, no 6 MB API Gateway cap).
+# Phase 2  POST {"action": "verify", "userId", "role", "uploadId"}
+#          -> Rekognition reads both images from S3; the Lambda never holds the image bytes.
+# Keys are derived server-side from (role, userId, uploadId), so a caller cannot point the
+# comparison at another user's objects.
+
+UPLOAD_URL_EXPIRES = 900                  # seconds the presigned PUTs stay valid
+MAX_IMAGE_BYTES = 15 * 1024 * 1024        # Rekognition limit for images read from S3
+AUTO_DELETE_TAGGING = 'auto-delete=true'  # matches the bucket lifecycle rule
+IMAGE_CONTENT_TYPE = 'image/jpeg'
+NORMALIZE_OVER_BYTES = 1024 * 1024     # two-phase uploads below this go to Rekognition untouched
+
+
+def upload_keys(user_role, user_id, upload_id):
+    prefix = f"{user_role}/{user_id}/uploads/{upload_id}"
+    return f"{prefix}/id_card.jpg", f"{prefix}/selfie.jpg"
+
+
+def valid_upload_id(upload_id):
+    try:
+        return uuid.UUID(str(upload_id)).hex == str(upload_id)
+    except ValueError:
+        return False
+
+
+def issue_upload_urls(s3, bucket, user_role, user_id):
+    upload_id = uuid.uuid4().hex
+    id_key, selfie_key = upload_keys(user_role, user_id, upload_id)
+
+    def presign(key):
+        return s3.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': bucket,
+                'Key': key,
+                'ContentType': IMAGE_CONTENT_TYPE,
+                'Tagging': AUTO_DELETE_TAGGING
+            },
+            ExpiresIn=UPLOAD_URL_EXPIRES
+        )
+
+    return {
+        'uploadId': upload_id,
+        'idCardUrl': presign(id_key),
+        'selfieUrl': presign(selfie_key),
+        # Signed into the URLs: the PUT must send exactly these headers
+        'requiredHeaders': {'Content-Type': IMAGE_CONTENT_TYPE, 'x-amz-tagging': AUTO_DELETE_TAGGING},
+        'expiresIn': UPLOAD_URL_EXPIRES,
+        'maxBytes': MAX_IMAGE_BYTES
+    }
+
+
+def check_uploads(s3, bucket, keys):
+    """
+    Returns (problem or None, {key: {"size": bytes, "etag": S3 ETag}}); problem is
+    (statusCode, message): 404 for a missing upload, 413 for one over MAX_IMAGE_BYTES.
+    """
+    def head(key):
+        try:
+            return s3.head_object(Bucket=bucket, Key=key)
+        except ClientError:
+            return None
+
+    objects = {}
+    with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+        heads = list(pool.map(head, keys))
+    for key, response in zip(keys, heads):
+        if response is None:
+            return (404, "Image upload not found. Please upload both images first."), objects
+        if response['ContentLength'] > MAX_IMAGE_BYTES:
+            return (413, f"Image too large (max {MAX_IMAGE_BYTES // (1024 * 1024)} MB)."), objects
+        objects[key] = {'size': response['ContentLength'], 'etag': response['ETag']}
+    return None, objects
+
+
+def normalize_upload(s3, bucket, key):
+    """
+    Rewrites a large uploaded image in place with its normalized JPEG (the S3 body is spooled, not
+    read into memory). Raises image_prep.UnreadableImage for an upload that is not an image.
+    """
+    body = s3.get_object(Bucket=bucket, Key=key)['Body']
+    try:
+        data, info = image_prep.normalize(body)
+    finally:
+        body.close()
+    if info['normalized']:
+        s3.put_object(Bucket=bucket, Key=key, Body=data, ContentType=IMAGE_CONTENT_TYPE, Tagging=AUTO_DELETE_TAGGING)
+    return info
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+from botocore.exceptions import ClientError
+from aws_clients import get_client, get_table
+
+# --- ASYNC VERIFICATION JOBS ---
+# POST {"action": "verify", "uploadId", ..., "async": true}
+#   -> 202 {"jobId", "status": "QUEUED", "pollAfterMs"}; the work runs in a worker, not in the request.
+# GET ?jobId=..&userId=..  (or POST {"action": "job-status", "jobId", "userId"})
+#   -> {"jobId", "status": QUEUED | RUNNING | DONE | FAILED, "result"?, "error"?, "pollAfterMs"?}
+#   The client polls until status is DONE / FAILED; "result" is the same body the sync verify returns.
+#
+# Backends:
+#   VERIFICATION_QUEUE_URL set    -> jobs in DynamoDB (VERIFICATION_JOBS_TABLE, PK jobId, TTL on expiresAt),
+#                                    job ids on SQS; this Lambda is also the queue's consumer
+#                                    ({"Records": [...]}, event source mapping with ReportBatchItemFailures)
+#   VERIFICATION_LOCAL_QUEUE=1    -> in-process queue + worker thread and an in-memory job map, for local
+#                                    runs only (a Lambda container freezes once the handler returns and
+#                                    other containers cannot see the job)
+#   neither                       -> async mode is disabled; the handler rejects "async" requests
+# SQS delivers at least once: a worker claims a job with a conditional QUEUED -> RUNNING update, so a
+# redelivered message never runs the same job twice. A RUNNING job whose worker died (Lambda timeout,
+# crash) can be claimed again once it is older than JOB_TIMEOUT_SECONDS; until then the message is
+# reported as a batch item failure so SQS redelivers it later. After MAX_ATTEMPTS claims it is FAILED.
+# Keep the queue's visibility timeout >= the Lambda timeout and JOB_TIMEOUT_SECONDS > the Lambda timeout.
+
+QUEUE_URL = os.environ.get('VERIFICATION_QUEUE_URL')
+LOCAL_QUEUE = os.environ.get('VERIFICATION_LOCAL_QUEUE', '').lower() in ('1', 'true', 'yes')
+JOBS_TABLE = os.environ.get('VERIFICATION_JOBS_TABLE', 'mediconnect-verification-jobs')
+JOB_TTL_SECONDS = 24 * 3600
+JOB_TIMEOUT_SECONDS = int(os.environ.get('VERIFICATION_JOB_TIMEOUT_SECONDS', '300'))
+MAX_ATTEMPTS = 3
+POLL_AFTER_MS = 1500
+
+_lock = threading.Lock()
+_local_jobs = {}
+_local_queue = None
+
+
+def enabled():
+    return bool(QUEUE_URL) or LOCAL_QUEUE
+
+
+def _now():
+    return int(time.time())
+
+
+def _local_worker(runner):
+    while True:
+        job_id = _local_queue.get()
+        try:
+            process(job_id, runner)
+        finally:
+            _local_queue.task_done()
+
+
+def _enqueue_local(job_id, runner):
+    global _local_queue
+    with _lock:
+        if _local_queue is None:
+            _local_queue = queue.Queue()
+            threading.Thread(target=_local_worker, args=(runner,), daemon=True).start()
+    _local_queue.put(job_id)
+
+
+def submit(user_id, params, runner):
+    """Records a QUEUED job and hands its id to the queue. `runner(params)` -> (statusCode, payload)."""
+    if not enabled():
+        raise RuntimeError("Async verification is not configured")
+    job_id = uuid.uuid4().hex
+    job = {
+        'jobId': job_id,
+        'userId': user_id,
+        'status': 'QUEUED',
+        'attempts': 0,
+        'params': json.dumps(params),
+        'createdAt': _now(),
+        'expiresAt': _now() + JOB_TTL_SECONDS
+    }
+    if QUEUE_URL:
+        get_table(JOBS_TABLE).put_item(Item=job)
+        get_client('sqs').send_message(QueueUrl=QUEUE_URL, MessageBody=json.dumps({'jobId': job_id}))
+    else:
+        with _lock:
+            _local_jobs[job_id] = job
+        _enqueue_local(job_id, runner)
+    return job_id
+
+
+def get_job(job_id):
+    if QUEUE_URL:
+        return get_table(JOBS_TABLE).get_item(Key={'jobId': job_id}).get('Item')
+    with _lock:
+        job = _local_jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def _claimable(job, now):
+    return job['status'] == 'QUEUED' or (
+        job['status'] == 'RUNNING' and int(job.get('startedAt', 0)) < now - JOB_TIMEOUT_SECONDS
+    )
+
+
+def _claim(job_id):
+    """
+    QUEUED (or stale RUNNING) -> RUNNING. Returns (job, retry_later): job is None when this delivery
+    must not run it; retry_later is True while another worker may still be running it.
+    """
+    now = _now()
+    if QUEUE_URL:
+        try:
+            job = get_table(JOBS_TABLE).update_item(
+                Key={'jobId': job_id},
+                UpdateExpression="SET #s = :running, startedAt = :now ADD attempts :one",
+                ConditionExpression="#s = :queued OR (#s = :running AND startedAt < :stale)",
+                ExpressionAttributeNames={'#s': 'status'},
+                ExpressionAttributeValues={
+                    ':running': 'RUNNING', ':queued': 'QUEUED', ':now': now,
+                    ':stale': now - JOB_TIMEOUT_SECONDS, ':one': 1
+                },
+                ReturnValues='ALL_NEW'
+            )['Attributes']
+            return job, False
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        job = get_job(job_id)
+        return None, bool(job) and job['status'] == 'RUNNING'
+    with _lock:
+        job = _local_jobs.get(job_id)
+        if not job or not _claimable(job, now):
+            return None, False
+        job.update(status='RUNNING', startedAt=now, attempts=job.get('attempts', 0) + 1)
+        return dict(job), False
+
+
+def _finish(job_id, status, **fields):
+    fields.update(status=status, finishedAt=_now())
+    if QUEUE_URL:
+        names = {f"#{k}": k for k in fields}
+        values = {f":{k}": v for k, v in fields.items()}
+        get_table(JOBS_TABLE).update_item(
+            Key={'jobId': job_id},
+            UpdateExpression="SET " + ", ".join(f"#{k} = :{k}" for k in fields),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+    else:
+        with _lock:
+            _local_jobs[job_id].update(fields)
+
+
+def process(job_id, runner):
+    """
+    Runs one queued job. Returns False when the message should be redelivered later
+    (the job is RUNNING elsewhere and not yet stale). Failures are recorded on the job.
+    """
+    job, retry_later = _claim(job_id)
+    if job is None:
+        if retry_later:
+            print(f"⏳ Job {job_id} is running elsewhere; retrying later")
+            return False
+        print(f"⏭️ Job {job_id} already finished or missing")
+        return True
+    if int(job.get('attempts', 1)) > MAX_ATTEMPTS:
+        _finish(job_id, 'FAILED', error="Verification timed out. Please try again.")
+        return True
+    try:
+        status_code, payload = runner(json.loads(job['params']))
+        # Stored as a JSON string: floats (confidence) would otherwise need Decimal conversion
+        _finish(job_id, 'DONE', statusCode=status_code, result=json.dumps(payload))
+    except Exception as e:
+        print(f"❌ Job {job_id} failed: {str(e)}")
+        _finish(job_id, 'FAILED', error="Verification failed. Please try again.")
+    return True
+
+
+def status_payload(job):
+    payload = {'jobId': job['jobId'], 'status': job['status']}
+    if job['status'] == 'DONE':
+        payload['statusCode'] = int(job['statusCode'])
+        payload['result'] = json.loads(job['result'])
+    elif job['status'] == 'FAILED':
+        payload['error'] = job.get('error')
+    else:
+        payload['pollAfterMs'] = POLL_AFTER_MS
+    return payload